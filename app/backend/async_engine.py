@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Moteur asyncio des processus de téléchargement
+Version 3.0.0 FINAL - Créé par Metadata
+Une seule boucle d'événements pilote tous les yt-dlp/gallery-dl/wget/curl
+"""
+
+import asyncio
+import codecs
+import re
+import sys
+import threading
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+try:
+    from backend.process_watchdog import popen_group_kwargs
+except ImportError:
+    from .process_watchdog import popen_group_kwargs
+
+# yt-dlp/curl réécrivent leur ligne de progression avec \r
+LINE_SPLIT = re.compile(r'[\r\n]+')
+READ_CHUNK = 64 * 1024
+
+class AsyncProcessEngine:
+    """Boucle asyncio dédiée (thread de fond) pour les processus enfants"""
+
+    def __init__(self):
+        self.logger = get_logger(__name__)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Démarrage paresseux de la boucle dans un thread démon"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._install_child_watcher(self._loop)
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="download-event-loop",
+                    daemon=True
+                )
+                self._thread.start()
+                self.logger.info("🔁 Boucle asyncio des téléchargements démarrée")
+            return self._loop
+
+    def _install_child_watcher(self, loop):
+        """pidfd sous Linux (Python < 3.12) : évite un thread waitpid par enfant"""
+        if sys.version_info >= (3, 12) or not sys.platform.startswith("linux"):
+            return
+        try:
+            watcher = asyncio.PidfdChildWatcher()
+            watcher.attach_loop(loop)
+            asyncio.set_child_watcher(watcher)
+        except Exception as e:
+            self.logger.debug(f"PidfdChildWatcher indisponible: {e}")
+
+    async def run_process(self, command, on_line=None, watch=None):
+        """Lancement d'un processus et lecture non bloquante de sa sortie
+
+        `watch` est un suivi ProcessWatchdog attaché au PID lancé.
+        Retourne (code_retour, lignes_de_sortie).
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            **popen_group_kwargs()
+        )
+        if watch:
+            watch.attach(process.pid)
+
+        output_lines = []
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ""
+
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+
+            pending += decoder.decode(chunk)
+            *lines, pending = LINE_SPLIT.split(pending)
+            for line in lines:
+                self._emit_line(line, output_lines, on_line)
+
+        pending += decoder.decode(b"", final=True)
+        self._emit_line(pending, output_lines, on_line)
+
+        return_code = await process.wait()
+        return return_code, output_lines
+
+    def _emit_line(self, line, output_lines, on_line):
+        """Transmission d'une ligne non vide au callback"""
+        line = line.strip()
+        if not line:
+            return
+        output_lines.append(line)
+        if on_line:
+            try:
+                on_line(line)
+            except Exception as e:
+                self.logger.error(f"💥 Erreur callback sortie: {e}")
+
+    def submit(self, coroutine):
+        """Planification d'une coroutine sur la boucle (retourne un Future concurrent)"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def run(self, command, on_line=None, watch=None):
+        """Enveloppe synchrone de run_process (bloque uniquement l'appelant)"""
+        return self.submit(self.run_process(command, on_line, watch)).result()
+
+    def shutdown(self):
+        """Arrêt de la boucle"""
+        with self._lock:
+            if self._loop and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop.close()
+            self._loop = None
+            self._thread = None
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_async_engine():
+    """Moteur partagé par tous les DownloadManager"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncProcessEngine()
+        return _engine
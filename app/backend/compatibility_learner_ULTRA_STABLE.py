@@ -7,9 +7,12 @@ Version 3.0.0 FINAL - Créé par Metadata
 Base de données SQLite avec sites pré-configurés
 """
 
+import atexit
 import sqlite3
 import json
+import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -21,14 +24,49 @@ except ImportError:
         logging.basicConfig(level=logging.INFO)
         return logging.getLogger(name)
 
+try:
+    from utils.event_log import emit_event
+except ImportError:
+    from ..utils.event_log import emit_event
+
+try:
+    from backend.domain_router import get_domain_router
+    from backend.tool_bandit import ToolBandit
+    from backend.url_index import url_key
+    from backend import history_stats
+except ImportError:
+    from .domain_router import get_domain_router
+    from .tool_bandit import ToolBandit
+    from .url_index import url_key
+    from . import history_stats
+
 class CompatibilityLearner:
     """Système d'apprentissage des compatibilités site→outil"""
     
-    def __init__(self, db_path="data/compatibility.db"):
+    def __init__(self, db_path="data/compatibility.db", flush_interval=2.0, flush_threshold=100,
+                 history_retention_days=7):
         """Initialisation avec base SQLite"""
         self.db_path = Path(db_path)
         self.logger = get_logger(__name__)
         
+        # Connexion unique (WAL) et tampon d'écriture différée
+        self._conn = None
+        self._db_lock = threading.RLock()
+        self._cache = {}
+        self._pending_results = []
+        self._dirty_domains = set()
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        
+        # Historique brut court : les tendances longues vivent dans les agrégats horaires
+        self.history_retention_days = history_retention_days
+        self._last_cleanup = 0.0
+        self._stop_event = threading.Event()
+        self._flush_thread = None
+        
+        # Classement des outils par débit attendu (bandit par domaine)
+        self.bandit = ToolBandit()
+        
         # Sites pré-configurés avec confiance
         self.predefined_sites = {
             # Vidéo mainstream
@@ -81,6 +119,14 @@ class CompatibilityLearner:
         # Initialiser base de données
         self.init_database()
         self.load_predefined_compatibilities()
+        self._load_cache()
+        self._load_bandit()
+        self._start_flush_thread()
+        atexit.register(self.close)
+        
+        # Index de routage partagé, alimenté par cette base
+        self.router = get_domain_router()
+        self.router.load_database(self.db_path)
         
         print("📊 Base de données d'apprentissage initialisée")
         print(f"📚 {len(self.predefined_sites)} compatibilités prédéfinies chargées")
@@ -88,55 +134,101 @@ class CompatibilityLearner:
         
         self.logger.info("🎓 CompatibilityLearner V3 initialisé")
     
+    @contextmanager
+    def _database(self):
+        """Accès exclusif à la connexion longue durée (ouverte à la demande)"""
+        with self._db_lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            yield self._conn
+    
+    def _load_cache(self):
+        """Chargement en mémoire de la table compatibility : domaine → [outil, confiance, succès, échecs]"""
+        try:
+            with self._database() as conn:
+                rows = conn.execute(
+                    "SELECT domain, tool, confidence, success_count, failure_count FROM compatibility"
+                ).fetchall()
+            self._cache = {row[0]: list(row[1:]) for row in rows}
+        except Exception as e:
+            self.logger.error(f"❌ Erreur chargement cache: {e}")
+    
+    def _load_bandit(self):
+        """Chargement des bras du bandit depuis les agrégats horaires"""
+        try:
+            with self._database() as conn:
+                rows = history_stats.tool_rows(conn)
+            self.bandit.load(rows)
+        except Exception as e:
+            self.logger.error(f"❌ Erreur chargement historique outils: {e}")
+    
+    def _start_flush_thread(self):
+        """Thread démon d'écriture périodique du tampon"""
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="learner-flush", daemon=True)
+        self._flush_thread.start()
+    
+    def _flush_loop(self):
+        """Vidage du tampon toutes les `flush_interval` secondes, purge de l'historique brut toutes les heures"""
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+            if time.time() - self._last_cleanup > 3600:
+                self._last_cleanup = time.time()
+                self.cleanup_old_history(self.history_retention_days)
+    
     def init_database(self):
         """Initialisation base SQLite"""
         try:
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Table principale des compatibilités
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS compatibility (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    domain TEXT UNIQUE NOT NULL,
-                    tool TEXT NOT NULL,
-                    confidence REAL NOT NULL DEFAULT 0.5,
-                    category TEXT DEFAULT 'unknown',
-                    success_count INTEGER DEFAULT 0,
-                    failure_count INTEGER DEFAULT 0,
-                    last_tested TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_adult BOOLEAN DEFAULT FALSE,
-                    notes TEXT
-                )
-            """)
-            
-            # Index pour performances
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_domain ON compatibility(domain)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tool ON compatibility(tool)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_confidence ON compatibility(confidence)")
-            
-            # Table historique des téléchargements
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS download_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    domain TEXT NOT NULL,
-                    url_hash TEXT,
-                    tool_used TEXT NOT NULL,
-                    success BOOLEAN NOT NULL,
-                    duration REAL,
-                    file_size INTEGER,
-                    error_message TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            with self._database() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_domain ON download_history(domain)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON download_history(timestamp)")
+                # Table principale des compatibilités
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS compatibility (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        domain TEXT UNIQUE NOT NULL,
+                        tool TEXT NOT NULL,
+                        confidence REAL NOT NULL DEFAULT 0.5,
+                        category TEXT DEFAULT 'unknown',
+                        success_count INTEGER DEFAULT 0,
+                        failure_count INTEGER DEFAULT 0,
+                        last_tested TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        is_adult BOOLEAN DEFAULT FALSE,
+                        notes TEXT
+                    )
+                """)
+            
+                # Index pour performances
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_domain ON compatibility(domain)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_tool ON compatibility(tool)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_confidence ON compatibility(confidence)")
+            
+                # Table historique des téléchargements
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS download_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        domain TEXT NOT NULL,
+                        url_hash TEXT,
+                        tool_used TEXT NOT NULL,
+                        success BOOLEAN NOT NULL,
+                        duration REAL,
+                        file_size INTEGER,
+                        error_message TEXT,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
             
-            conn.commit()
-            conn.close()
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_domain ON download_history(domain)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON download_history(timestamp)")
+            
+                # Agrégats domaine/outil/heure (reconstruits une fois pour les bases existantes)
+                history_stats.create_schema(conn)
+                history_stats.backfill(conn)
+            
+                conn.commit()
             
             self.logger.info("📊 Base de données d'apprentissage initialisée")
             
@@ -147,35 +239,34 @@ class CompatibilityLearner:
     def load_predefined_compatibilities(self):
         """Chargement des sites pré-configurés dans la BD"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            loaded_count = 0
-            for domain, config in self.predefined_sites.items():
-                cursor.execute("""
-                    INSERT OR REPLACE INTO compatibility 
-                    (domain, tool, confidence, category, success_count, is_adult, notes)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    domain,
-                    config["tool"],
-                    config["confidence"],
-                    config.get("category", "unknown"),
-                    10,  # Pré-supposer quelques succès
-                    config.get("adult", False),
-                    f"Site pré-configuré - {config.get('category', 'unknown')}"
-                ))
-                loaded_count += 1
-            
-            conn.commit()
-            conn.close()
+            with self._database() as conn:
+                cursor = conn.cursor()
+            
+                loaded_count = 0
+                for domain, config in self.predefined_sites.items():
+                    cursor.execute("""
+                        INSERT OR REPLACE INTO compatibility 
+                        (domain, tool, confidence, category, success_count, is_adult, notes)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        domain,
+                        config["tool"],
+                        config["confidence"],
+                        config.get("category", "unknown"),
+                        10,  # Pré-supposer quelques succès
+                        config.get("adult", False),
+                        f"Site pré-configuré - {config.get('category', 'unknown')}"
+                    ))
+                    loaded_count += 1
+            
+                conn.commit()
             
             self.logger.info(f"📚 {loaded_count} compatibilités prédéfinies chargées")
             
         except Exception as e:
             self.logger.error(f"❌ Erreur chargement sites: {e}")
     
-    def get_best_tool(self, url):
+    def get_best_tool(self, url, available_tools=None):
         """Obtention du meilleur outil pour une URL"""
         try:
             domain = urlparse(url).netloc.lower()
@@ -184,30 +275,22 @@ class CompatibilityLearner:
             if domain.startswith('www.'):
                 domain = domain[4:]
             
-            # Recherche exacte en BD
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT tool, confidence FROM compatibility 
-                WHERE domain = ? 
-                ORDER BY confidence DESC 
-                LIMIT 1
-            """, (domain,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                tool, confidence = result
-                self.logger.debug(f"🎯 Outil trouvé pour {domain}: {tool} (confiance: {confidence:.2f})")
+            # Domaine déjà observé : meilleur débit attendu
+            tool = self.choose_tool(domain, available_tools)
+            if tool:
                 return tool
             
-            # Recherche par sous-domaine
-            for site_domain, config in self.predefined_sites.items():
-                if site_domain in domain or domain in site_domain:
-                    self.logger.debug(f"🎯 Correspondance partielle {domain} → {config['tool']}")
-                    return config["tool"]
+            # Cache mémoire : correspondance exacte apprise
+            entry = self._cache.get(domain)
+            if entry:
+                self.logger.debug("🎯 Outil trouvé pour %s: %s (confiance: %.2f)", domain, entry[0], entry[1])
+                return entry[0]
+            
+            # Index de suffixes : sous-domaine ou extension joker en O(labels)
+            route = self.router.lookup(domain)
+            if route:
+                self.logger.debug("🎯 Outil trouvé pour %s: %s (règle %s)", domain, route.tool, route.site)
+                return route.tool
             
             # Fallback par type d'URL
             return self._guess_tool_by_url_pattern(url)
@@ -216,6 +299,27 @@ class CompatibilityLearner:
             self.logger.error(f"❌ Erreur sélection outil: {e}")
             return "yt-dlp"  # Fallback sûr
     
+    def _prior_tool(self, domain):
+        """Outil a priori : compatibilité apprise ou règle de routage"""
+        entry = self._cache.get(domain)
+        if entry:
+            return entry[0]
+        route = self.router.lookup(domain)
+        return route.tool if route else None
+    
+    def choose_tool(self, domain, available_tools=None, prior_tool=None):
+        """Outil tiré par échantillonnage de Thompson, ou None sans historique pour ce domaine"""
+        if not self.bandit.has_domain(domain):
+            return None
+        tool = self.bandit.choose(domain, available_tools, prior_tool or self._prior_tool(domain))
+        if tool:
+            self.logger.debug("🎰 Outil choisi pour %s: %s", domain, tool)
+        return tool
+    
+    def get_tool_ranking(self, domain):
+        """Classement des outils d'un domaine par octets/s attendus"""
+        return self.bandit.rank(domain, prior_tool=self._prior_tool(domain))
+    
     def _guess_tool_by_url_pattern(self, url):
         """Devine l'outil selon des motifs d'URL"""
         url_lower = url.lower()
@@ -238,117 +342,145 @@ class CompatibilityLearner:
         # Défaut
         return "yt-dlp"
     
-    def record_download_result(self, url, tool_used, success, duration=None, file_size=None, error_message=None):
-        """Enregistrement du résultat d'un téléchargement"""
+    def record_download_result(self, url, tool_used, success, duration=None, file_size=None, error_message=None,
+                               job_id=None):
+        """Enregistrement du résultat d'un téléchargement (`job_id` : corrélation avec le journal d'événements)"""
         try:
             domain = urlparse(url).netloc.lower()
             if domain.startswith('www.'):
                 domain = domain[4:]
             
-            # Hash URL pour éviter de stocker l'URL complète
-            import hashlib
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:16]
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            # Hash de l'URL canonique (même clé que l'index des URLs) pour éviter de stocker l'URL complète
+            url_hash = url_key(url)
             
-            # Enregistrer dans l'historique
-            cursor.execute("""
-                INSERT INTO download_history 
-                (domain, url_hash, tool_used, success, duration, file_size, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (domain, url_hash, tool_used, success, duration, file_size, error_message))
+            with self._db_lock:
+                self._pending_results.append(
+                    (domain, url_hash, tool_used, success, duration, file_size, error_message, time.time())
+                )
+                
+                self.bandit.record(domain, tool_used, success, duration, file_size)
+                
+                # Mise à jour immédiate du cache ; confiance = moyenne a posteriori Beta(1 + succès, 1 + échecs)
+                entry = self._cache.get(domain)
+                if entry is None:
+                    entry = self._cache[domain] = [tool_used, 0.5, 0, 0]
+                if entry[0] == tool_used:
+                    entry[2 if success else 3] += 1
+                    entry[1] = (entry[2] + 1) / (entry[2] + entry[3] + 2)
+                    self._dirty_domains.add(domain)
+                    
+                    # Route propre au domaine seulement après un succès, catégorie/adulte hérités comme au chargement
+                    existing = self.router.lookup(domain) if success else None
+                    if success and (existing is None or existing.site != domain):
+                        self.router.add(
+                            domain, tool_used,
+                            existing.category if existing else "unknown",
+                            bool(existing and existing.adult)
+                        )
+                
+                should_flush = len(self._pending_results) >= self.flush_threshold
+                confidence = entry[1]
             
-            # Mettre à jour les statistiques de compatibilité
-            if success:
-                cursor.execute("""
-                    UPDATE compatibility 
-                    SET success_count = success_count + 1, 
-                        last_tested = CURRENT_TIMESTAMP,
-                        confidence = MIN(0.99, confidence + 0.01)
-                    WHERE domain = ? AND tool = ?
-                """, (domain, tool_used))
-            else:
-                cursor.execute("""
-                    UPDATE compatibility 
-                    SET failure_count = failure_count + 1, 
-                        last_tested = CURRENT_TIMESTAMP,
-                        confidence = MAX(0.01, confidence - 0.05)
-                    WHERE domain = ? AND tool = ?
-                """, (domain, tool_used))
-            
-            # Si aucune entrée mise à jour, créer une nouvelle
-            if cursor.rowcount == 0:
-                initial_confidence = 0.8 if success else 0.2
-                cursor.execute("""
-                    INSERT OR IGNORE INTO compatibility 
-                    (domain, tool, confidence, success_count, failure_count)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    domain, tool_used, initial_confidence,
-                    1 if success else 0,
-                    0 if success else 1
-                ))
+            emit_event("result_recorded", "learner", job_id=job_id, tool=tool_used, domain=domain,
+                       bytes=file_size, duration=duration, success=bool(success), confidence=confidence)
             
-            conn.commit()
-            conn.close()
+            if should_flush:
+                self.flush()
             
-            self.logger.info(f"📈 Résultat enregistré: {domain} + {tool_used} = {'✅' if success else '❌'}")
+            self.logger.debug("📈 Résultat enregistré: %s + %s = %s", domain, tool_used, "✅" if success else "❌")
             
         except Exception as e:
             self.logger.error(f"❌ Erreur enregistrement résultat: {e}")
     
-    def get_site_statistics(self, domain=None):
-        """Statistiques pour un domaine ou globales"""
+    def flush(self):
+        """Écriture du tampon en une seule transaction ; retourne le nombre de résultats écrits"""
+        with self._db_lock:
+            if not self._pending_results and not self._dirty_domains:
+                return 0
+            results, self._pending_results = self._pending_results, []
+            domains, self._dirty_domains = self._dirty_domains, set()
+            rows = [(domain, *self._cache[domain]) for domain in domains if domain in self._cache]
+            
+            try:
+                with self._database() as conn:
+                    conn.executemany("""
+                        INSERT INTO download_history 
+                        (domain, url_hash, tool_used, success, duration, file_size, error_message, timestamp)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+                    """, results)
+                    history_stats.apply_results(
+                        conn, [(r[0], r[2], r[3], r[4], r[5], r[7]) for r in results]
+                    )
+                    
+                    # État absolu du cache : idempotent, quel que soit le nombre de résultats regroupés
+                    conn.executemany("""
+                        INSERT INTO compatibility (domain, tool, confidence, success_count, failure_count)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(domain) DO UPDATE SET
+                            confidence = excluded.confidence,
+                            success_count = excluded.success_count,
+                            failure_count = excluded.failure_count,
+                            last_tested = CURRENT_TIMESTAMP
+                        WHERE tool = excluded.tool
+                    """, rows)
+                    conn.commit()
+            except Exception as e:
+                # Remise en tampon pour la prochaine tentative
+                self._pending_results[:0] = results
+                self._dirty_domains |= domains
+                self.logger.error(f"❌ Erreur écriture différée: {e}")
+                return 0
+        
+        emit_event("flush", "learner", results=len(results), domains=len(rows))
+        self.logger.debug("💾 %d résultats écrits en lot", len(results))
+        return len(results)
+    
+    def close(self):
+        """Arrêt du thread d'écriture, vidage final et fermeture de la connexion"""
+        self._stop_event.set()
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def get_site_statistics(self, domain=None, since_hours=None):
+        """Statistiques par outil pour un domaine, ou globales (agrégats horaires)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            if domain:
-                # Stats spécifiques à un domaine
-                cursor.execute("""
-                    SELECT tool, confidence, success_count, failure_count, last_tested
-                    FROM compatibility WHERE domain = ?
-                    ORDER BY confidence DESC
-                """, (domain,))
-                
-                results = cursor.fetchall()
-                
-            else:
-                # Stats globales
-                cursor.execute("""
-                    SELECT 
-                        COUNT(*) as total_sites,
-                        AVG(confidence) as avg_confidence,
-                        SUM(success_count) as total_successes,
-                        SUM(failure_count) as total_failures
-                    FROM compatibility
-                """)
-                
-                results = cursor.fetchone()
-            
-            conn.close()
-            return results
+            self.flush()
+            with self._database() as conn:
+                return history_stats.site_statistics(conn, domain, since_hours)
             
         except Exception as e:
             self.logger.error(f"❌ Erreur stats: {e}")
             return None
     
+    def get_performance_trend(self, domain, tool=None, since_hours=24 * 7):
+        """Série horaire (heure, tentatives, succès, octets, p50, p95) d'un domaine"""
+        try:
+            self.flush()
+            with self._database() as conn:
+                return history_stats.hourly_trend(conn, domain, tool, since_hours)
+            
+        except Exception as e:
+            self.logger.error(f"❌ Erreur tendance: {e}")
+            return []
+    
     def get_all_supported_sites(self):
         """Liste de tous les sites supportés avec confiance > 0.5"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            self.flush()
+            with self._database() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT domain, tool, confidence, category 
-                FROM compatibility 
-                WHERE confidence > 0.5 
-                ORDER BY confidence DESC
-            """)
+                cursor.execute("""
+                    SELECT domain, tool, confidence, category 
+                    FROM compatibility 
+                    WHERE confidence > 0.5 
+                    ORDER BY confidence DESC
+                """)
             
-            results = cursor.fetchall()
-            conn.close()
+                results = cursor.fetchall()
             
             return [
                 {
@@ -364,20 +496,20 @@ class CompatibilityLearner:
             self.logger.error(f"❌ Erreur liste sites: {e}")
             return []
     
-    def cleanup_old_history(self, days_to_keep=30):
+    def cleanup_old_history(self, days_to_keep=7):
         """Nettoyage de l'historique ancien"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            self.flush()
+            with self._database() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                DELETE FROM download_history 
-                WHERE timestamp < datetime('now', '-{} days')
-            """.format(days_to_keep))
+                cursor.execute("""
+                    DELETE FROM download_history 
+                    WHERE timestamp < datetime('now', '-{} days')
+                """.format(days_to_keep))
             
-            deleted = cursor.rowcount
-            conn.commit()
-            conn.close()
+                deleted = cursor.rowcount
+                conn.commit()
             
             if deleted > 0:
                 self.logger.info(f"🧹 {deleted} entrées d'historique supprimées")
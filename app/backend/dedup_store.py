@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Déduplication par contenu
+Version 3.0.0 FINAL - Créé par Metadata
+Empreinte BLAKE2b des fichiers terminés (pool dédié), index SQLite, doublons → reflink/lien physique
+"""
+
+import atexit
+import errno
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+try:
+    from utils.event_log import emit_event
+except ImportError:
+    from ..utils.event_log import emit_event
+
+DEFAULT_DB = "data/content_index.db"
+HASH_BUFFER = 8 * 1024 * 1024
+# Fichiers trop petits pour qu'un lien vaille la peine (métadonnées .json, miniatures...)
+MIN_SIZE = 64 * 1024
+# ioctl Linux FICLONE : copie partagée (copy-on-write) sur btrfs, XFS, bcachefs...
+FICLONE = 0x40049409
+LINK_MODES = ("auto", "reflink", "hardlink", "off")
+
+def file_digest(path, buffer_size=HASH_BUFFER):
+    """Empreinte BLAKE2b-256 en flux (readinto dans un tampon réutilisé ; le GIL est relâché)"""
+    digest = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+def _reflink(source, target):
+    """Clone copy-on-write de source vers target ; False si le système de fichiers ne le permet pas"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as fsrc, open(target, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(target)
+        except OSError:
+            pass
+        return False
+
+class DedupStore:
+    """Index de contenu : un fichier canonique par empreinte, les copies deviennent des liens"""
+
+    def __init__(self, db_path=DEFAULT_DB, workers=2, link_mode="auto", min_size=MIN_SIZE):
+        self.db_path = Path(db_path)
+        self.logger = get_logger(__name__)
+        self.link_mode = link_mode if link_mode in LINK_MODES else "auto"
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+        # Pool propre au hachage : les slots de téléchargement ne l'attendent jamais
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="dedup")
+        atexit.register(self.close)
+
+    def _create_schema(self):
+        """Tables content (empreinte → fichier canonique) et files (chaque chemin indexé)"""
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS content (
+                    digest TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    reclaimed INTEGER NOT NULL DEFAULT 0,
+                    indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE INDEX IF NOT EXISTS idx_files_digest ON files(digest);
+            """)
+            self._conn.commit()
+
+    def submit(self, paths, job_id=None):
+        """Indexation asynchrone de fichiers terminés ; retourne les futures (jamais bloquant)"""
+        futures = []
+        for path in paths:
+            with self._lock:
+                self._pending += 1
+            futures.append(self._executor.submit(self._index_file, str(path), job_id))
+        return futures
+
+    def scan(self, directory, job_id=None):
+        """Indexation d'une bibliothèque existante (récupère l'espace des doublons déjà présents)"""
+        return self.submit((Path(root) / name for root, _, files in os.walk(directory) for name in files), job_id)
+
+    def _index_file(self, path, job_id=None):
+        """Hachage puis déduplication d'un fichier ; retourne l'état enregistré"""
+        try:
+            return self._index(path, job_id)
+        except Exception as e:
+            self.logger.error(f"❌ Déduplication {path}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _index(self, path, job_id):
+        path = os.path.abspath(path)
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        if info.st_size < self.min_size:
+            return None
+
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime, state FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == info.st_size and row[1] == info.st_mtime:
+            return row[2]
+
+        start = time.monotonic()
+        digest = file_digest(path)
+        hashed = time.monotonic() - start
+
+        with self._lock:
+            canonical = self._canonical(digest, info.st_size, path)
+            state, reclaimed = "unique", 0
+            if canonical != path:
+                state = self._link(canonical, path)
+                reclaimed = info.st_size if state in ("linked", "reflinked") else 0
+            # mtime relu : le remplacement par un lien change l'inode
+            mtime = os.stat(path).st_mtime
+            self._conn.execute("""
+                INSERT INTO files (path, digest, size, mtime, state, reclaimed) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET digest = excluded.digest, size = excluded.size,
+                    mtime = excluded.mtime, state = excluded.state, reclaimed = excluded.reclaimed,
+                    indexed_at = CURRENT_TIMESTAMP
+            """, (path, digest, info.st_size, mtime, state, reclaimed))
+            self._conn.commit()
+
+        if state != "unique":
+            self.logger.info(f"🔗 Doublon {state}: {Path(path).name} = {Path(canonical).name}")
+        emit_event("dedup", "dedup", job_id=job_id, bytes=info.st_size, duration=hashed,
+                   state=state, reclaimed=reclaimed, digest=digest[:16])
+        return state
+
+    def _canonical(self, digest, size, path):
+        """Fichier canonique d'une empreinte (ce fichier s'il n'y en a pas ou s'il a disparu)"""
+        row = self._conn.execute("SELECT path, size FROM content WHERE digest = ?", (digest,)).fetchone()
+        if row and row[1] == size and os.path.isfile(row[0]):
+            return row[0]
+        self._conn.execute("""
+            INSERT INTO content (digest, size, path) VALUES (?, ?, ?)
+            ON CONFLICT(digest) DO UPDATE SET size = excluded.size, path = excluded.path
+        """, (digest, size, path))
+        return path
+
+    def _link(self, canonical, path):
+        """Remplacement atomique de path par un clone ou un lien vers canonical"""
+        try:
+            if os.path.samefile(canonical, path):
+                return "linked"
+        except OSError:
+            return "duplicate"
+        if self.link_mode == "off":
+            return "duplicate"
+
+        temp = f"{path}.{os.getpid()}.dedup"
+        try:
+            if self.link_mode in ("auto", "reflink") and _reflink(canonical, temp):
+                os.replace(temp, path)
+                return "reflinked"
+            if self.link_mode in ("auto", "hardlink"):
+                os.link(canonical, temp)
+                os.replace(temp, path)
+                return "linked"
+        except OSError as e:
+            # Autre disque, système sans liens physiques, limite de liens atteinte...
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                self.logger.warning(f"⚠️ Lien impossible pour {path}: {e}")
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+        return "duplicate"
+
+    def pending(self):
+        """Fichiers en attente de hachage"""
+        with self._lock:
+            return self._pending
+
+    def wait(self, timeout=None):
+        """Attente de la fin des hachages en cours (outils, tests)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def report(self):
+        """Bilan : fichiers indexés, contenus uniques, doublons liés ou non, octets récupérés"""
+        with self._lock:
+            files, unique, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT digest), COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()
+            states = dict(self._conn.execute("SELECT state, COUNT(*) FROM files GROUP BY state").fetchall())
+            reclaimed, reclaimable = self._conn.execute("""
+                SELECT COALESCE(SUM(reclaimed), 0),
+                       COALESCE(SUM(CASE WHEN state = 'duplicate' THEN size ELSE 0 END), 0)
+                FROM files
+            """).fetchone()
+        return {
+            "files": files,
+            "unique_contents": unique,
+            "total_bytes": total_bytes,
+            "linked": states.get("linked", 0),
+            "reflinked": states.get("reflinked", 0),
+            "duplicates_unlinked": states.get("duplicate", 0),
+            "reclaimed_bytes": reclaimed,
+            "reclaimable_bytes": reclaimable,
+            "pending": self.pending(),
+        }
+
+    def close(self):
+        """Fin des hachages en cours puis fermeture de l'index"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+if __name__ == "__main__":
+    import sys
+
+    store = DedupStore()
+    for directory in sys.argv[1:]:
+        store.scan(directory)
+    store.wait()
+    for key, value in store.report().items():
+        print(f"🔗 {key}: {value}")
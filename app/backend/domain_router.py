@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Index de routage des domaines
+Version 3.0.0 FINAL - Créé par Metadata
+Trie de suffixes (labels inversés) : domaine → outil, catégorie, adulte
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+# Règles par défaut ("site.*" = toutes extensions : bunkr.cr, bunkr.la, ...)
+DEFAULT_ROUTES = {
+    # Vidéo mainstream
+    "youtube.com": {"tool": "yt-dlp", "category": "video"},
+    "youtu.be": {"tool": "yt-dlp", "category": "video"},
+    "vimeo.com": {"tool": "yt-dlp", "category": "video"},
+    "dailymotion.com": {"tool": "yt-dlp", "category": "video"},
+    "tiktok.com": {"tool": "yt-dlp", "category": "video"},
+    "twitch.tv": {"tool": "yt-dlp", "category": "streaming"},
+
+    # Musique
+    "soundcloud.com": {"tool": "yt-dlp", "category": "audio"},
+    "bandcamp.com": {"tool": "yt-dlp", "category": "audio"},
+    "spotify.com": {"tool": "yt-dlp", "category": "audio"},
+
+    # Contenu adulte
+    "pornhub.*": {"tool": "yt-dlp", "category": "adult", "adult": True},
+    "youporn.com": {"tool": "yt-dlp", "category": "adult", "adult": True},
+    "xvideos.*": {"tool": "yt-dlp", "category": "adult", "adult": True},
+    "xhamster.*": {"tool": "yt-dlp", "category": "adult", "adult": True},
+    "redtube.*": {"tool": "yt-dlp", "category": "adult", "adult": True},
+    "erome.com": {"tool": "yt-dlp", "category": "adult", "adult": True},
+
+    # Galeries et manga
+    "e-hentai.org": {"tool": "gallery-dl", "category": "gallery", "adult": True},
+    "exhentai.org": {"tool": "gallery-dl", "category": "gallery", "adult": True},
+    "nhentai.net": {"tool": "gallery-dl", "category": "gallery", "adult": True},
+    "gelbooru.com": {"tool": "gallery-dl", "category": "gallery"},
+    "danbooru.donmai.us": {"tool": "gallery-dl", "category": "gallery"},
+
+    # Plateformes d'images
+    "imgur.com": {"tool": "gallery-dl", "category": "images"},
+    "flickr.com": {"tool": "gallery-dl", "category": "images"},
+    "deviantart.com": {"tool": "gallery-dl", "category": "images"},
+
+    # Social media
+    "twitter.com": {"tool": "gallery-dl", "category": "social"},
+    "x.com": {"tool": "gallery-dl", "category": "social"},
+    "instagram.com": {"tool": "gallery-dl", "category": "social"},
+    "reddit.com": {"tool": "gallery-dl", "category": "social"},
+    "facebook.com": {"tool": "gallery-dl", "category": "social"},
+
+    # File sharing
+    "bunkr.*": {"tool": "gallery-dl", "category": "filehost"},
+    "bunkrrr.org": {"tool": "gallery-dl", "category": "filehost"},
+    "cyberdrop.*": {"tool": "gallery-dl", "category": "filehost"},
+    "gofile.io": {"tool": "gallery-dl", "category": "filehost"},
+    "anonfiles.com": {"tool": "gallery-dl", "category": "filehost"},
+    "imgbox.com": {"tool": "gallery-dl", "category": "filehost"},
+}
+
+_ROUTE = object()
+_WILDCARD = "*"
+
+class Route:
+    """Résultat de routage d'un domaine"""
+
+    __slots__ = ("site", "tool", "category", "adult")
+
+    def __init__(self, site, tool, category="unknown", adult=False):
+        self.site = site
+        self.tool = tool
+        self.category = category or "unknown"
+        self.adult = bool(adult)
+
+    def __repr__(self):
+        return f"Route({self.site!r}, {self.tool!r}, {self.category!r}, adult={self.adult})"
+
+def host_of(url):
+    """Extraction rapide du domaine d'une URL (sans urlparse, sans www.)"""
+    start = url.find("://")
+    start = start + 3 if start >= 0 else 0
+    end = len(url)
+    for separator in "/?#":
+        position = url.find(separator, start)
+        if 0 <= position < end:
+            end = position
+    host = url[start:end].lower()
+    if "@" in host:
+        host = host.rsplit("@", 1)[1]
+    if ":" in host:
+        host = host.split(":", 1)[0]
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+class DomainRouter:
+    """Trie de suffixes sur les labels inversés (com → youtube → m)"""
+
+    def __init__(self):
+        self.logger = get_logger(__name__)
+        self._root = {}
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def add(self, pattern, tool, category="unknown", adult=False):
+        """Ajout/remplacement d'une règle ("youtube.com", "bunkr.*")"""
+        pattern = pattern.lower().strip(".")
+        if pattern.startswith("www."):
+            pattern = pattern[4:]
+
+        with self._lock:
+            node = self._root
+            for label in reversed(pattern.split(".")):
+                node = node.setdefault(label, {})
+            if _ROUTE not in node:
+                self.size += 1
+            node[_ROUTE] = Route(pattern, tool, category, adult)
+
+    def add_routes(self, routes):
+        """Ajout d'un dict {motif: {tool, category, adult}}"""
+        for pattern, config in routes.items():
+            self.add(pattern, config["tool"], config.get("category", "unknown"), config.get("adult", False))
+
+    def lookup(self, domain):
+        """Règle la plus spécifique pour un domaine, en O(nombre de labels)"""
+        labels = domain.lower().split(".")
+        labels.reverse()
+
+        best, best_depth = None, 0
+        # Deux chemins au plus : extension exacte ou extension joker
+        for first in (labels[0], _WILDCARD):
+            node = self._root.get(first)
+            depth = 1
+            while node is not None:
+                route = node.get(_ROUTE)
+                if route is not None and depth > best_depth:
+                    best, best_depth = route, depth
+                if depth >= len(labels):
+                    break
+                node = node.get(labels[depth])
+                depth += 1
+        return best
+
+    def route_url(self, url):
+        """Règle pour une URL complète"""
+        return self.lookup(host_of(url))
+
+    def load_database(self, db_path):
+        """Surcharge par les compatibilités apprises (table compatibility)"""
+        try:
+            if not Path(db_path).exists():
+                return 0
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute("SELECT domain, tool, category, is_adult FROM compatibility").fetchall()
+            conn.close()
+        except Exception as e:
+            self.logger.warning(f"⚠️ Routage: base d'apprentissage illisible: {e}")
+            return 0
+
+        for domain, tool, category, is_adult in rows:
+            existing = self.lookup(domain)
+            if category in (None, "unknown") and existing:
+                category = existing.category
+            self.add(domain, tool, category, bool(is_adult) or bool(existing and existing.adult))
+        return len(rows)
+
+    def load_config(self, config_path="config/settings.json"):
+        """Règles additionnelles de la section `routing` de la config"""
+        try:
+            path = Path(config_path)
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    routes = json.load(f).get("routing", {})
+                self.add_routes(routes)
+                return len(routes)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Routage: config illisible: {e}")
+        return 0
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_domain_router(db_path="data/compatibility.db", config_path="config/settings.json"):
+    """Index partagé, construit une seule fois (défauts + base apprise + config)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            router = DomainRouter()
+            router.add_routes(DEFAULT_ROUTES)
+            router.load_database(db_path)
+            router.load_config(config_path)
+            router.logger.info(f"🧭 Index de routage construit: {router.size} règles")
+            _router = router
+        return _router
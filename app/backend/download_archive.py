@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Archives de téléchargement partagées
+Version 3.0.0 FINAL - Créé par Metadata
+Une archive par outil (--download-archive) : une resynchronisation ne transfère que les nouveaux éléments
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+ARCHIVE_DIR = "data/archives"
+# Format imposé par chaque outil : texte "extracteur id" (yt-dlp), SQLite table archive(entry) (gallery-dl)
+ARCHIVE_FILES = {
+    "yt-dlp": "yt-dlp.txt",
+    "gallery-dl": "gallery-dl.sqlite3",
+}
+
+@lru_cache(maxsize=1)
+def _ytdlp_extractors():
+    """Classes d'extracteurs yt-dlp (Generic en dernier) ; vide si yt_dlp n'est pas installé"""
+    try:
+        from yt_dlp.extractor import gen_extractor_classes
+    except ImportError:
+        return ()
+    return tuple(gen_extractor_classes())
+
+@lru_cache(maxsize=1)
+def _gallerydl_extractors():
+    """Classes d'extracteurs gallery-dl par (catégorie, sous-catégorie)"""
+    try:
+        from gallery_dl import extractor
+    except ImportError:
+        return {}
+    return {(cls.category, cls.subcategory): cls for cls in extractor.extractors()}
+
+def ytdlp_key(info):
+    """Entrée d'archive yt-dlp depuis un .info.json ("youtube dQw4w9WgXcQ")"""
+    extractor = info.get("extractor_key") or info.get("ie_key")
+    if not extractor or not info.get("id") or info.get("_type", "video") != "video":
+        return None
+    return f"{extractor.lower()} {info['id']}"
+
+def ytdlp_url_key(url):
+    """Entrée d'archive yt-dlp déduite de l'URL seule (identifiant extrait hors ligne)"""
+    for ie in _ytdlp_extractors():
+        if not ie.suitable(url):
+            continue
+        if ie.ie_key() == "Generic":
+            return None
+        video_id = ie.get_temp_id(url)
+        return f"{ie.ie_key().lower()} {video_id}" if video_id else None
+    return None
+
+def gallerydl_key(metadata):
+    """Entrée d'archive gallery-dl depuis un fichier de métadonnées (catégorie + archive_fmt de l'extracteur)"""
+    cls = _gallerydl_extractors().get((metadata.get("category"), metadata.get("subcategory")))
+    if cls is None or not cls.archive_fmt:
+        return None
+    try:
+        from gallery_dl import formatter
+        return metadata["category"] + formatter.parse(cls.archive_fmt).format_map(metadata)
+    except Exception:
+        return None
+
+class DownloadArchive:
+    """Archives partagées par tous les téléchargements (files, mode batch, nouvelles tentatives)"""
+
+    def __init__(self, directory=ARCHIVE_DIR, enabled=True):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.logger = get_logger(__name__)
+        self._lock = threading.Lock()
+
+    def path(self, tool):
+        """Fichier d'archive de l'outil (None si l'outil n'en gère pas)"""
+        name = ARCHIVE_FILES.get(tool)
+        return self.directory / name if name else None
+
+    def archive_path(self, tool):
+        """Chemin absolu de l'archive à passer à l'outil (None si désactivée ou non gérée)"""
+        path = self.path(tool)
+        if not self.enabled or path is None:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return str(path.resolve())
+
+    def command_args(self, tool):
+        """Arguments à ajouter à la commande de l'outil"""
+        path = self.archive_path(tool)
+        return ["--download-archive", path] if path else []
+
+    def _connect(self, path):
+        # Même schéma que gallery-dl (l'outil crée la table s'il ouvre l'archive en premier)
+        conn = sqlite3.connect(str(path), timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS archive (entry TEXT PRIMARY KEY) WITHOUT ROWID")
+        return conn
+
+    def entries(self, tool):
+        """Entrées connues de l'archive d'un outil"""
+        path = self.path(tool)
+        if path is None or not path.exists():
+            return set()
+        if tool == "gallery-dl":
+            conn = self._connect(path)
+            try:
+                return {entry for (entry,) in conn.execute("SELECT entry FROM archive")}
+            finally:
+                conn.close()
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def add_entries(self, tool, keys):
+        """Ajout d'entrées absentes ; retourne le nombre ajouté"""
+        path = self.path(tool)
+        if path is None:
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            new = set(keys) - self.entries(tool)
+            if not new:
+                return 0
+            if tool == "gallery-dl":
+                conn = self._connect(path)
+                try:
+                    conn.executemany("INSERT OR IGNORE INTO archive (entry) VALUES (?)", ((key,) for key in new))
+                    conn.commit()
+                finally:
+                    conn.close()
+            else:
+                # Ajout en fin de fichier, comme yt-dlp (une ligne par entrée)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.writelines(f"{key}\n" for key in sorted(new))
+        return len(new)
+
+    def rebuild(self, library_dirs=(), urls=()):
+        """Reconstruction depuis la bibliothèque : métadonnées .json sur disque et URLs déjà téléchargées
+
+        yt-dlp : fichiers .info.json, puis identifiant extrait hors ligne de chaque URL ;
+        gallery-dl : fichiers de métadonnées (--write-metadata). Les entrées existantes sont conservées.
+        Retourne le nombre d'entrées ajoutées par outil.
+        """
+        found = {tool: set() for tool in ARCHIVE_FILES}
+        for directory in library_dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith(".json"):
+                        continue
+                    try:
+                        with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                            metadata = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    if not isinstance(metadata, dict):
+                        continue
+                    if "extractor_key" in metadata:
+                        key, tool = ytdlp_key(metadata), "yt-dlp"
+                    elif "category" in metadata:
+                        key, tool = gallerydl_key(metadata), "gallery-dl"
+                    else:
+                        continue
+                    if key:
+                        found[tool].add(key)
+
+        for url in urls:
+            key = ytdlp_url_key(url)
+            if key:
+                found["yt-dlp"].add(key)
+
+        added = {tool: self.add_entries(tool, keys) for tool, keys in found.items()}
+        self.logger.info(f"🗃️ Archives reconstruites: {added}")
+        return added
+
+_download_archive = None
+_download_archive_lock = threading.Lock()
+
+def get_download_archive(directory=ARCHIVE_DIR, enabled=True):
+    """Archives partagées par les deux DownloadManager"""
+    global _download_archive
+    with _download_archive_lock:
+        if _download_archive is None:
+            _download_archive = DownloadArchive(directory, enabled)
+        return _download_archive
+
+if __name__ == "__main__":
+    import sys
+
+    try:
+        from backend.url_index import get_url_index
+    except ImportError:
+        from .url_index import get_url_index
+
+    archive = get_download_archive()
+    added = archive.rebuild(sys.argv[1:] or ["data/downloads"], get_url_index().iter_urls())
+    for tool, count in added.items():
+        print(f"🗃️ {tool}: +{count} ({archive.path(tool)})")
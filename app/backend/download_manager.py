@@ -7,6 +7,7 @@ Version 3.0.0 FINAL - Créé par Metadata
 Téléchargements RÉELS avec outils fiables uniquement
 """
 
+import asyncio
 import subprocess
 import threading
 import time
@@ -22,6 +23,40 @@ except ImportError:
     def get_logger(name):
         return logging.getLogger(name)
 
+try:
+    from utils.event_log import emit_event, new_job_id
+except ImportError:
+    from ..utils.event_log import emit_event, new_job_id
+
+try:
+    from backend.download_scheduler import DownloadScheduler, SchedulingPolicy
+    from backend.async_engine import get_async_engine
+    from backend.process_watchdog import get_process_watchdog, popen_group_kwargs
+    from backend.persistent_queue import PersistentQueue
+    from backend.retry_policy import RetryPolicy
+    from backend.domain_router import get_domain_router
+    from backend.tool_detector import get_tool_detector
+    from backend.progress_parser import create_parser, ProgressRecord, YTDLP_PROGRESS_TEMPLATE
+    from backend.inprocess_engine import get_inprocess_engine, module_available, UNAVAILABLE
+    from backend.dedup_store import DedupStore
+    from backend.url_index import get_url_index, url_key
+    from backend.download_archive import get_download_archive
+    from backend.staging import promote_file
+except ImportError:
+    from .download_scheduler import DownloadScheduler, SchedulingPolicy
+    from .async_engine import get_async_engine
+    from .process_watchdog import get_process_watchdog, popen_group_kwargs
+    from .persistent_queue import PersistentQueue
+    from .retry_policy import RetryPolicy
+    from .domain_router import get_domain_router
+    from .tool_detector import get_tool_detector
+    from .progress_parser import create_parser, ProgressRecord, YTDLP_PROGRESS_TEMPLATE
+    from .inprocess_engine import get_inprocess_engine, module_available, UNAVAILABLE
+    from .dedup_store import DedupStore
+    from .url_index import get_url_index, url_key
+    from .download_archive import get_download_archive
+    from .staging import promote_file
+
 class DownloadManager:
     """Gestionnaire de téléchargements SANS cyberdrop-dl"""
     
@@ -31,10 +66,30 @@ class DownloadManager:
         self.security_manager = security_manager
         self.logger = get_logger(__name__)
         
-        # Configuration
-        self.output_dir = "data/downloads"
-        self.max_concurrent = 4
-        self.timeout = 300
+        # Configuration (section "download" de config/settings.json)
+        self.settings = self._load_settings()
+        self.output_dir = self.settings.get("default_path", "data/downloads")
+        self.max_concurrent = int(self.settings.get("max_concurrent", 4))
+        self.timeout = int(self.settings.get("timeout", 300))
+        
+        # Watchdog : délai global (timeout) et blocages (aucune sortie / progression figée)
+        self.stall_timeout = int(self.settings.get("stall_timeout", 120))
+        self.progress_stall_timeout = int(self.settings.get("progress_stall_timeout", 600))
+        self.watchdog = get_process_watchdog()
+        
+        # Moteur d'exécution : "async" (boucle partagée) ou "thread" (Popen + readline)
+        self.engine_mode = self.settings.get("engine", "async")
+        self.async_engine = get_async_engine()
+        
+        # Moteur intégré : yt-dlp/gallery-dl par leur API Python dans des workers réutilisés
+        # (outil non importable → sous-processus pour cet outil)
+        inprocess = self.settings.get("inprocess", {})
+        self.inprocess_tools = set()
+        if inprocess.get("enabled", True):
+            self.inprocess_tools = {
+                tool for tool in inprocess.get("tools", ["yt-dlp", "gallery-dl"]) if module_available(tool)
+            }
+        self.inprocess_idle_workers = int(inprocess.get("idle_workers", self.max_concurrent))
         
         # État
         self.active_downloads = {}
@@ -44,94 +99,102 @@ class DownloadManager:
             "successful_downloads": 0,
             "failed_downloads": 0
         }
+        self._stats_lock = threading.Lock()
         
         # Outils détectés (SANS cyberdrop-dl)
         self.tools = self._detect_tools()
         
-        # Thread de traitement
-        self.queue_thread = None
-        self.queue_active = False
-        self.queue_paused = False
+        # Index de routage partagé (domaine → outil)
+        self.router = get_domain_router()
+        
+        # Pool de workers (créé au démarrage de la queue)
+        self.scheduler = None
+        self.queue_progress_callback = None
+        
+        # Déduplication par contenu des fichiers terminés (pool de hachage créé au premier fichier)
+        self.dedup_settings = self.settings.get("dedup", {})
+        self.dedup_store = None
+        self._dedup_lock = threading.Lock()
+        
+        # URLs déjà téléchargées (index créé au premier ajout) et URLs en file/en cours par clé canonique
+        self.skip_completed = self.settings.get("skip_completed", True)
+        self.url_index = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Archives partagées (--download-archive) : une resynchronisation ne récupère que les nouveaux éléments
+        archive_settings = self.settings.get("archive", {})
+        self.download_archive = get_download_archive(
+            archive_settings.get("dir", "data/archives"), archive_settings.get("enabled", True)
+        )
+        
+        # Nouvelles tentatives : backoff par classe d'échec puis repli sur l'outil suivant
+        self.retry_policy = RetryPolicy(self.settings.get("retry", {}))
+        
+        # Queue durable : reprise après crash ou fermeture de la fenêtre
+        self.persistent_queue = None
+        if self.settings.get("persistent_queue", True):
+            try:
+                self.persistent_queue = PersistentQueue(self.settings.get("queue_db", "data/download_queue.db"))
+                self._restore_queue()
+            except Exception as e:
+                self.logger.error(f"❌ Queue persistante indisponible: {e}")
+                self.persistent_queue = None
         
         self.logger.info("🔧 DownloadManager V3 initialisé avec IA et sécurité")
         self.logger.info(f"📁 Dossier de sortie: {self.output_dir}")
         self.logger.info(f"⚡ Téléchargements simultanés: {self.max_concurrent}")
         self.logger.info(f"🛠️ Outils détectés: {list(self.tools.keys())}")
     
+    def _load_settings(self, config_path="config/settings.json"):
+        """Chargement de la section download de la configuration"""
+        try:
+            path = Path(config_path)
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("download", {})
+        except Exception as e:
+            self.logger.warning(f"⚠️ Config download par défaut utilisée: {e}")
+        return {}
+    
     def _detect_tools(self):
-        """Détection outils fiables SANS cyberdrop-dl"""
-        tools = {}
-        
-        # Liste réduite d'outils fiables
-        tool_list = ["yt-dlp", "gallery-dl", "wget", "curl"]
-        
-        for tool in tool_list:
-            path = self._find_tool(tool)
-            if path:
-                tools[tool] = path
-                self.logger.info(f"✅ {tool} trouvé: {path}")
-            else:
-                self.logger.warning(f"❌ {tool} non trouvé")
-        
-        return tools
+        """Outils fiables SANS cyberdrop-dl (registre partagé, cache revalidé par stat)"""
+        return get_tool_detector().get_available_tools()
     
-    def _find_tool(self, tool_name):
-        """Recherche d'un outil"""
-        try:
-            # Test commande directe
-            result = subprocess.run(
-                [tool_name, "--version"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if result.returncode == 0:
-                return tool_name
-        except:
-            pass
-        
-        # Recherche dans PATH
-        try:
-            if os.name == "nt":
-                result = subprocess.run(["where", tool_name], capture_output=True, text=True)
-            else:
-                result = subprocess.run(["which", tool_name], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                return result.stdout.strip().split('\n')[0]
-        except:
-            pass
-        
-        # Recherche dans dossier tools/
-        tools_dir = Path("tools")
-        if tools_dir.exists():
-            for ext in [".exe", ".bat", ""]:
-                tool_path = tools_dir / f"{tool_name}{ext}"
-                if tool_path.exists():
-                    return str(tool_path)
-        
-        return None
+    @staticmethod
+    def _get_domain(url):
+        """Domaine normalisé d'une URL (sans www.)"""
+        domain = urlparse(url).netloc.lower()
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        return domain
     
     def get_compatible_tool(self, url):
         """Sélection outil FIABLE pour une URL"""
-        domain = urlparse(url).netloc.lower()
-        
-        # Règles de compatibilité FIABLES
-        if any(site in domain for site in ["youtube.com", "youtu.be"]):
-            return "yt-dlp" if "yt-dlp" in self.tools else None
-        
-        elif any(site in domain for site in ["e-hentai.org", "exhentai.org", "nhentai.net"]):
-            return "gallery-dl" if "gallery-dl" in self.tools else "yt-dlp"
-        
-        elif any(site in domain for site in ["bunkr.cr", "bunkr.is", "cyberdrop"]):
-            # Utiliser gallery-dl pour bunkr/cyberdrop (plus fiable que cyberdrop-dl)
-            return "gallery-dl" if "gallery-dl" in self.tools else "yt-dlp"
-        
-        elif any(site in domain for site in ["pornhub.com", "xvideos.com", "youporn.com", "redtube.com"]):
-            return "yt-dlp" if "yt-dlp" in self.tools else None
-        
-        elif any(site in domain for site in ["twitter.com", "x.com", "instagram.com"]):
-            return "yt-dlp" if "yt-dlp" in self.tools else "gallery-dl"
+        domain = self._get_domain(url)
+        route = self.router.lookup(domain)
+        
+        # Historique du domaine : outil au meilleur débit attendu parmi les outils installés
+        if self.compatibility_learner:
+            try:
+                tool = self.compatibility_learner.choose_tool(
+                    domain, self.tools, route.tool if route else None
+                )
+                if tool:
+                    return tool
+            except Exception as e:
+                self.logger.error(f"❌ Erreur classement outils: {e}")
+        
+        if route:
+            if route.tool in self.tools:
+                return route.tool
+            
+            # Repli : gallery-dl → yt-dlp, yt-dlp → gallery-dl pour les réseaux sociaux
+            if route.tool == "gallery-dl":
+                return "yt-dlp"
+            if route.category == "social" and "gallery-dl" in self.tools:
+                return "gallery-dl"
+            return None
         
         # Par défaut
         if "yt-dlp" in self.tools:
@@ -153,123 +216,440 @@ class DownloadManager:
         
         return True, f"Supporté par {tool}"
     
-    def download(self, url, output_dir=None, progress_callback=None, quality="best", force_tool=None):
-        """Téléchargement RÉEL avec outils fiables"""
+    def download(self, url, output_dir=None, progress_callback=None, quality="best", force_tool=None, details=None,
+                 force=False):
+        """Téléchargement RÉEL avec outils fiables
+        
+        `details` (dict optionnel) reçoit l'outil, le code retour et la raison d'échec structurée.
+        `force` : archive de téléchargement ignorée (tous les éléments sont retéléchargés).
+        """
+        job, error = self._prepare_download(url, output_dir, progress_callback, quality, force_tool, details, force)
+        if error:
+            return False, error
+        
+        try:
+            result = self._run_inprocess(job) if job["inprocess"] else None
+            if result is None:
+                on_line = self._make_line_handler(job)
+                if self.engine_mode == "async":
+                    # Boucle asyncio partagée : aucun thread bloqué sur readline()
+                    result = self.async_engine.run(job["command"], on_line, job["watch"])
+                else:
+                    result = self._run_process_threaded(job["command"], on_line, job["watch"])
+            
+            return_code, output_lines = result
+            return self._finish_download(job, return_code, output_lines)
+            
+        except Exception as e:
+            return self._fail_download(job, f"💥 Erreur: {e}", {"reason": "exception", "detail": str(e)})
+        
+        finally:
+            self.watchdog.unwatch(job["watch"])
+            self._increment_stat("total_downloads")
+    
+    async def download_async(self, url, output_dir=None, progress_callback=None, quality="best", force_tool=None, details=None,
+                             force=False):
+        """Variante coroutine de download() pour piloter des centaines de téléchargements depuis une boucle"""
+        job, error = self._prepare_download(url, output_dir, progress_callback, quality, force_tool, details, force)
+        if error:
+            return False, error
+        
+        try:
+            result = await asyncio.to_thread(self._run_inprocess, job) if job["inprocess"] else None
+            if result is None:
+                result = await self.async_engine.run_process(
+                    job["command"], self._make_line_handler(job), job["watch"]
+                )
+            return_code, output_lines = result
+            # Le post-traitement (sandbox) touche au disque : hors de la boucle
+            return await asyncio.to_thread(self._finish_download, job, return_code, output_lines)
+            
+        except Exception as e:
+            return self._fail_download(job, f"💥 Erreur: {e}", {"reason": "exception", "detail": str(e)})
+        
+        finally:
+            self.watchdog.unwatch(job["watch"])
+            self._increment_stat("total_downloads")
+    
+    def _prepare_download(self, url, output_dir, progress_callback, quality, force_tool, details=None, force=False):
+        """Sélection outil, dossiers et commande ; retourne (job, None) ou (None, erreur)"""
+        details = details if details is not None else {}
+        # Identifiant de corrélation : conservé entre les tentatives d'un même item de queue
+        details["job_id"] = details.get("job_id") or new_job_id()
         if not url.strip():
-            return False, "URL vide"
+            details["failure"] = {"reason": "invalid_url", "detail": "URL vide"}
+            return None, "URL vide"
         
         # Sélection de l'outil
         tool = force_tool if force_tool and force_tool in self.tools else self.get_compatible_tool(url)
         
+        details["tool"] = tool
         if not tool or tool not in self.tools:
             error_msg = f"Outil non disponible: {tool}"
+            details["failure"] = {"reason": "tool_missing", "detail": error_msg}
             self.logger.error(error_msg)
             if progress_callback:
                 progress_callback(False, error_msg, 0)
-            return False, error_msg
+            return None, error_msg
         
         # Dossier de sortie
         output_path = Path(output_dir or self.output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # Sandbox si activé
+        # Sandbox si activé : dossier de préparation propre à ce job (repris par ses nouvelles tentatives)
         if self.security_manager and self.security_manager.is_sandbox_enabled():
-            temp_output = Path(self.security_manager.get_sandbox_dir())
-            temp_output.mkdir(parents=True, exist_ok=True)
             final_output = output_path
-            output_path = temp_output
+            output_path = Path(self.security_manager.create_staging_dir(details["job_id"]))
         else:
             final_output = None
         
         # Construction de la commande
         tool_path = self.tools[tool]
-        command = self._build_command(tool, tool_path, url, output_path, quality)
+        command = self._build_command(tool, tool_path, url, output_path, quality, use_archive=not force)
         
         if not command:
             error_msg = f"Impossible de construire la commande pour {tool}"
+            details["failure"] = {"reason": "unsupported", "detail": error_msg}
             self.logger.error(error_msg)
             if progress_callback:
                 progress_callback(False, error_msg, 0)
-            return False, error_msg
+            return None, error_msg
+        
+        # Paramètres du moteur intégré (la commande reste le repli)
+        inprocess = None
+        if tool in self.inprocess_tools and self._get_inprocess_engine().supports(tool):
+            inprocess = self._build_inprocess_params(tool, url, output_path, quality, use_archive=not force)
         
         # Lancement du téléchargement
-        self.logger.info(f"🚀 Lancement: {' '.join(command)}")
+        if inprocess:
+            self.logger.info("🚀 Lancement intégré %s: %s", tool, url)
+        else:
+            self.logger.info("🚀 Lancement: %s", " ".join(command))
         if progress_callback:
             progress_callback(True, f"Démarrage avec {tool}...", 0)
         
-        try:
-            # Processus de téléchargement
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                universal_newlines=True
+        job = {
+            "job_id": details["job_id"],
+            "url": url,
+            "domain": self._get_domain(url),
+            "tool": tool,
+            "command": command,
+            "inprocess": inprocess,
+            "final_output": final_output,
+            "staging": output_path if final_output else None,
+            "progress_callback": progress_callback,
+            "details": details,
+            "started": time.monotonic(),
+            "bytes": 0,
+            "parser": create_parser(tool),
+            # Résolu : yt-dlp affiche des chemins absolus, output_dir peut être relatif
+            "output_prefix": Path(output_path).resolve(),
+            "files": [],
+            "last_progress": None,
+            "watch": self.watchdog.watch(
+                f"{tool} {url[:50]}",
+                timeout=self.timeout,
+                stall_timeout=self.stall_timeout,
+                progress_stall_timeout=self.progress_stall_timeout
             )
+        }
+        self._emit(job, "start", attempt=details.get("attempt"))
+        return job, None
+    
+    def _make_line_handler(self, job):
+        """Callback appelé pour chaque ligne de sortie du processus"""
+        tool = job["tool"]
+        watch = job["watch"]
+        parse = job["parser"].parse
+        on_record = self._make_record_handler(job)
+        
+        def on_line(line):
+            record = parse(line)
+            if record is None:
+                self.logger.info("📥 %s: %s", tool, line)
+                watch.touch()
+                # Chemin final affiché par l'outil (yt-dlp --print after_move:filepath)
+                if os.path.isfile(line):
+                    path = Path(line).resolve()
+                    if path.is_relative_to(job["output_prefix"]) and str(path) not in job["files"]:
+                        job["files"].append(str(path))
+                return
             
-            # Lecture de la sortie en temps réel
-            output_lines = []
-            while True:
-                line = process.stdout.readline()
-                if line == '' and process.poll() is not None:
-                    break
-                
-                if line:
-                    line = line.strip()
-                    output_lines.append(line)
-                    self.logger.info(f"📥 {tool}: {line}")
-                    
-                    # Extraction du pourcentage si possible
-                    progress = self._extract_progress(line, tool)
-                    if progress is not None and progress_callback:
-                        progress_callback(True, line, progress)
-            
-            # Vérification du résultat
-            return_code = process.poll()
-            
-            if return_code == 0:
-                # Succès - déplacement du sandbox si nécessaire
-                if final_output and self.security_manager:
-                    self.security_manager.process_sandbox_files(str(final_output))
-                
-                success_msg = f"✅ Téléchargement réussi avec {tool}"
-                self.stats["successful_downloads"] += 1
-                self.logger.info(success_msg)
-                
-                if progress_callback:
-                    progress_callback(True, success_msg, 100)
-                
-                return True, success_msg
+            # Ligne de progression : journal de débogage seulement
+            self.logger.debug("📥 %s: %s", tool, line)
+            on_record(record)
+        
+        return on_line
+    
+    def _make_event_handler(self, job):
+        """Callback des événements du moteur intégré (hooks de progression, fichiers, journal)"""
+        tool = job["tool"]
+        watch = job["watch"]
+        on_record = self._make_record_handler(job)
+        
+        def on_event(kind, data):
+            if kind == "progress":
+                on_record(ProgressRecord(*data))
+            elif kind == "file":
+                watch.touch()
+                if data not in job["files"]:
+                    job["files"].append(data)
             else:
-                # Échec
-                error_msg = f"❌ Échec téléchargement (code {return_code})"
-                self.stats["failed_downloads"] += 1
-                self.logger.error(error_msg)
-                
-                if progress_callback:
-                    progress_callback(False, error_msg, 0)
-                
-                return False, error_msg
-                
-        except subprocess.TimeoutExpired:
-            error_msg = f"⏰ Timeout après {self.timeout}s"
-            self.logger.error(error_msg)
+                self.logger.info("📥 %s: %s", tool, data)
+                watch.touch()
+        
+        return on_event
+    
+    def _make_record_handler(self, job):
+        """Traitement d'un état de progression (ligne analysée ou hook)"""
+        tool = job["tool"]
+        progress_callback = job["progress_callback"]
+        watch = job["watch"]
+        
+        def on_record(record):
+            job["last_progress"] = record
+            if record.finished:
+                job["bytes"] += record.file_bytes
+                watch.file_done()
+                if tool == "gallery-dl" and record.filename:
+                    job["files"].append(record.filename)
+            else:
+                watch.touch(record.percent)
             if progress_callback:
-                progress_callback(False, error_msg, 0)
-            return False, error_msg
+                progress = record.percent if record.percent is not None else -1
+                progress_callback(True, record.describe(), progress)
+        
+        return on_record
+    
+    def _get_inprocess_engine(self):
+        """Workers du moteur intégré (démarrés au premier téléchargement)"""
+        return get_inprocess_engine(self.inprocess_idle_workers)
+    
+    def _run_inprocess(self, job):
+        """Téléchargement par le moteur intégré ; None si l'outil doit repasser en sous-processus"""
+        tool = job["tool"]
+        return_code, output_lines = self._get_inprocess_engine().run(
+            tool, job["inprocess"], job["url"], self._make_event_handler(job), job["watch"]
+        )
+        if return_code == UNAVAILABLE:
+            self.logger.warning(f"⚠️ {tool} indisponible dans le moteur intégré : repli sur le sous-processus")
+            self.logger.info("🚀 Lancement: %s", " ".join(job["command"]))
+            return None
+        return return_code, output_lines
+    
+    def _build_inprocess_params(self, tool, url, output_path, quality, use_archive=True):
+        """Paramètres API équivalents à _build_command (YoutubeDL / configuration gallery-dl)"""
+        archive = self.download_archive.archive_path(tool) if use_archive else None
+        if tool == "yt-dlp":
+            params = {
+                "outtmpl": {"default": str(output_path / "%(uploader)s - %(title)s.%(ext)s")},
+                "format": self._convert_quality_ytdlp(quality),
+                "noplaylist": True,
+                "no_warnings": True,
+            }
+            if archive:
+                params["download_archive"] = archive
+            return params
+        
+        if tool == "gallery-dl":
+            params = {"base-directory": str(output_path)}
+            if archive:
+                params["archive"] = archive
+            return params
+        
+        return None
+    
+    def _run_process_threaded(self, command, on_line, watch=None):
+        """Moteur historique : Popen + readline() bloquant dans le thread appelant"""
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            universal_newlines=True,
+            **popen_group_kwargs()
+        )
+        if watch:
+            watch.attach(process.pid)
+        
+        # Lecture de la sortie en temps réel
+        output_lines = []
+        while True:
+            line = process.stdout.readline()
+            if line == '' and process.poll() is not None:
+                break
+            
+            if line:
+                line = line.strip()
+                output_lines.append(line)
+                on_line(line)
+        
+        return process.poll(), output_lines
+    
+    def _finish_download(self, job, return_code, output_lines):
+        """Vérification du résultat et post-traitement"""
+        tool = job["tool"]
+        progress_callback = job["progress_callback"]
+        job["details"]["return_code"] = return_code
+        job["details"]["output_tail"] = output_lines[-20:]
+        
+        # Outils sans ligne de fin par fichier (curl) : octets de la dernière progression
+        last = job["last_progress"]
+        if not job["bytes"] and last is not None and last.downloaded:
+            job["bytes"] = int(last.downloaded)
+        elapsed = time.monotonic() - job["started"]
+        job["details"]["bytes"] = job["bytes"]
+        job["details"]["throughput"] = job["bytes"] / elapsed if job["bytes"] and elapsed > 0 else None
+        
+        # Processus arrêté par le watchdog
+        failure = job["watch"].failure
+        if failure:
+            self._increment_stat("failed_downloads")
+            return self._fail_download(job, failure["detail"], failure)
+        
+        if return_code == 0:
+            # Succès - déplacement du sandbox si nécessaire
+            if job["staging"]:
+                promoted = {}
+                try:
+                    self.security_manager.process_sandbox_files(
+                        str(job["final_output"]), job["staging"], job["job_id"], promoted
+                    )
+                except Exception as e:
+                    # Fichiers restés dans le dossier de préparation (toujours protégé)
+                    self._increment_stat("failed_downloads")
+                    error_msg = f"❌ Promotion des fichiers impossible: {e}"
+                    return self._fail_download(job, error_msg, {"reason": "promotion", "detail": str(e)})
+                job["files"] = promoted.get("files", [])
+            job["details"]["files"] = job["files"]
+            self._deduplicate(job)
+            
+            success_msg = f"✅ Téléchargement réussi avec {tool}"
+            self._increment_stat("successful_downloads")
+            self._record_result(job, True)
+            self._mark_completed(job)
+            self._emit(job, "success", return_code=return_code)
+            self.logger.info(success_msg)
             
-        except Exception as e:
-            error_msg = f"💥 Erreur: {e}"
-            self.logger.error(error_msg)
             if progress_callback:
-                progress_callback(False, error_msg, 0)
-            return False, error_msg
+                progress_callback(True, success_msg, 100)
+            
+            return True, success_msg
         
-        finally:
-            self.stats["total_downloads"] += 1
+        # Échec
+        self._increment_stat("failed_downloads")
+        error_msg = f"❌ Échec téléchargement (code {return_code})"
+        return self._fail_download(job, error_msg, {"reason": "exit_code", "detail": error_msg})
+    
+    def _fail_download(self, job, error_msg, failure):
+        """Signalement d'un échec avec sa raison structurée"""
+        job["details"]["failure"] = failure
+        if job["staging"]:
+            # Fichiers terminés : déjà inscrits à l'archive, repris par la queue à l'abandon
+            job["details"]["files"] = job["files"]
+            job["details"]["final_output"] = str(job["final_output"])
+            # Nouvelle tentative possible (queue) : dossier conservé et toujours protégé de clean_sandbox,
+            # libéré par la promotion réussie ou par l'abandon définitif
+            if not job["details"].get("keep_staging"):
+                self._discard_staging(job["staging"], job["final_output"], job["files"])
+        self._record_result(job, False, error_msg)
+        self._emit(job, "failure", reason=failure.get("reason"),
+                   return_code=job["details"].get("return_code"))
+        self.logger.error(error_msg)
+        if job["progress_callback"]:
+            job["progress_callback"](False, error_msg, 0)
+        return False, error_msg
+    
+    def _discard_staging(self, staging, final_output, completed_files):
+        """Abandon d'un dossier de préparation
+        
+        Les fichiers terminés sont d'abord promus : l'archive les a enregistrés,
+        une nouvelle synchronisation ne les téléchargerait plus.
+        """
+        staging = Path(staging)
+        if self.download_archive.enabled and final_output:
+            for path in map(Path, completed_files):
+                try:
+                    if path.is_file() and path.is_relative_to(staging):
+                        promote_file(path, Path(final_output) / path.relative_to(staging))
+                except OSError as e:
+                    self.logger.error(f"❌ Conservation de {path.name}: {e}")
+        self.security_manager.release_staging_dir(staging, discard=True)
+    
+    def _record_result(self, job, success, error_message=None):
+        """Transmission du résultat (durée, octets) à l'apprentissage"""
+        if not self.compatibility_learner:
+            return
+        try:
+            self.compatibility_learner.record_download_result(
+                job["url"], job["tool"], success,
+                duration=time.monotonic() - job["started"],
+                file_size=job["bytes"] or None,
+                error_message=error_message,
+                job_id=job["job_id"]
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Erreur enregistrement apprentissage: {e}")
+    
+    @staticmethod
+    def _emit(job, phase, **extra):
+        """Événement structuré d'un téléchargement (logs/events.ndjson)"""
+        emit_event(
+            phase, "download",
+            job_id=job["job_id"], tool=job["tool"], domain=job["domain"],
+            bytes=job["bytes"], duration=time.monotonic() - job["started"], **extra
+        )
     
-    def _build_command(self, tool, tool_path, url, output_path, quality):
-        """Construction de la commande selon l'outil FIABLE"""
+    def _mark_completed(self, job):
+        """URL ajoutée à l'index des téléchargements terminés"""
+        try:
+            self._get_url_index().mark_done(job["url"])
+        except Exception as e:
+            self.logger.error(f"❌ Index des URLs: {e}")
+    
+    def _get_dedup_store(self):
+        """Création paresseuse de l'index de contenu (None si désactivé)"""
+        if not self.dedup_settings.get("enabled", True):
+            return None
+        with self._dedup_lock:
+            if self.dedup_store is None:
+                self.dedup_store = DedupStore(
+                    self.dedup_settings.get("db", "data/content_index.db"),
+                    workers=int(self.dedup_settings.get("workers", 2)),
+                    link_mode=self.dedup_settings.get("link_mode", "auto")
+                )
+            return self.dedup_store
+    
+    def _deduplicate(self, job):
+        """Hachage des fichiers produits dans le pool dédié (le slot de téléchargement est libéré aussitôt)"""
+        if not job["files"]:
+            return
+        try:
+            store = self._get_dedup_store()
+            if store:
+                store.submit(job["files"], job["job_id"])
+        except Exception as e:
+            self.logger.error(f"❌ Déduplication indisponible: {e}")
+    
+    def get_dedup_report(self):
+        """Bilan de déduplication (octets récupérés, doublons) ou None si désactivée"""
+        store = self._get_dedup_store()
+        return store.report() if store else None
+    
+    def rebuild_archives(self, library_dirs=None):
+        """Reconstruction des archives depuis la bibliothèque et les URLs déjà téléchargées"""
+        return self.download_archive.rebuild(
+            library_dirs or [self.output_dir], self._get_url_index().iter_urls()
+        )
+    
+    def _increment_stat(self, key):
+        """Incrément thread-safe d'un compteur de statistiques"""
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _build_command(self, tool, tool_path, url, output_path, quality, use_archive=True):
+        """Construction de la commande selon l'outil FIABLE (`use_archive` : archive partagée, sauf forçage)"""
+        archive_args = self.download_archive.command_args(tool) if use_archive else []
         if tool == "yt-dlp":
             command = [
                 tool_path,
@@ -277,14 +657,22 @@ class DownloadManager:
                 "--output", str(output_path / "%(uploader)s - %(title)s.%(ext)s"),
                 "--format", self._convert_quality_ytdlp(quality),
                 "--no-warnings",
+                # Chemin final de chaque fichier (--print implique --quiet : --progress le rétablit)
+                "--print", "after_move:filepath",
+                "--progress",
+                # Progression machine : une ligne par mise à jour (voir progress_parser)
+                "--newline",
+                "--progress-template", YTDLP_PROGRESS_TEMPLATE,
+                *archive_args,
                 url
             ]
             
         elif tool == "gallery-dl":
+            # Éléments déjà dans l'archive ignorés sans requête de fichier
             command = [
                 tool_path,
                 "--destination", str(output_path),
-                "--no-skip",
+                *archive_args,
                 url
             ]
             
@@ -293,6 +681,7 @@ class DownloadManager:
                 tool_path,
                 "--directory-prefix", str(output_path),
                 "--timeout", str(self.timeout),
+                "--progress=dot:mega",
                 url
             ]
             
@@ -329,121 +718,256 @@ class DownloadManager:
         }
         return quality_map.get(quality, "best")
     
-    def _extract_progress(self, line, tool):
-        """Extraction du pourcentage de progression"""
-        import re
-        
-        if tool == "yt-dlp":
-            # [download]  45.2% of 123.45MiB at  1.23MiB/s ETA 00:30
-            match = re.search(r'\[download\]\s+(\d+\.?\d*)%', line)
-            if match:
-                return float(match.group(1))
-        
-        elif tool == "gallery-dl":
-            # gallery-dl n'a pas de pourcentage standard
-            if "Downloading" in line:
-                return -1  # Mode indéterminé
-        
-        return None
+    def _get_url_index(self):
+        """Index partagé des URLs déjà téléchargées"""
+        if self.url_index is None:
+            self.url_index = get_url_index(self.settings.get("url_index_db", "data/url_index.db"))
+        return self.url_index
+    
+    def add_to_queue(self, url, quality="best", force_tool=None, force=False):
+        """Ajout à la queue de téléchargement
+        
+        Une URL déjà en file ou en cours (même forme canonique) n'est pas ajoutée une seconde fois :
+        l'index de l'item existant est retourné. Une URL déjà téléchargée est ignorée (None)
+        sauf avec `force`, qui ignore aussi l'archive de téléchargement de l'outil.
+        """
+        key = url_key(url)
+        domain = self._get_domain(url)
+        with self._inflight_lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                self.logger.debug("⏭️ Déjà en file: %.50s", url)
+                emit_event("skipped", "download", job_id=existing["job_id"], domain=domain, reason="in_flight")
+                return existing["index"]
+            
+            if not force and self.skip_completed and self._get_url_index().is_done(key=key):
+                self.logger.debug("⏭️ Déjà téléchargée: %.50s", url)
+                emit_event("skipped", "download", domain=domain, reason="already_done")
+                return None
+            
+            tool = force_tool or self.get_compatible_tool(url)
+            queue_id = None
+            if self.persistent_queue:
+                queue_id = self.persistent_queue.enqueue(url, quality, force_tool, tool, domain)
+            
+            item = self._append_queue_item(url, quality, force_tool, tool, domain, queue_id, force=force)
+        self.logger.info("➕ Ajouté à la queue: %.50s...", url)
+        return item["index"]  # Index de l'item
     
-    def add_to_queue(self, url, quality="best", force_tool=None):
-        """Ajout à la queue de téléchargement"""
+    def _append_queue_item(self, url, quality, force_tool, tool, domain, queue_id=None, attempts=0, delay=0,
+                           force=False):
+        """Création de l'item en mémoire et soumission à l'ordonnanceur"""
         item = {
+            "index": len(self.download_queue),
+            "queue_id": queue_id,
             "url": url,
+            "domain": domain,
             "quality": quality,
             "force_tool": force_tool,
             "status": "En attente",
             "progress": 0,
-            "tool": force_tool or self.get_compatible_tool(url)
+            "tool": tool,
+            "primary_tool": tool,
+            "attempts": attempts,
+            "job_id": new_job_id(),
+            "url_key": url_key(url),
+            "force": force
         }
+        self._inflight.setdefault(item["url_key"], item)
         self.download_queue.append(item)
-        self.logger.info(f"➕ Ajouté à la queue: {url[:50]}...")
-        return len(self.download_queue) - 1  # Index de l'item
+        self._get_scheduler().submit(item, delay)
+        emit_event("queued", "download", job_id=item["job_id"], tool=tool, domain=domain,
+                   queue_id=queue_id, delay=delay or None)
+        return item
+    
+    def _restore_queue(self):
+        """Rechargement des items en attente (et interrompus) depuis la queue durable"""
+        self.persistent_queue.recover_stale()
+        
+        restored = 0
+        for row in self.persistent_queue.iter_pending():
+            self._append_queue_item(
+                row["url"], row["quality"], row["force_tool"],
+                row["tool"] or row["force_tool"] or self.get_compatible_tool(row["url"]),
+                row["domain"] or self._get_domain(row["url"]),
+                row["id"],
+                attempts=row["attempts"] or 0,
+                delay=max(0, (row["available_at"] or 0) - time.time())
+            )
+            restored += 1
+        
+        if restored:
+            self.logger.info(f"♻️ {restored} téléchargements restaurés depuis la queue persistante")
+        return restored
+    
+    @property
+    def queue_active(self):
+        """Queue en cours de traitement"""
+        return bool(self.scheduler and self.scheduler.active)
+    
+    @property
+    def queue_paused(self):
+        """Queue en pause"""
+        return bool(self.scheduler and self.scheduler.paused)
+    
+    def _get_scheduler(self):
+        """Création paresseuse du pool de workers"""
+        if self.scheduler is None:
+            self.scheduler = DownloadScheduler(
+                self._process_queue_item,
+                max_workers=self.max_concurrent,
+                on_idle=lambda: self.logger.info("✅ Traitement queue terminé"),
+                policy=SchedulingPolicy(self.settings)
+            )
+        return self.scheduler
+    
+    def _process_queue_item(self, item):
+        """Traitement d'un item de la queue par un worker"""
+        progress_callback = self.queue_progress_callback
+        queue_id = item.get("queue_id")
+        
+        # Bail durable : couvre le timeout du watchdog, expiré seulement si le processus a crashé
+        if queue_id and not self.persistent_queue.claim(queue_id, self.timeout + 60):
+            self.logger.warning(f"⚠️ Item déjà réclamé ailleurs: {item['url'][:50]}...")
+            with self._inflight_lock:
+                if self._inflight.get(item.get("url_key")) is item:
+                    del self._inflight[item["url_key"]]
+            item["status"] = "Réclamé ailleurs"
+            if progress_callback:
+                progress_callback("queue_update", item)
+            return
+        
+        # Marquer comme en cours
+        item["attempts"] = item.get("attempts", 0) + 1
+        item["status"] = "En cours"
+        self.active_downloads[item["index"]] = item
+        if progress_callback:
+            progress_callback("queue_update", item)
+        
+        # Télécharger
+        def item_progress(success, message, progress):
+            item["progress"] = progress if progress >= 0 else 0
+            if progress_callback:
+                progress_callback("item_progress", item)
+        
+        details = {"job_id": item["job_id"], "attempt": item["attempts"], "keep_staging": True}
+        try:
+            success, message = self.download(
+                item["url"],
+                quality=item["quality"],
+                force_tool=item["force_tool"],
+                progress_callback=item_progress,
+                details=details,
+                force=item.get("force", False)
+            )
+        finally:
+            self.active_downloads.pop(item["index"], None)
+        
+        # Échec : nouvelle tentative planifiée sans occuper ce worker
+        item["failure"] = details.get("failure")
+        if not success:
+            item.setdefault("completed_files", []).extend(details.get("files", []))
+            retry = self.retry_policy.next_attempt(item, details, self.tools)
+            if retry:
+                self._schedule_retry(item, retry, message)
+                return
+        
+        # Échec définitif : les fichiers partiels des tentatives sont abandonnés
+        if not success and self.security_manager and self.security_manager.is_sandbox_enabled():
+            self._discard_staging(
+                self.security_manager.staging_path(item["job_id"]),
+                details.get("final_output"), item.get("completed_files", [])
+            )
+        
+        with self._inflight_lock:
+            if self._inflight.get(item["url_key"]) is item:
+                del self._inflight[item["url_key"]]
+        
+        # Mettre à jour le statut
+        if queue_id:
+            if success:
+                self.persistent_queue.complete(queue_id)
+            else:
+                self.persistent_queue.fail(queue_id, message)
+        item["status"] = "Terminé" if success else "Erreur"
+        item["progress"] = 100 if success else 0
+        if progress_callback:
+            progress_callback("queue_update", item)
+    
+    def _schedule_retry(self, item, retry, message):
+        """Replanification d'un item échoué (même outil avec backoff ou outil de repli)"""
+        tool, delay = retry["tool"], retry["delay"]
+        item["tool"] = item["force_tool"] = tool
+        item["status"] = "Nouvelle tentative"
+        item["progress"] = 0
+        
+        self.logger.warning(
+            f"🔁 {retry['failure_class']}: tentative {item['attempts'] + 1} avec {tool} "
+            f"dans {delay:.0f}s - {item['url'][:50]}..."
+        )
+        
+        emit_event("retry", "download", job_id=item["job_id"], tool=tool, domain=item["domain"],
+                   attempt=item["attempts"] + 1, delay=delay, failure_class=retry["failure_class"])
+        
+        if item.get("queue_id"):
+            self.persistent_queue.release(item["queue_id"], time.time() + delay, message, tool)
+        self.scheduler.submit(item, delay)
+        
+        if self.queue_progress_callback:
+            self.queue_progress_callback("queue_update", item)
     
     def start_queue_processing(self, progress_callback=None):
         """Démarrage du traitement de la queue"""
         if self.queue_active:
             return False, "Queue déjà active"
         
-        if not self.download_queue:
+        scheduler = self._get_scheduler()
+        if not scheduler.pending_count():
             return False, "Queue vide"
         
-        self.queue_active = True
-        self.queue_paused = False
-        
-        def process_queue():
-            self.logger.info("🚀 Démarrage traitement queue")
-            
-            while self.queue_active and self.download_queue:
-                if self.queue_paused:
-                    time.sleep(0.5)
-                    continue
-                
-                # Prendre le premier item en attente
-                item = None
-                for i, queued_item in enumerate(self.download_queue):
-                    if queued_item["status"] == "En attente":
-                        item = queued_item
-                        break
-                
-                if not item:
-                    break
-                
-                # Marquer comme en cours
-                item["status"] = "En cours"
-                if progress_callback:
-                    progress_callback("queue_update", item)
-                
-                # Télécharger
-                def item_progress(success, message, progress):
-                    item["progress"] = progress if progress >= 0 else 0
-                    if progress_callback:
-                        progress_callback("item_progress", item)
-                
-                success, message = self.download(
-                    item["url"],
-                    quality=item["quality"],
-                    force_tool=item["force_tool"],
-                    progress_callback=item_progress
-                )
-                
-                # Mettre à jour le statut
-                item["status"] = "Terminé" if success else "Erreur"
-                item["progress"] = 100 if success else 0
-                if progress_callback:
-                    progress_callback("queue_update", item)
-            
-            self.queue_active = False
-            self.logger.info("✅ Traitement queue terminé")
-            
-        self.queue_thread = threading.Thread(target=process_queue)
-        self.queue_thread.daemon = True
-        self.queue_thread.start()
+        self.queue_progress_callback = progress_callback
+        self.logger.info(f"🚀 Démarrage traitement queue ({self.max_concurrent} simultanés)")
+        scheduler.start()
         
         return True, "Queue démarrée"
     
     def pause_queue(self):
         """Pause de la queue"""
-        self.queue_paused = True
+        if self.scheduler:
+            self.scheduler.pause()
         self.logger.info("⏸️ Queue en pause")
         return True, "Queue en pause"
     
     def resume_queue(self):
         """Reprise de la queue"""
-        self.queue_paused = False
+        if self.scheduler:
+            self.scheduler.resume()
         self.logger.info("▶️ Queue reprise")
         return True, "Queue reprise"
     
     def stop_queue(self):
         """Arrêt de la queue"""
-        self.queue_active = False
-        self.queue_paused = False
+        if self.scheduler:
+            self.scheduler.stop()
         self.logger.info("⏹️ Queue arrêtée")
         return True, "Queue arrêtée"
     
     def clear_queue(self):
         """Vidage de la queue"""
+        if self.scheduler:
+            self.scheduler.clear()
+        if self.persistent_queue:
+            self.persistent_queue.clear()
+        # Items en attente d'une nouvelle tentative : leurs fichiers partiels ne seront plus repris
+        if self.security_manager and self.security_manager.is_sandbox_enabled():
+            for item in self.download_queue:
+                if item.get("status") == "Nouvelle tentative":
+                    self.security_manager.release_staging_dir(
+                        self.security_manager.staging_path(item["job_id"]), discard=True
+                    )
         self.download_queue.clear()
+        with self._inflight_lock:
+            self._inflight.clear()
         self.logger.info("🗑️ Queue vidée")
         return True, "Queue vidée"
     
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Ordonnanceur de téléchargements
+Version 3.0.0 FINAL - Créé par Metadata
+Pool de workers borné par max_concurrent avec file prête O(1)
+Limites de concurrence par domaine/outil et seaux de jetons par domaine
+File différée (tas) pour les nouvelles tentatives sans bloquer de worker
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+class TokenBucket:
+    """Seau de jetons : `rate` démarrages par seconde, rafale de `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        """Remplissage selon le temps écoulé"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now=None):
+        """Consommation d'un jeton si disponible"""
+        self._refill(now or time.monotonic())
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def time_until_available(self, now=None):
+        """Secondes avant le prochain jeton"""
+        self._refill(now or time.monotonic())
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+class SchedulingPolicy:
+    """Limites par domaine/outil et débits issus de la section `download` de la config"""
+
+    def __init__(self, config=None):
+        """Lecture des limites (0 ou absent = illimité)"""
+        config = config or {}
+        self.per_domain_limit = int(config.get("per_domain_limit", 0) or 0)
+        self.domain_limits = dict(config.get("domain_limits", {}))
+        self.tool_limits = dict(config.get("tool_limits", {}))
+        self.default_rate = dict(config.get("rate_limit", {}) or {})
+        self.domain_rates = dict(config.get("domain_rate_limits", {}))
+        self._buckets = {}
+        self._shared_buckets = {}
+
+    @staticmethod
+    def _match(mapping, domain):
+        """Règle la plus spécifique par suffixe de domaine (sub.bunkr.cr → bunkr.cr) : (clé, valeur)"""
+        if not mapping:
+            return None, None
+        labels = domain.split(".")
+        for i in range(len(labels)):
+            key = ".".join(labels[i:])
+            value = mapping.get(key)
+            if value is not None:
+                return key, value
+        return None, None
+
+    @classmethod
+    def _lookup(cls, mapping, domain):
+        """Valeur de la règle qui s'applique au domaine"""
+        return cls._match(mapping, domain)[1]
+
+    def limit_key(self, domain):
+        """Clé de comptage de la concurrence : la règle de domain_limits partagée par les sous-domaines"""
+        return self._match(self.domain_limits, domain)[0] or domain
+
+    def domain_limit(self, domain):
+        """Concurrence maximale pour un domaine (None = illimité)"""
+        limit = self._lookup(self.domain_limits, domain)
+        if limit is None:
+            limit = self.per_domain_limit
+        return int(limit) or None
+
+    def tool_limit(self, tool):
+        """Concurrence maximale pour un outil (None = illimité)"""
+        return int(self.tool_limits.get(tool, 0) or 0) or None
+
+    def bucket(self, domain):
+        """Seau de jetons du domaine (None si pas de limite de débit), commun aux sous-domaines d'une règle"""
+        if domain in self._buckets:
+            return self._buckets[domain]
+
+        key, config = self._match(self.domain_rates, domain)
+        if key is None:
+            key, config = domain, self.default_rate
+        if key not in self._shared_buckets:
+            rate = float(config.get("rate", 0) or 0)
+            self._shared_buckets[key] = TokenBucket(rate, config.get("burst", 1)) if rate > 0 else None
+        bucket = self._buckets[domain] = self._shared_buckets[key]
+        return bucket
+
+class DownloadScheduler:
+    """Pool de workers borné alimenté par une file prête par domaine"""
+
+    def __init__(self, worker, max_workers=4, on_idle=None, policy=None):
+        """Initialisation du pool (les threads sont créés au démarrage)"""
+        self.worker = worker
+        self.max_workers = max(1, int(max_workers))
+        self.on_idle = on_idle
+        self.policy = policy or SchedulingPolicy()
+        self.logger = get_logger(__name__)
+
+        # Files prêtes par domaine + anneau des domaines non vides (round-robin O(1))
+        self._ready = {}
+        self._ring = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._running_by_domain = {}
+        self._running_by_tool = {}
+        self._wait_hint = 0.5
+
+        # Items planifiés plus tard : (échéance, séquence, item)
+        self._delayed = []
+        self._sequence = itertools.count()
+
+        # État
+        self.active = False
+        self.paused = False
+
+    def submit(self, item, delay=0):
+        """Ajout d'un item dans la file prête (ou différée si `delay` > 0)"""
+        with self._cond:
+            if delay and delay > 0:
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), item))
+            else:
+                self._push_ready(item)
+            self._pending += 1
+            self._cond.notify()
+
+    def _push_ready(self, item):
+        """Insertion dans la file prête de son domaine (appelé sous verrou)"""
+        domain = item.get("domain", "")
+        queue = self._ready.get(domain)
+        if queue is None:
+            queue = self._ready[domain] = deque()
+        if not queue:
+            self._ring.append(domain)
+        queue.append(item)
+
+    def pending_count(self):
+        """Nombre d'items en attente"""
+        with self._cond:
+            return self._pending
+
+    def running_count(self):
+        """Nombre d'items en cours"""
+        with self._cond:
+            return self._running
+
+    def clear(self):
+        """Vidage de la file prête (les items en cours continuent)"""
+        with self._cond:
+            self._ready.clear()
+            self._ring.clear()
+            self._delayed.clear()
+            self._pending = 0
+
+    def start(self):
+        """Démarrage des workers"""
+        with self._cond:
+            if self.active:
+                return False
+
+            self.active = True
+            self.paused = False
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"download-worker-{i}", daemon=True)
+                for i in range(self.max_workers)
+            ]
+
+        for thread in self._threads:
+            thread.start()
+
+        self.logger.info(f"🚀 Ordonnanceur démarré ({self.max_workers} workers)")
+        return True
+
+    def pause(self):
+        """Pause : les items en cours terminent, aucun nouvel item n'est pris"""
+        with self._cond:
+            self.paused = True
+
+    def resume(self):
+        """Reprise des workers"""
+        with self._cond:
+            self.paused = False
+            self._cond.notify_all()
+
+    def stop(self):
+        """Arrêt : les items restants restent dans la file prête"""
+        with self._cond:
+            self.active = False
+            self.paused = False
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Attente de la fin des workers"""
+        for thread in list(self._threads):
+            thread.join(timeout)
+
+    def _next_item(self):
+        """Retrait du prochain item éligible (appelé sous verrou), None si rien à prendre"""
+        self._wait_hint = 0.5
+        if self.paused or not self._pending:
+            return None
+
+        now = time.monotonic()
+
+        # Promotion des items différés arrivés à échéance
+        while self._delayed and self._delayed[0][0] <= now:
+            self._push_ready(heapq.heappop(self._delayed)[2])
+        if self._delayed:
+            self._wait_hint = min(self._wait_hint, self._delayed[0][0] - now)
+
+        for _ in range(len(self._ring)):
+            domain = self._ring[0]
+            self._ring.rotate(-1)
+            queue = self._ready[domain]
+
+            # Limites de concurrence domaine / outil (comptées par règle : cdn1/cdn2.bunkr.cr → bunkr.cr)
+            domain_limit = self.policy.domain_limit(domain)
+            limit_key = self.policy.limit_key(domain)
+            if domain_limit and self._running_by_domain.get(limit_key, 0) >= domain_limit:
+                continue
+
+            tool = queue[0].get("tool")
+            tool_limit = self.policy.tool_limit(tool)
+            if tool_limit and self._running_by_tool.get(tool, 0) >= tool_limit:
+                continue
+
+            # Limite de débit du domaine
+            bucket = self.policy.bucket(domain)
+            if bucket and not bucket.try_acquire(now):
+                self._wait_hint = min(self._wait_hint, bucket.time_until_available(now))
+                continue
+
+            item = queue.popleft()
+            if not queue:
+                # Le domaine vient de passer en fin d'anneau
+                self._ring.pop()
+            self._pending -= 1
+            self._running_by_domain[limit_key] = self._running_by_domain.get(limit_key, 0) + 1
+            self._running_by_tool[tool] = self._running_by_tool.get(tool, 0) + 1
+            return item
+
+        return None
+
+    def _release(self, domain, tool):
+        """Libération des compteurs d'un item terminé (appelé sous verrou)"""
+        for counters, key in ((self._running_by_domain, domain), (self._running_by_tool, tool)):
+            counters[key] -= 1
+            if not counters[key]:
+                del counters[key]
+
+    def _is_drained(self):
+        """File vide et plus aucun item en cours (appelé sous verrou)"""
+        return not self._pending and self._running == 0
+
+    def _worker_loop(self):
+        """Boucle d'un worker"""
+        while True:
+            with self._cond:
+                item = None
+                while self.active:
+                    item = self._next_item()
+                    if item is not None:
+                        break
+
+                    if not self.paused and self._is_drained():
+                        # Plus rien à faire : on libère tous les workers
+                        self.active = False
+                        self._cond.notify_all()
+                        if self.on_idle:
+                            self.on_idle()
+                        break
+
+                    self._cond.wait(max(0.01, self._wait_hint))
+
+                if item is None:
+                    return
+
+                self._running += 1
+                # Clés comptées au départ (le worker peut changer l'outil pour une nouvelle tentative)
+                charged = (self.policy.limit_key(item.get("domain", "")), item.get("tool"))
+
+            try:
+                self.worker(item)
+            except Exception as e:
+                self.logger.error(f"💥 Erreur worker: {e}")
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._release(*charged)
+                    self._cond.notify_all()
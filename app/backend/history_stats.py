@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Agrégats horaires de l'historique des téléchargements
+Version 3.0.0 FINAL - Créé par Metadata
+Tables domaine/outil/heure mises à jour par incréments, percentiles par histogramme
+"""
+
+import math
+import time
+
+# Histogramme logarithmique : 4 seaux par doublement de durée (~19 % de résolution)
+BUCKETS_PER_OCTAVE = 4
+MIN_DURATION = 0.25
+
+def duration_bucket(duration):
+    """Seau d'une durée (secondes)"""
+    return int(math.floor(math.log2(max(duration, MIN_DURATION)) * BUCKETS_PER_OCTAVE))
+
+def bucket_value(bucket):
+    """Durée représentative d'un seau (centre géométrique)"""
+    return 2 ** ((bucket + 0.5) / BUCKETS_PER_OCTAVE)
+
+def percentiles(histogram, quantiles=(0.5, 0.95)):
+    """Percentiles depuis [(seau, effectif)] trié par seau"""
+    total = sum(count for _, count in histogram)
+    if not total:
+        return [None for _ in quantiles]
+
+    results = []
+    for quantile in quantiles:
+        target = quantile * total
+        cumulative = 0
+        for bucket, count in histogram:
+            cumulative += count
+            if cumulative >= target:
+                results.append(bucket_value(bucket))
+                break
+    return results
+
+def hour_of(timestamp):
+    """Heure (epoch / 3600) d'un horodatage"""
+    return int(timestamp // 3600)
+
+def create_schema(conn):
+    """Tables d'agrégats (idempotent)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS download_stats_hourly (
+            domain TEXT NOT NULL,
+            tool TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            successes INTEGER NOT NULL DEFAULT 0,
+            total_bytes INTEGER NOT NULL DEFAULT 0,
+            timed_seconds REAL NOT NULL DEFAULT 0,
+            timed_count INTEGER NOT NULL DEFAULT 0,
+            p50_duration REAL,
+            p95_duration REAL,
+            PRIMARY KEY (domain, tool, hour)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS download_duration_buckets (
+            domain TEXT NOT NULL,
+            tool TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (domain, tool, hour, bucket)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stats_hour ON download_stats_hourly(hour)")
+
+def apply_results(conn, results):
+    """Incrément des agrégats pour un lot de (domain, tool, success, duration, file_size, timestamp)"""
+    rows = {}
+    buckets = {}
+    for domain, tool, success, duration, file_size, timestamp in results:
+        key = (domain, tool, hour_of(timestamp))
+        row = rows.setdefault(key, [0, 0, 0, 0.0, 0])
+        row[0] += 1
+        if success:
+            row[1] += 1
+            if duration and duration > 0:
+                bucket_key = key + (duration_bucket(duration),)
+                buckets[bucket_key] = buckets.get(bucket_key, 0) + 1
+                # Débit : seulement les succès dont la taille est connue
+                if file_size and file_size > 0:
+                    row[2] += file_size
+                    row[3] += duration
+                    row[4] += 1
+
+    conn.executemany("""
+        INSERT INTO download_stats_hourly
+        (domain, tool, hour, attempts, successes, total_bytes, timed_seconds, timed_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(domain, tool, hour) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            successes = successes + excluded.successes,
+            total_bytes = total_bytes + excluded.total_bytes,
+            timed_seconds = timed_seconds + excluded.timed_seconds,
+            timed_count = timed_count + excluded.timed_count
+    """, [key + tuple(row) for key, row in rows.items()])
+
+    conn.executemany("""
+        INSERT INTO download_duration_buckets (domain, tool, hour, bucket, count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(domain, tool, hour, bucket) DO UPDATE SET count = count + excluded.count
+    """, [key + (count,) for key, count in buckets.items()])
+
+    # Percentiles matérialisés des seules lignes touchées
+    touched = {key[:3] for key in buckets}
+    for domain, tool, hour in touched:
+        histogram = conn.execute("""
+            SELECT bucket, count FROM download_duration_buckets
+            WHERE domain = ? AND tool = ? AND hour = ? ORDER BY bucket
+        """, (domain, tool, hour)).fetchall()
+        p50, p95 = percentiles(histogram)
+        conn.execute("""
+            UPDATE download_stats_hourly SET p50_duration = ?, p95_duration = ?
+            WHERE domain = ? AND tool = ? AND hour = ?
+        """, (p50, p95, domain, tool, hour))
+
+def backfill(conn):
+    """Reconstruction des agrégats depuis l'historique brut (bases antérieures)"""
+    if conn.execute("SELECT 1 FROM download_stats_hourly LIMIT 1").fetchone():
+        return 0
+    rows = conn.execute("""
+        SELECT domain, tool_used, success, duration, file_size, strftime('%s', timestamp)
+        FROM download_history
+    """).fetchall()
+    apply_results(conn, [row[:5] + (float(row[5] or time.time()),) for row in rows])
+    return len(rows)
+
+def _since_clause(since_hours):
+    """Filtre optionnel sur les N dernières heures"""
+    if since_hours is None:
+        return "", ()
+    return " AND hour >= ?", (hour_of(time.time()) - since_hours,)
+
+def tool_rows(conn):
+    """(domain, tool, successes, failures, bytes, seconds, timed) pour le bandit"""
+    return conn.execute("""
+        SELECT domain, tool, SUM(successes), SUM(attempts) - SUM(successes),
+               SUM(total_bytes), SUM(timed_seconds), SUM(timed_count)
+        FROM download_stats_hourly
+        GROUP BY domain, tool
+    """).fetchall()
+
+def site_statistics(conn, domain=None, since_hours=None):
+    """Statistiques par outil (domaine donné) ou globales, depuis les agrégats"""
+    clause, params = _since_clause(since_hours)
+    where = "WHERE 1 = 1" + clause
+    if domain:
+        where += " AND domain = ?"
+        params += (domain,)
+
+    per_tool = conn.execute(f"""
+        SELECT tool, SUM(attempts), SUM(successes), SUM(total_bytes), SUM(timed_seconds)
+        FROM download_stats_hourly {where}
+        GROUP BY tool
+    """, params).fetchall()
+    histograms = {}
+    for tool, bucket, count in conn.execute(f"""
+        SELECT tool, bucket, SUM(count) FROM download_duration_buckets {where}
+        GROUP BY tool, bucket ORDER BY tool, bucket
+    """, params):
+        histograms.setdefault(tool, []).append((bucket, count))
+
+    tools = []
+    for tool, attempts, successes, total_bytes, seconds in per_tool:
+        p50, p95 = percentiles(histograms.get(tool, []))
+        tools.append({
+            "tool": tool,
+            "attempts": attempts,
+            "successes": successes,
+            "success_rate": successes / attempts if attempts else 0.0,
+            "total_bytes": total_bytes,
+            "throughput": total_bytes / seconds if seconds else None,
+            "p50_duration": p50,
+            "p95_duration": p95,
+        })
+    tools.sort(key=lambda entry: entry["attempts"], reverse=True)
+
+    if domain:
+        return tools
+
+    attempts = sum(entry["attempts"] for entry in tools)
+    successes = sum(entry["successes"] for entry in tools)
+    total_sites = conn.execute(
+        f"SELECT COUNT(DISTINCT domain) FROM download_stats_hourly WHERE 1 = 1{clause}", params
+    ).fetchone()[0]
+    return {
+        "total_sites": total_sites,
+        "attempts": attempts,
+        "successes": successes,
+        "failures": attempts - successes,
+        "success_rate": successes / attempts if attempts else 0.0,
+        "total_bytes": sum(entry["total_bytes"] for entry in tools),
+        "tools": tools,
+    }
+
+def hourly_trend(conn, domain, tool=None, since_hours=24 * 7):
+    """Série horaire (heure, tentatives, succès, octets, p50, p95) d'un domaine"""
+    clause, params = _since_clause(since_hours)
+    sql = """
+        SELECT hour, SUM(attempts), SUM(successes), SUM(total_bytes), MAX(p50_duration), MAX(p95_duration)
+        FROM download_stats_hourly WHERE domain = ?
+    """
+    params = (domain,) + params
+    if tool:
+        clause += " AND tool = ?"
+        params += (tool,)
+    return conn.execute(sql + clause + " GROUP BY hour ORDER BY hour", params).fetchall()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Moteur intégré yt-dlp / gallery-dl
+Version 3.0.0 FINAL - Créé par Metadata
+API Python des outils dans des processus workers réutilisés : ni démarrage d'interpréteur ni import par URL
+"""
+
+import atexit
+import importlib.util
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from multiprocessing.connection import wait
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    def get_logger(name):
+        return logging.getLogger(name)
+
+try:
+    from backend.process_watchdog import kill_process_tree
+except ImportError:
+    from .process_watchdog import kill_process_tree
+
+# Modules Python des outils pris en charge
+TOOL_MODULES = {
+    "yt-dlp": "yt_dlp",
+    "gallery-dl": "gallery_dl",
+}
+# Code retour : outil non importable dans le worker (le DownloadManager repasse en sous-processus)
+UNAVAILABLE = -1000
+# Lignes de journal conservées par téléchargement (output_tail)
+MAX_OUTPUT_LINES = 200
+# Intervalle minimal entre deux progressions envoyées (les hooks sont appelés à chaque bloc reçu)
+PROGRESS_INTERVAL = 0.1
+
+@lru_cache(maxsize=None)
+def module_available(tool):
+    """Outil utilisable par le moteur intégré (module installé, sans l'importer ici)"""
+    module = TOOL_MODULES.get(tool)
+    return module is not None and importlib.util.find_spec(module) is not None
+
+# --- Côté worker -------------------------------------------------------------
+
+def _progress_sender(send):
+    """Envoi des progressions limité à PROGRESS_INTERVAL (fichier terminé : toujours envoyé)"""
+    last = [0.0]
+
+    def send_progress(fields):
+        now = time.monotonic()
+        if fields[5] or now - last[0] >= PROGRESS_INTERVAL:
+            last[0] = now
+            send("progress", fields)
+
+    return send_progress
+
+class _ToolLogHandler(logging.Handler):
+    """Journal de l'outil (loggers gallery-dl) renvoyé au processus principal"""
+
+    def __init__(self, send):
+        super().__init__(logging.INFO)
+        self.send = send
+
+    def emit(self, record):
+        try:
+            self.send("log", record.getMessage())
+        except Exception:
+            pass
+
+class _YtDlpLogger:
+    """Logger yt-dlp : messages d'écran et avertissements ([debug] ignoré)"""
+
+    def __init__(self, send):
+        self.send = send
+
+    def debug(self, msg):
+        if not msg.startswith("[debug] "):
+            self.send("log", msg)
+
+    info = warning = error = debug
+
+def _run_ytdlp(params, url, send):
+    """Téléchargement via yt_dlp.YoutubeDL ; progression par progress_hooks"""
+    import yt_dlp
+    import yt_dlp.postprocessor
+    send_progress = _progress_sender(send)
+
+    def progress_hook(d):
+        downloaded = d.get("downloaded_bytes")
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        finished = d["status"] == "finished"
+        percent = 100.0 if finished else (min(100.0, downloaded * 100.0 / total) if downloaded and total else None)
+        send_progress((percent, downloaded, total, d.get("speed"), d.get("eta"), finished, d.get("filename")))
+
+    class FinalPath(yt_dlp.postprocessor.PostProcessor):
+        """Chemin final après déplacement (équivalent de --print after_move:filepath)"""
+
+        def run(self, info):
+            if info.get("filepath"):
+                send("file", info["filepath"])
+            return [], info
+
+    options = dict(params)
+    options.update({
+        "quiet": True,
+        "noprogress": True,
+        "logger": _YtDlpLogger(send),
+        "progress_hooks": [progress_hook],
+    })
+    with yt_dlp.YoutubeDL(options) as ydl:
+        # Les hooks de post-traitement voient l'info d'avant déplacement : étape dédiée après MoveFiles
+        ydl.add_post_processor(FinalPath(ydl), when="after_move")
+        return ydl.download([url])
+
+class _GalleryDlOutput:
+    """Sortie gallery-dl (job.out) : fichiers terminés, ignorés et progression"""
+
+    def __init__(self, send):
+        self.send = send
+        self.send_progress = _progress_sender(send)
+
+    def start(self, path):
+        pass
+
+    def skip(self, path):
+        self.send("log", f"# {path}")
+
+    def success(self, path, *args):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        self.send_progress((100.0, size, size, None, None, True, path))
+
+    def progress(self, bytes_total, bytes_downloaded, bytes_per_second):
+        percent = min(100.0, bytes_downloaded * 100.0 / bytes_total) if bytes_total else None
+        self.send_progress((percent, bytes_downloaded, bytes_total or None, bytes_per_second, None, False, None))
+
+# Configuration utilisateur chargée dans ce worker ; absence de valeur d'origine
+_gallerydl_loaded = False
+_MISSING = object()
+
+def _run_gallerydl(params, url, send):
+    """Téléchargement via gallery_dl.job.DownloadJob ; clés de configuration posées le temps du job"""
+    global _gallerydl_loaded
+    from gallery_dl import config, job
+
+    if not _gallerydl_loaded:
+        # Fichiers gallery-dl habituels, chargés une fois par worker
+        config.load()
+        _gallerydl_loaded = True
+    # Valeurs utilisateur remplacées par ce job, restaurées à la fin (jamais supprimées)
+    saved = {key: config.get(("extractor",), key, _MISSING) for key in params}
+    for key, value in params.items():
+        config.set(("extractor",), key, value)
+
+    # Loggers gallery-dl (job, extracteurs par catégorie) : tous sous la racine
+    handler = _ToolLogHandler(send)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+    try:
+        download_job = job.DownloadJob(url)
+        download_job.out = _GalleryDlOutput(send)
+        return download_job.run()
+    finally:
+        root.removeHandler(handler)
+        for key, value in saved.items():
+            if value is _MISSING:
+                config.unset(("extractor",), key)
+            else:
+                config.set(("extractor",), key, value)
+
+RUNNERS = {
+    "yt-dlp": _run_ytdlp,
+    "gallery-dl": _run_gallerydl,
+}
+
+def _worker_main(conn, preload):
+    """Boucle d'un worker : un téléchargement à la fois, jusqu'au message None"""
+    if hasattr(os, "setsid"):
+        # Chef de groupe : le watchdog arrête le worker et ses enfants (ffmpeg) d'un coup
+        try:
+            os.setsid()
+        except OSError:
+            pass
+    for tool in preload:
+        try:
+            __import__(TOOL_MODULES[tool])
+        except Exception:
+            pass
+
+    def send(kind, data):
+        conn.send((kind, data))
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        tool, params, url = task
+        try:
+            code = RUNNERS[tool](params, url, send)
+        except ImportError as e:
+            send("log", f"❌ {tool} non importable: {e}")
+            code = UNAVAILABLE
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            send("log", f"💥 {type(e).__name__}: {e}")
+            code = 1
+        send("done", code)
+
+# --- Côté processus principal -------------------------------------------------
+
+class _PendingJob:
+    """Téléchargement en cours dans un worker"""
+
+    __slots__ = ("tool", "on_event", "lines", "return_code", "done")
+
+    def __init__(self, tool, on_event):
+        self.tool = tool
+        self.on_event = on_event
+        self.lines = deque(maxlen=MAX_OUTPUT_LINES)
+        self.return_code = None
+        self.done = threading.Event()
+
+class _Worker:
+    __slots__ = ("process", "conn", "job")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.job = None
+
+class InProcessEngine:
+    """Pool de workers (spawn) réutilisés ; un thread répartit leurs événements"""
+
+    def __init__(self, idle_workers=2, preload=("yt-dlp", "gallery-dl")):
+        self.logger = get_logger(__name__)
+        self.idle_workers = max(0, idle_workers)
+        self.preload = tuple(tool for tool in preload if module_available(tool))
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._busy = set()
+        # Outils non importables dans les workers (détecté au premier téléchargement)
+        self.unavailable = set()
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = multiprocessing.Pipe(duplex=False)
+        self._dispatcher = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def supports(self, tool):
+        """Outil exécutable par le moteur intégré (sinon : sous-processus)"""
+        return tool not in self.unavailable and module_available(tool)
+
+    def _spawn(self):
+        """Nouveau worker (imports des outils faits une fois, au démarrage)"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.preload), name="prismfetch-worker", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self.logger.debug(f"🧵 Worker intégré démarré (pid {process.pid})")
+        return _Worker(process, parent_conn)
+
+    def _acquire(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.conn.close()
+        return self._spawn()
+
+    def run(self, tool, params, url, on_event=None, watch=None, timeout=None):
+        """Téléchargement bloquant dans un worker ; retourne (code_retour, lignes_de_journal)
+
+        `on_event(kind, data)` reçoit "progress" (champs d'un ProgressRecord), "file" (chemin final)
+        et "log" (message). Code UNAVAILABLE si l'outil n'est pas importable dans le worker.
+        """
+        worker = self._acquire()
+        job = _PendingJob(tool, on_event)
+        with self._lock:
+            worker.job = job
+            self._busy.add(worker)
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch, name="inprocess-dispatcher", daemon=True)
+                self._dispatcher.start()
+        worker.conn.send((tool, params, url))
+        if watch:
+            watch.attach(worker.process.pid)
+        self._wake_w.send(None)
+
+        if not job.done.wait(timeout):
+            # Délai dépassé : le worker est sacrifié (remplacé au prochain téléchargement)
+            kill_process_tree(worker.process.pid, force=True)
+            job.done.wait()
+            raise TimeoutError(f"{tool}: délai de {timeout}s dépassé")
+        return job.return_code, list(job.lines)
+
+    def _dispatch(self):
+        """Lecture des événements de tous les workers occupés"""
+        while not (self._closed and not self._busy):
+            with self._lock:
+                busy = list(self._busy)
+            waitables = {self._wake_r: None}
+            for worker in busy:
+                waitables[worker.conn] = worker
+                waitables[worker.process.sentinel] = worker
+            for ready in wait(list(waitables), timeout=1.0):
+                worker = waitables[ready]
+                if worker is None:
+                    while self._wake_r.poll():
+                        self._wake_r.recv()
+                elif worker in self._busy:
+                    self._drain(worker)
+
+    def _drain(self, worker):
+        """Événements disponibles d'un worker ; worker mort → téléchargement en échec"""
+        job = worker.job
+        try:
+            while worker.conn.poll():
+                kind, data = worker.conn.recv()
+                if kind == "done":
+                    self._finish(worker, data)
+                    return
+                if kind == "log":
+                    job.lines.append(data)
+                if job.on_event:
+                    try:
+                        job.on_event(kind, data)
+                    except Exception as e:
+                        self.logger.error(f"❌ Callback moteur intégré: {e}")
+        except (EOFError, OSError):
+            pass
+        if not worker.process.is_alive():
+            worker.process.join()
+            self.logger.warning(f"⚠️ Worker {worker.process.pid} arrêté (code {worker.process.exitcode})")
+            self._finish(worker, worker.process.exitcode, reuse=False)
+
+    def _finish(self, worker, code, reuse=True):
+        """Fin d'un téléchargement ; le worker rejoint les inactifs (dans la limite idle_workers)"""
+        job = worker.job
+        with self._lock:
+            self._busy.discard(worker)
+            worker.job = None
+            keep = reuse and not self._closed and len(self._idle) < self.idle_workers
+            if keep:
+                self._idle.append(worker)
+        if not keep:
+            self._stop(worker)
+        if code == UNAVAILABLE:
+            self.unavailable.add(job.tool)
+        job.return_code = code
+        job.done.set()
+
+    @staticmethod
+    def _stop(worker):
+        """Fin de boucle demandée au worker"""
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.conn.close()
+
+    def close(self):
+        """Arrêt des workers inactifs (les téléchargements en cours se terminent)"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._stop(worker)
+        for worker in idle:
+            worker.process.join(timeout=2)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_inprocess_engine(idle_workers=2):
+    """Moteur intégré partagé par les deux DownloadManager"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = InProcessEngine(idle_workers)
+        return _engine
@@ -9,7 +9,11 @@ Module temporaire pour éviter les erreurs d'import
 import re
 import json
 from pathlib import Path
-from urllib.parse import urlparse
+
+try:
+    from backend.domain_router import get_domain_router
+except ImportError:
+    from .domain_router import get_domain_router
 
 class IntelligentRenamer:
     """Renommeur intelligent contextuel (version préventive)"""
@@ -26,15 +30,17 @@ class IntelligentRenamer:
     
     def detect_content_type(self, url, metadata=None):
         """Détection du type de contenu"""
-        domain = urlparse(url).netloc.lower()
+        route = get_domain_router().route_url(url)
+        if not route:
+            return "default"
         
-        if "e-hentai" in domain or "nhentai" in domain:
+        if route.category == "gallery" and route.adult:
             return "manga"
-        elif any(adult_site in domain for adult_site in ["pornhub", "xvideos", "erome"]):
+        elif route.category == "adult":
             return "video_adult"
-        elif any(music_site in domain for music_site in ["soundcloud", "bandcamp"]):
+        elif route.category == "audio":
             return "music"
-        elif "youtube" in domain:
+        elif route.site in ("youtube.com", "youtu.be"):
             return "video_youtube"
         else:
             return "default"
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Queue de téléchargement persistante
+Version 3.0.0 FINAL - Créé par Metadata
+SQLite WAL, transitions atomiques pending/running/done/failed et baux
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class PersistentQueue:
+    """Queue durable : survit aux crashs et à la fermeture de la fenêtre"""
+
+    def __init__(self, db_path="data/download_queue.db"):
+        """Ouverture (connexion unique et longue durée en mode WAL)"""
+        self.db_path = Path(db_path)
+        self.logger = get_logger(__name__)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._init_database()
+
+    def _init_database(self):
+        """Création du schéma et des index de réclamation"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    quality TEXT DEFAULT 'best',
+                    force_tool TEXT,
+                    tool TEXT,
+                    domain TEXT,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    available_at REAL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    error TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            # Réclamation du prochain item et récupération des baux expirés en O(log n)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_queue_claim ON queue_items(state, available_at, id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_queue_lease ON queue_items(state, lease_expires)"
+            )
+
+    def enqueue(self, url, quality="best", force_tool=None, tool=None, domain=None):
+        """Ajout d'un item en attente ; retourne son identifiant"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("""
+                INSERT INTO queue_items
+                (url, quality, force_tool, tool, domain, state, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (url, quality, force_tool, tool, domain, PENDING, now, now, now))
+            return cursor.lastrowid
+
+    def enqueue_many(self, items):
+        """Ajout en une transaction d'une liste de dicts (url, quality, force_tool, tool, domain)"""
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for item in items:
+                    cursor = self._conn.execute("""
+                        INSERT INTO queue_items
+                        (url, quality, force_tool, tool, domain, state, available_at, created_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (item["url"], item.get("quality", "best"), item.get("force_tool"),
+                          item.get("tool"), item.get("domain"), PENDING, now, now, now))
+                    ids.append(cursor.lastrowid)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def claim(self, item_id, lease_seconds, owner=None):
+        """Passage atomique pending → running d'un item précis (False si déjà pris)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("""
+                UPDATE queue_items
+                SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ? AND state = ?
+            """, (RUNNING, owner or self.owner, now + lease_seconds, now, item_id, PENDING))
+            return cursor.rowcount == 1
+
+    def claim_next(self, lease_seconds, owner=None):
+        """Réclamation du prochain item disponible (dict) ou None"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("""
+                    SELECT * FROM queue_items
+                    WHERE state = ? AND available_at <= ?
+                    ORDER BY available_at, id
+                    LIMIT 1
+                """, (PENDING, now)).fetchone()
+
+                if row:
+                    self._conn.execute("""
+                        UPDATE queue_items
+                        SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                        WHERE id = ?
+                    """, (RUNNING, owner or self.owner, now + lease_seconds, now, row["id"]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(row) if row else None
+
+    def renew(self, item_id, lease_seconds, owner=None):
+        """Prolongation du bail d'un item en cours"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("""
+                UPDATE queue_items SET lease_expires = ?, updated_at = ?
+                WHERE id = ? AND state = ? AND lease_owner = ?
+            """, (now + lease_seconds, now, item_id, RUNNING, owner or self.owner))
+            return cursor.rowcount == 1
+
+    def complete(self, item_id):
+        """Passage running → done"""
+        self._set_state(item_id, DONE)
+
+    def fail(self, item_id, error=None):
+        """Passage running → failed"""
+        self._set_state(item_id, FAILED, error)
+
+    def release(self, item_id, available_at=None, error=None, tool=None):
+        """Retour en attente (arrêt ou nouvelle tentative planifiée, éventuellement avec un autre outil)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                UPDATE queue_items
+                SET state = ?, lease_owner = NULL, lease_expires = NULL,
+                    available_at = ?, error = COALESCE(?, error),
+                    tool = COALESCE(?, tool), force_tool = COALESCE(?, force_tool), updated_at = ?
+                WHERE id = ?
+            """, (PENDING, available_at or now, error, tool, tool, now, item_id))
+
+    def _set_state(self, item_id, state, error=None):
+        """Transition terminale"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                UPDATE queue_items
+                SET state = ?, lease_owner = NULL, lease_expires = NULL, error = ?, updated_at = ?
+                WHERE id = ?
+            """, (state, error, now, item_id))
+
+    @staticmethod
+    def _pid_alive(pid):
+        """Processus encore présent (None si on ne peut pas le savoir)"""
+        try:
+            import psutil
+            return psutil.pid_exists(pid)
+        except ImportError:
+            pass
+        if os.name == "nt":
+            # os.kill termine le processus sous Windows : pas de sonde sans psutil
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            # Processus existant appartenant à un autre utilisateur
+            return True
+        return True
+
+    def _owner_gone(self, owner):
+        """Bail tenu sur cette machine par un processus qui n'existe plus (instance arrêtée ou crashée)
+
+        Une autre instance vivante garde ses items ; un PID réattribué entre-temps laisse le bail expirer.
+        """
+        host, _, pid = (owner or "").rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+            return False
+        return self._pid_alive(int(pid)) is False
+
+    def recover_stale(self):
+        """Remise en attente des items 'running' interrompus : bail expiré ou propriétaire local disparu (crash)"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, lease_owner, lease_expires FROM queue_items WHERE state = ?", (RUNNING,)
+            ).fetchall()
+            stale = [
+                (PENDING, now, row["id"], RUNNING) for row in rows
+                if row["lease_expires"] is None or row["lease_expires"] < now or self._owner_gone(row["lease_owner"])
+            ]
+            self._conn.executemany("""
+                UPDATE queue_items
+                SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND state = ?
+            """, stale)
+            recovered = len(stale)
+
+        if recovered:
+            self.logger.info(f"♻️ {recovered} items interrompus remis en attente")
+        return recovered
+
+    def iter_pending(self, batch_size=1000):
+        """Parcours des items en attente par lots (ordre d'insertion)"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute("""
+                    SELECT * FROM queue_items
+                    WHERE state = ? AND id > ?
+                    ORDER BY id LIMIT ?
+                """, (PENDING, last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_id = rows[-1]["id"]
+
+    def counts(self):
+        """Nombre d'items par état"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM queue_items GROUP BY state"
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+    def clear(self, states=(PENDING,)):
+        """Suppression des items dans les états donnés"""
+        placeholders = ",".join("?" for _ in states)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM queue_items WHERE state IN ({placeholders})", tuple(states)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        """Fermeture de la connexion"""
+        with self._lock:
+            self._conn.close()
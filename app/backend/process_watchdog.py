@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Watchdog des processus de téléchargement
+Version 3.0.0 FINAL - Créé par Metadata
+Délai global, détection de blocage et arrêt de l'arbre de processus
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+# Délai entre SIGTERM et SIGKILL
+KILL_GRACE = 5.0
+
+def popen_group_kwargs():
+    """Arguments Popen/create_subprocess_exec pour isoler l'arbre de processus"""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+def kill_process_tree(pid, force=False):
+    """Arrêt d'un processus et de tous ses descendants"""
+    try:
+        import psutil
+        try:
+            parent = psutil.Process(pid)
+            processes = parent.children(recursive=True) + [parent]
+        except psutil.NoSuchProcess:
+            return
+        for process in processes:
+            try:
+                process.kill() if force else process.terminate()
+            except psutil.NoSuchProcess:
+                pass
+        return
+    except ImportError:
+        pass
+
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        else:
+            # Le processus est chef de session (start_new_session) : pgid == pid
+            os.killpg(pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+class WatchedProcess:
+    """État surveillé d'un processus enfant"""
+
+    __slots__ = ("label", "pid", "started", "last_output", "last_progress",
+                 "last_progress_change", "timeout", "stall_timeout",
+                 "progress_stall_timeout", "failure", "killed_at")
+
+    def __init__(self, label, timeout=None, stall_timeout=None, progress_stall_timeout=None):
+        now = time.monotonic()
+        self.label = label
+        self.pid = None
+        self.started = now
+        self.last_output = now
+        self.last_progress = None
+        self.last_progress_change = now
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.progress_stall_timeout = progress_stall_timeout
+        self.failure = None
+        self.killed_at = None
+
+    def attach(self, pid):
+        """Association au processus réellement lancé"""
+        now = time.monotonic()
+        self.pid = pid
+        self.started = now
+        self.last_output = now
+        self.last_progress_change = now
+
+    def touch(self, progress=None):
+        """Signal d'activité (ligne de sortie, éventuellement avec progression)"""
+        now = time.monotonic()
+        self.last_output = now
+        if progress is not None and progress >= 0 and progress != self.last_progress:
+            self.last_progress = progress
+            self.last_progress_change = now
+
+    def file_done(self):
+        """Fichier terminé : le suivi de progression repart pour le fichier suivant"""
+        now = time.monotonic()
+        self.last_output = now
+        self.last_progress = None
+        self.last_progress_change = now
+
+    def check(self, now):
+        """Raison d'échec si une limite est dépassée, sinon None"""
+        elapsed = now - self.started
+        if self.timeout and elapsed > self.timeout:
+            return {"reason": "timeout", "detail": f"⏰ Timeout après {self.timeout}s", "elapsed": elapsed}
+
+        silent = now - self.last_output
+        if self.stall_timeout and silent > self.stall_timeout:
+            return {"reason": "stall", "detail": f"🧊 Aucune sortie depuis {silent:.0f}s", "elapsed": elapsed}
+
+        frozen = now - self.last_progress_change
+        if (self.progress_stall_timeout and self.last_progress is not None
+                and frozen > self.progress_stall_timeout):
+            return {"reason": "no_progress",
+                    "detail": f"🧊 Progression figée à {self.last_progress:.1f}% depuis {frozen:.0f}s",
+                    "elapsed": elapsed}
+
+        return None
+
+class ProcessWatchdog:
+    """Thread unique surveillant tous les processus de téléchargement"""
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.logger = get_logger(__name__)
+        self._watched = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, label, timeout=None, stall_timeout=None, progress_stall_timeout=None):
+        """Création d'un suivi (actif dès que `attach(pid)` est appelé)"""
+        handle = WatchedProcess(label, timeout, stall_timeout, progress_stall_timeout)
+        with self._lock:
+            self._watched.add(handle)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="process-watchdog", daemon=True)
+                self._thread.start()
+        return handle
+
+    def unwatch(self, handle):
+        """Fin du suivi (processus terminé)"""
+        with self._lock:
+            self._watched.discard(handle)
+
+    def _run(self):
+        """Boucle de surveillance"""
+        while True:
+            time.sleep(self.check_interval)
+            now = time.monotonic()
+
+            with self._lock:
+                if not self._watched:
+                    self._thread = None
+                    return
+                handles = [h for h in self._watched if h.pid is not None]
+
+            for handle in handles:
+                if handle.killed_at is not None:
+                    # Toujours vivant après SIGTERM : arrêt forcé
+                    if now - handle.killed_at > KILL_GRACE:
+                        kill_process_tree(handle.pid, force=True)
+                    continue
+
+                failure = handle.check(now)
+                if failure:
+                    handle.failure = failure
+                    handle.killed_at = now
+                    self.logger.warning(f"🐕 {handle.label}: {failure['detail']} - arrêt du processus {handle.pid}")
+                    kill_process_tree(handle.pid)
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+def get_process_watchdog():
+    """Watchdog partagé par tous les moteurs"""
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = ProcessWatchdog()
+        return _watchdog
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Analyse de la progression des outils
+Version 3.0.0 FINAL - Créé par Metadata
+Grammaires précompilées par outil : pourcentage, octets, taille, débit et ETA
+"""
+
+import os
+import re
+import stat
+
+# yt-dlp (--newline --progress-template) : une ligne machine par mise à jour,
+# "NA" pour les champs inconnus ; le nom de fichier en dernier (peut contenir "|")
+YTDLP_PREFIX = "PFPROG|"
+YTDLP_PROGRESS_TEMPLATE = (
+    "download:" + YTDLP_PREFIX
+    + "%(progress.status)s|%(progress.downloaded_bytes)s|%(progress.total_bytes)s|"
+    "%(progress.total_bytes_estimate)s|%(progress.speed)s|%(progress.eta)s|%(progress.filename)s"
+)
+
+SIZE = r'~?\s*([\d.]+)\s*([kKMGT]?)(i?B)?'
+SIZE_UNITS = {"": 1, "k": 1024, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+DECIMAL_UNITS = {"": 1, "k": 1000, "K": 1000, "M": 1000 ** 2, "G": 1000 ** 3, "T": 1000 ** 4}
+
+# yt-dlp lisible (versions sans --progress-template) :
+# "[download]  45.2% of ~123.45MiB at  1.23MiB/s ETA 00:30" / "[download] 100% of 12.34MiB in 00:00:05"
+YTDLP_HUMAN = re.compile(
+    r'\[download\]\s+([\d.]+)% of\s+' + SIZE
+    + r'(?:\s+at\s+(?:' + SIZE + r'/s|Unknown B/s))?(?:\s+ETA\s+(\S+))?(\s+in\s+)?'
+)
+# gallery-dl : " 45% 12.34MB 1.23MB/s" (ou sans pourcentage si la taille est inconnue)
+GALLERYDL_PROGRESS = re.compile(r'^\s*(?:(\d+)%\s+)?' + SIZE + r'\s+' + SIZE + r'/s')
+# wget --progress=dot : "  3072K ........ ........ 45% 1.23M 3s"
+WGET_DOT = re.compile(r'^\s*(\d+)K[ .,]+\s(\d+)%\s+([\d.]+)([KMG]?)[ =](\S+)')
+WGET_LENGTH = re.compile(r'^Length:\s+(\d+)')
+WGET_SAVED = re.compile(r'saved \[(\d+)(?:/(\d+))?\]')
+# curl : "% Total % Received % Xferd Average Speed(Dload Upload) Time(Total Spent Left) Current"
+CURL_ROW = re.compile(
+    r'^\s*(\d+)\s+([\d.]+)([kMGT]?)\s+(\d+)\s+([\d.]+)([kMGT]?)\s+\d+\s+\S+\s+\S+\s+\S+'
+    r'\s+\S+\s+\S+\s+(\S+)\s+([\d.]+)([kMGT]?)\s*$'
+)
+DURATION_PART = re.compile(r'(\d+)([dhms])')
+DURATION_SECONDS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+def parse_size(number, unit="", suffix=None):
+    """Taille en octets ; "MiB" et unités nues (curl, wget) en base 1024, "MB" en base 1000"""
+    units = DECIMAL_UNITS if suffix == "B" else SIZE_UNITS
+    return int(float(number) * units[unit])
+
+def parse_eta(text):
+    """Secondes depuis "00:30", "1:02:03", "1m2s" ; None si inconnu"""
+    if not text or text[0] in "-U":
+        return None
+    if ":" in text:
+        seconds = 0
+        try:
+            for part in text.split(":"):
+                seconds = seconds * 60 + int(part)
+        except ValueError:
+            return None
+        return seconds
+    parts = DURATION_PART.findall(text)
+    return sum(int(value) * DURATION_SECONDS[unit] for value, unit in parts) if parts else None
+
+def _number(text):
+    """Champ numérique du template yt-dlp ("NA" si absent)"""
+    return float(text) if text[:1].isdigit() else None
+
+class ProgressRecord:
+    """État de progression extrait d'une ligne de sortie"""
+
+    __slots__ = ("percent", "downloaded", "total", "speed", "eta", "finished", "filename")
+
+    def __init__(self, percent=None, downloaded=None, total=None, speed=None, eta=None,
+                 finished=False, filename=None):
+        self.percent = percent
+        self.downloaded = downloaded
+        self.total = total
+        self.speed = speed
+        self.eta = eta
+        self.finished = finished
+        self.filename = filename
+
+    @property
+    def file_bytes(self):
+        """Taille d'un fichier terminé (0 tant qu'il n'est pas terminé)"""
+        if not self.finished:
+            return 0
+        return int(self.total or self.downloaded or 0)
+
+    def describe(self):
+        """Résumé lisible pour l'interface"""
+        parts = [f"{self.percent:.1f}%" if self.percent is not None else "⏳"]
+        if self.total:
+            parts.append(f"de {format_size(self.total)}")
+        elif self.downloaded:
+            parts.append(format_size(self.downloaded))
+        if self.speed:
+            parts.append(f"à {format_size(self.speed)}/s")
+        if self.eta is not None and not self.finished:
+            parts.append(f"ETA {int(self.eta)}s")
+        if self.finished:
+            parts.append("✅")
+        return " ".join(parts)
+
+    def __repr__(self):
+        return f"ProgressRecord({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+def format_size(size):
+    """Taille lisible (base 1024)"""
+    for unit in ("o", "Ko", "Mo", "Go"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} To"
+
+def _percent(downloaded, total):
+    if downloaded is not None and total:
+        return min(100.0, downloaded * 100.0 / total)
+    return None
+
+class ProgressParser:
+    """Analyseur d'un téléchargement (un par job : certains outils annoncent la taille à part)"""
+
+    tool = None
+
+    def parse(self, line):
+        """ProgressRecord si la ligne porte une progression ou un fichier terminé, sinon None"""
+        return None
+
+class YtDlpProgressParser(ProgressParser):
+    """yt-dlp : lignes du template machine, puis format lisible en repli"""
+
+    tool = "yt-dlp"
+
+    def parse(self, line):
+        if line.startswith(YTDLP_PREFIX):
+            fields = line[len(YTDLP_PREFIX):].split("|", 6)
+            if len(fields) < 7:
+                return None
+            status, downloaded, total, estimate, speed, eta, filename = fields
+            downloaded = _number(downloaded)
+            total = _number(total) or _number(estimate)
+            finished = status == "finished"
+            return ProgressRecord(
+                percent=100.0 if finished else _percent(downloaded, total),
+                downloaded=downloaded, total=total, speed=_number(speed),
+                eta=_number(eta), finished=finished,
+                filename=None if filename == "NA" else filename
+            )
+
+        if not line.startswith("[download]"):
+            return None
+        match = YTDLP_HUMAN.match(line)
+        if not match:
+            return None
+        percent = float(match.group(1))
+        total = parse_size(*match.group(2, 3, 4))
+        speed = parse_size(*match.group(5, 6, 7)) if match.group(5) else None
+        finished = match.group(9) is not None
+        return ProgressRecord(
+            percent=percent, downloaded=int(total * percent / 100), total=total, speed=speed,
+            eta=parse_eta(match.group(8)), finished=finished
+        )
+
+class GalleryDlProgressParser(ProgressParser):
+    """gallery-dl : indicateur de progression, puis chemin de chaque fichier écrit"""
+
+    tool = "gallery-dl"
+
+    def parse(self, line):
+        # "# chemin" : fichier déjà présent, rien d'écrit
+        if not line or line[0] == "#":
+            return None
+        if line[0] in " 0123456789":
+            match = GALLERYDL_PROGRESS.match(line)
+            if match:
+                percent = match.group(1)
+                return ProgressRecord(
+                    percent=float(percent) if percent else None,
+                    downloaded=parse_size(*match.group(2, 3, 4)),
+                    speed=parse_size(*match.group(5, 6, 7))
+                )
+        if os.sep in line or "/" in line:
+            try:
+                info = os.stat(line)
+            except OSError:
+                return None
+            if not stat.S_ISREG(info.st_mode):
+                return None
+            size = info.st_size
+            return ProgressRecord(percent=100.0, downloaded=size, total=size, finished=True, filename=line)
+        return None
+
+class WgetProgressParser(ProgressParser):
+    """wget --progress=dot : "Length:" donne la taille, chaque ligne de points la progression"""
+
+    tool = "wget"
+
+    def __init__(self):
+        self.total = None
+
+    def parse(self, line):
+        if "saved [" in line:
+            match = WGET_SAVED.search(line)
+            if match:
+                size = int(match.group(1))
+                return ProgressRecord(percent=100.0, downloaded=size, total=int(match.group(2) or size),
+                                      finished=True)
+        elif line.lstrip()[:1].isdigit():
+            match = WGET_DOT.match(line)
+            if match:
+                downloaded = int(match.group(1)) * 1024
+                finished = match.group(2) == "100"
+                return ProgressRecord(
+                    percent=float(match.group(2)), downloaded=downloaded, total=self.total,
+                    speed=parse_size(match.group(3), match.group(4)),
+                    eta=None if finished else parse_eta(match.group(5))
+                )
+        elif line.startswith("Length:"):
+            match = WGET_LENGTH.match(line)
+            if match:
+                self.total = int(match.group(1))
+        return None
+
+class CurlProgressParser(ProgressParser):
+    """curl : tableau de progression (une ligne par rafraîchissement)"""
+
+    tool = "curl"
+
+    def parse(self, line):
+        if not line.lstrip()[:1].isdigit():
+            return None
+        match = CURL_ROW.match(line)
+        if not match:
+            return None
+        total = parse_size(match.group(2), match.group(3))
+        downloaded = parse_size(match.group(5), match.group(6))
+        percent = float(match.group(4))
+        return ProgressRecord(
+            percent=percent, downloaded=downloaded, total=total or None,
+            speed=parse_size(match.group(8), match.group(9)), eta=parse_eta(match.group(7))
+        )
+
+PARSERS = {
+    parser.tool: parser
+    for parser in (YtDlpProgressParser, GalleryDlProgressParser, WgetProgressParser, CurlProgressParser)
+}
+
+def create_parser(tool):
+    """Nouvel analyseur pour un téléchargement (analyseur neutre si l'outil est inconnu)"""
+    return PARSERS.get(tool, ProgressParser)()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Politique de nouvelles tentatives
+Version 3.0.0 FINAL - Créé par Metadata
+Classification des échecs, backoff exponentiel et chaîne de repli d'outils
+"""
+
+import random
+import re
+
+def _http_status(codes):
+    """Code HTTP dans son contexte ("HTTP Error 429", "status code 403", "ERROR 410:", "returned error: 503"),
+    jamais un nombre isolé (tailles et progression : "429.50MiB", "of 403.1KiB")"""
+    return (rf"(?:HTTP(?: Error)?|status(?: code)?|response(?: code)?|ERROR|returned error)"
+            rf"\s*:?\s*(?:{codes})\b(?!\.\d)")
+
+# Motifs de sortie (yt-dlp, gallery-dl, wget, curl) → classe d'échec
+FAILURE_PATTERNS = [
+    ("rate_limited", re.compile(rf"Too Many Requests|rate.?limit|{_http_status('429')}", re.I)),
+    ("not_found", re.compile(rf"404 Not Found|410 Gone|{_http_status('404|410')}|Video unavailable|"
+                             r"has been removed|does not exist|No such file", re.I)),
+    ("auth", re.compile(rf"401 Unauthorized|403 Forbidden|{_http_status('40[13]')}|Sign in to confirm|"
+                        r"login required|members.only|private video|cookies", re.I)),
+    ("unsupported", re.compile(r"Unsupported URL|No suitable extractor|NoExtractorError|"
+                               r"no extractor found", re.I)),
+    ("network", re.compile(r"timed out|Connection (reset|refused|aborted)|Temporary failure|"
+                           r"Name or service not known|Network is unreachable|SSL|"
+                           r"HTTP Error 5\d\d|50[234] (?:Bad Gateway|Service Unavailable|Gateway Time-?out)|"
+                           rf"{_http_status('50[234]')}|IncompleteRead|Could not resolve", re.I)),
+]
+
+# Exit codes curl/wget significatifs
+CURL_EXIT_CODES = {6: "network", 7: "network", 28: "network", 35: "network", 56: "network", 22: "not_found"}
+WGET_EXIT_CODES = {4: "network", 6: "auth", 8: "not_found"}
+
+# Classe → (nouvelles tentatives avec le même outil, délai de base, délai max, passer à l'outil suivant)
+DEFAULT_CLASS_POLICY = {
+    "network": {"same_tool_retries": 2, "base_delay": 5, "max_delay": 300, "fallback": True},
+    "rate_limited": {"same_tool_retries": 3, "base_delay": 60, "max_delay": 1800, "fallback": False},
+    "timeout": {"same_tool_retries": 1, "base_delay": 10, "max_delay": 300, "fallback": True},
+    "stall": {"same_tool_retries": 1, "base_delay": 10, "max_delay": 300, "fallback": True},
+    "no_progress": {"same_tool_retries": 1, "base_delay": 10, "max_delay": 300, "fallback": True},
+    "unsupported": {"same_tool_retries": 0, "base_delay": 0, "max_delay": 0, "fallback": True},
+    "tool_missing": {"same_tool_retries": 0, "base_delay": 0, "max_delay": 0, "fallback": True},
+    "unknown": {"same_tool_retries": 1, "base_delay": 15, "max_delay": 600, "fallback": True},
+    "auth": {"same_tool_retries": 0, "base_delay": 0, "max_delay": 0, "fallback": False},
+    "not_found": {"same_tool_retries": 0, "base_delay": 0, "max_delay": 0, "fallback": False},
+    "invalid_url": {"same_tool_retries": 0, "base_delay": 0, "max_delay": 0, "fallback": False},
+}
+
+# Ordre de repli par défaut selon l'outil principal
+DEFAULT_FALLBACKS = {
+    "yt-dlp": ["gallery-dl"],
+    "gallery-dl": ["yt-dlp"],
+    "wget": ["curl"],
+    "curl": ["wget"],
+}
+
+# URLs de fichiers directs : wget/curl sont des replis valables
+DIRECT_FILE = re.compile(r"\.(mp4|mkv|webm|mov|avi|mp3|flac|wav|m4a|zip|rar|7z|jpe?g|png|gif|webp|pdf)$", re.I)
+
+def classify_failure(details):
+    """Classe d'échec à partir de la raison structurée, du code retour et de la sortie"""
+    failure = details.get("failure") or {}
+    reason = failure.get("reason")
+    if reason in ("timeout", "stall", "no_progress", "tool_missing", "unsupported", "invalid_url"):
+        return reason
+
+    output = "\n".join(details.get("output_tail") or [])
+    for failure_class, pattern in FAILURE_PATTERNS:
+        if pattern.search(output):
+            return failure_class
+
+    return_code = details.get("return_code")
+    tool = details.get("tool")
+    if tool == "curl" and return_code in CURL_EXIT_CODES:
+        return CURL_EXIT_CODES[return_code]
+    if tool == "wget" and return_code in WGET_EXIT_CODES:
+        return WGET_EXIT_CODES[return_code]
+
+    return "unknown"
+
+class RetryPolicy:
+    """Décide si, quand et avec quel outil relancer un item échoué"""
+
+    def __init__(self, config=None):
+        """Lecture des options `retry` de la section download"""
+        config = config or {}
+        self.max_attempts = int(config.get("max_attempts", 4))
+        self.jitter = float(config.get("jitter", 0.2))
+        self.class_policy = {k: dict(v) for k, v in DEFAULT_CLASS_POLICY.items()}
+        for failure_class, overrides in config.get("classes", {}).items():
+            self.class_policy.setdefault(failure_class, dict(DEFAULT_CLASS_POLICY["unknown"])).update(overrides)
+        self.fallback_chains = dict(config.get("fallback_chains", {}))
+
+    def fallback_chain(self, url, domain, primary):
+        """Chaîne d'outils à essayer pour un domaine, outil principal en tête"""
+        chain = self._lookup_chain(domain)
+        if chain is None:
+            chain = list(DEFAULT_FALLBACKS.get(primary, []))
+            if DIRECT_FILE.search(url.split("?")[0]):
+                chain += ["wget", "curl"]
+
+        ordered = [primary] if primary else []
+        for tool in chain:
+            if tool not in ordered:
+                ordered.append(tool)
+        return ordered
+
+    def _lookup_chain(self, domain):
+        """Chaîne configurée par suffixe de domaine"""
+        labels = (domain or "").split(".")
+        for i in range(len(labels)):
+            chain = self.fallback_chains.get(".".join(labels[i:]))
+            if chain:
+                return list(chain)
+        return None
+
+    def backoff(self, policy, attempt):
+        """Délai exponentiel avec gigue : base * 2^(tentative-1)"""
+        if not policy["base_delay"]:
+            return 0.0
+        delay = min(policy["max_delay"], policy["base_delay"] * (2 ** max(0, attempt - 1)))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def next_attempt(self, item, details, available_tools):
+        """Décision pour un item échoué : dict (tool, delay, failure_class) ou None"""
+        failure_class = classify_failure(details)
+        policy = self.class_policy.get(failure_class, self.class_policy["unknown"])
+
+        attempts = item.get("attempts", 1)
+        if attempts >= self.max_attempts:
+            return None
+
+        tool = details.get("tool") or item.get("tool")
+        tried = item.setdefault("tried_tools", {})
+        tried[tool] = tried.get(tool, 0) + 1
+
+        # Même outil tant que la classe l'autorise
+        if tried[tool] <= policy["same_tool_retries"] and tool in available_tools:
+            return {"tool": tool, "delay": self.backoff(policy, tried[tool]), "failure_class": failure_class}
+
+        # Puis outil suivant de la chaîne
+        if policy["fallback"]:
+            for candidate in self.fallback_chain(item["url"], item.get("domain"), item.get("primary_tool") or tool):
+                if candidate not in tried and candidate in available_tools:
+                    return {"tool": candidate, "delay": 0.0, "failure_class": failure_class}
+
+        return None
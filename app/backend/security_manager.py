@@ -9,10 +9,12 @@ Gestion TOR, Sandbox, Nettoyage RÉEL
 
 import os
 import subprocess
+import threading
 import time
 import shutil
 import requests
 from pathlib import Path
+from urllib.parse import urlparse
 
 try:
     from utils.logger import get_logger
@@ -21,6 +23,16 @@ except ImportError:
     def get_logger(name):
         return logging.getLogger(name)
 
+try:
+    from utils.event_log import emit_event, get_event_log
+except ImportError:
+    from ..utils.event_log import emit_event, get_event_log
+
+try:
+    from backend.staging import promote_file, promote_tree, remove_tree
+except ImportError:
+    from .staging import promote_file, promote_tree, remove_tree
+
 class SecurityManager:
     """Gestionnaire de sécurité FONCTIONNEL"""
     
@@ -46,6 +58,10 @@ class SecurityManager:
         # État TOR
         self._tor_process = None
         self._tor_running = False
+        
+        # Dossiers de préparation des téléchargements en cours (jamais nettoyés)
+        self._active_staging = set()
+        self._staging_lock = threading.Lock()
     
     def check_url_safety(self, url: str) -> bool:
         """Vérification sécurité URL basique"""
@@ -60,6 +76,8 @@ class SecurityManager:
             
             for term in blacklist:
                 if term in url_lower:
+                    self.log_security_event(f"URL refusée ({term})", "WARNING", phase="url_rejected",
+                                            domain=urlparse(url).netloc.lower())
                     return False
             
             return True
@@ -76,26 +94,68 @@ class SecurityManager:
         """Dossier sandbox"""
         return str(self.sandbox_dir)
     
-    def process_sandbox_files(self, dest_dir: str):
-        """Traitement fichiers sandbox vers destination FONCTIONNEL"""
+    def staging_path(self, job_id) -> Path:
+        """Dossier de préparation d'un téléchargement (sandbox/job-<job_id>)"""
+        return self.sandbox_dir / f"job-{job_id}"
+    
+    def create_staging_dir(self, job_id) -> str:
+        """Création du dossier de préparation propre à un téléchargement"""
+        staging = self.staging_path(job_id)
+        staging.mkdir(parents=True, exist_ok=True)
+        with self._staging_lock:
+            self._active_staging.add(staging.name)
+        return str(staging)
+    
+    def release_staging_dir(self, staging_dir, discard=False):
+        """Fin d'utilisation d'un dossier de préparation (supprimé avec ses fichiers partiels si discard)"""
+        staging = Path(staging_dir)
+        with self._staging_lock:
+            self._active_staging.discard(staging.name)
+        if discard:
+            remove_tree(staging)
+    
+    def process_sandbox_files(self, dest_dir: str, staging_dir=None, job_id=None, details=None):
+        """Promotion des fichiers préparés vers la destination
+        
+        Avec `staging_dir`, seule l'arborescence de ce téléchargement est promue ;
+        sinon, les fichiers posés à la racine du sandbox (jamais les dossiers d'autres jobs).
+        `details` (dict optionnel) reçoit les chemins finaux des fichiers promus.
+        Une promotion de `staging_dir` qui échoue lève l'erreur : le dossier reste protégé
+        (fichiers restants repris par une nouvelle tentative).
+        """
         try:
+            start = time.monotonic()
             dest_path = Path(dest_dir)
             dest_path.mkdir(parents=True, exist_ok=True)
             
-            moved_files = 0
-            for file_path in self.sandbox_dir.glob("*"):
-                if file_path.is_file():
-                    # Déplacer vers destination
-                    dest_file = dest_path / file_path.name
-                    shutil.move(str(file_path), str(dest_file))
-                    moved_files += 1
-                    self.logger.info(f"📦 Fichier déplacé: {file_path.name}")
-            
-            self.logger.info(f"📦 {moved_files} fichiers traités depuis sandbox")
-            return moved_files
+            if staging_dir:
+                result = promote_tree(staging_dir, dest_path)
+                self.release_staging_dir(staging_dir)
+            else:
+                result = {"files": 0, "bytes": 0, "renamed": 0, "copied": 0, "paths": []}
+                for file_path in self.sandbox_dir.glob("*"):
+                    if file_path.is_file():
+                        size = file_path.stat().st_size
+                        mode = promote_file(file_path, dest_path / file_path.name)
+                        result["paths"].append(str(dest_path / file_path.name))
+                        result["files"] += 1
+                        result["bytes"] += size
+                        result["renamed" if mode == "rename" else "copied"] += 1
+                        self.logger.info(f"📦 Fichier déplacé: {file_path.name}")
+            
+            if details is not None:
+                details["files"] = result["paths"]
+            self.logger.info(f"📦 {result['files']} fichiers traités depuis sandbox "
+                             f"({result['renamed']} renommés, {result['copied']} copiés)")
+            emit_event("sandbox_promoted", "security", job_id=job_id, bytes=result["bytes"],
+                       duration=time.monotonic() - start, files=result["files"],
+                       renamed=result["renamed"], copied=result["copied"])
+            return result["files"]
             
         except Exception as e:
             self.logger.error(f"Erreur traitement sandbox: {e}")
+            if staging_dir:
+                raise
             return 0
     
     def clean_sandbox(self):
@@ -104,7 +164,13 @@ class SecurityManager:
             cleaned_files = 0
             cleaned_size = 0
             
+            with self._staging_lock:
+                active = set(self._active_staging)
+            
             for item in self.sandbox_dir.iterdir():
+                if item.name in active:
+                    # Téléchargement en cours : ses fichiers partiels lui appartiennent
+                    continue
                 try:
                     if item.is_file():
                         size = item.stat().st_size
@@ -132,6 +198,7 @@ class SecurityManager:
                 size_str = f"{cleaned_size/1024:.1f} KB"
             
             self.logger.info(f"🗑️ Sandbox nettoyé: {cleaned_files} éléments, {size_str}")
+            emit_event("sandbox_cleaned", "security", bytes=cleaned_size, files=cleaned_files)
             return True, f"Sandbox nettoyé: {cleaned_files} éléments"
             
         except Exception as e:
@@ -370,6 +437,8 @@ DataDirectory sandbox/tor_data
             # Extensions dangereuses
             dangerous_exts = ['.exe', '.scr', '.bat', '.cmd', '.com', '.vbs', '.js']
             if path.suffix.lower() in dangerous_exts:
+                self.log_security_event(f"Extension dangereuse: {path.name}", "WARNING",
+                                        phase="file_rejected", bytes=size)
                 return False, f"Extension dangereuse: {path.suffix}"
             
             return True, "Fichier sécurisé"
@@ -377,27 +446,27 @@ DataDirectory sandbox/tor_data
         except Exception as e:
             return False, f"Erreur scan: {e}"
     
-    def get_security_logs(self):
-        """Récupération logs sécurité"""
+    def get_security_logs(self, limit=500):
+        """Récupération logs sécurité (ancien security.log puis événements du journal structuré)"""
         try:
+            lines = []
             log_file = self.logs_dir / "security.log"
             if log_file.exists():
                 with open(log_file, 'r', encoding='utf-8') as f:
-                    return f.read()
-            return "Aucun log de sécurité"
+                    lines.extend(f.read().splitlines())
+            
+            for event in get_event_log().read_events(limit=limit, source="security"):
+                timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event["ts"]))
+                lines.append(f"[{timestamp}] {event.get('level', 'INFO')}: {event.get('event') or event['phase']}")
+            
+            return "\n".join(lines[-limit:]) if lines else "Aucun log de sécurité"
         except:
             return "Erreur lecture logs"
     
-    def log_security_event(self, event, level="INFO"):
-        """Log événement sécurité"""
+    def log_security_event(self, event, level="INFO", phase="security", **fields):
+        """Log événement sécurité (journal NDJSON partagé, écrit par lots)"""
         try:
-            log_file = self.logs_dir / "security.log"
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            log_entry = f"[{timestamp}] {level}: {event}\n"
-            
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
-                
+            emit_event(phase, "security", level=level, event=str(event), **fields)
         except Exception as e:
             self.logger.error(f"Erreur log sécurité: {e}")
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Promotion des fichiers téléchargés
+Version 3.0.0 FINAL - Créé par Metadata
+Dossier de préparation → bibliothèque : os.replace atomique, copie noyau + fsync entre disques
+"""
+
+import errno
+import os
+import shutil
+from pathlib import Path
+
+# Taille maximale d'un appel copy_file_range / sendfile
+COPY_CHUNK = 64 * 1024 * 1024
+# Erreurs signalant que l'appel système ne sait pas copier entre ces deux fichiers
+ZERO_COPY_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSOCK}
+
+def _zero_copy(infd, outfd, size):
+    """Copie dans le noyau (copy_file_range, sinon sendfile) ; retourne les octets copiés"""
+    copied = 0
+    copy_range = getattr(os, "copy_file_range", None)
+    sendfile = getattr(os, "sendfile", None)
+    try:
+        while copied < size:
+            count = min(COPY_CHUNK, size - copied)
+            if copy_range is not None:
+                try:
+                    written = copy_range(infd, outfd, count)
+                except OSError as e:
+                    # Noyau ancien ou systèmes de fichiers différents : repli sur sendfile
+                    if e.errno not in ZERO_COPY_UNSUPPORTED or sendfile is None or copied:
+                        raise
+                    copy_range = None
+                    continue
+            elif sendfile is not None:
+                written = sendfile(outfd, infd, copied, count)
+            else:
+                break
+            if not written:
+                break
+            copied += written
+    except OSError as e:
+        if e.errno not in ZERO_COPY_UNSUPPORTED:
+            raise
+    return copied
+
+def copy_file(source, target):
+    """Copie source → target sans tampon Python quand le système le permet, puis fsync"""
+    with open(source, "rb") as fsrc, open(target, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = _zero_copy(fsrc.fileno(), fdst.fileno(), size)
+        if copied < size:
+            # Windows, macOS ou appel refusé : copie classique du reste
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK)
+        fdst.flush()
+        os.fsync(fdst.fileno())
+
+def _fsync_dir(directory):
+    """Durabilité de l'entrée de répertoire (POSIX uniquement)"""
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def promote_file(source, target):
+    """Déplacement atomique d'un fichier ; retourne "rename" (même disque) ou "copy" """
+    source, target = Path(source), Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(source, target)
+        return "rename"
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    # Autre disque : copie vers un fichier temporaire voisin, puis renommage atomique
+    partial = target.with_name(f".{target.name}.{os.getpid()}.partial")
+    try:
+        copy_file(source, partial)
+        shutil.copystat(source, partial)
+        os.replace(partial, target)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    _fsync_dir(target.parent)
+    source.unlink()
+    return "copy"
+
+def promote_tree(staging_dir, dest_dir):
+    """Promotion de tous les fichiers d'un dossier de préparation (arborescence conservée)
+
+    Retourne {"files", "bytes", "renamed", "copied", "paths"} ; le dossier vidé est supprimé.
+    """
+    staging_dir, dest_dir = Path(staging_dir), Path(dest_dir)
+    result = {"files": 0, "bytes": 0, "renamed": 0, "copied": 0, "paths": []}
+    if not staging_dir.is_dir():
+        return result
+
+    for root, _, files in os.walk(staging_dir):
+        for name in files:
+            source = Path(root) / name
+            size = source.stat().st_size
+            target = dest_dir / source.relative_to(staging_dir)
+            mode = promote_file(source, target)
+            result["paths"].append(str(target))
+            result["files"] += 1
+            result["bytes"] += size
+            result["renamed" if mode == "rename" else "copied"] += 1
+
+    remove_tree(staging_dir)
+    return result
+
+def remove_tree(directory):
+    """Suppression d'un dossier de préparation (fichiers partiels compris)"""
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Classement statistique des outils par domaine
+Version 3.0.0 FINAL - Créé par Metadata
+Bandit manchot (échantillonnage de Thompson) sur le débit attendu en octets/s
+"""
+
+import random
+import threading
+
+# Débit a priori quand un domaine n'a encore aucune mesure (1 Mio/s)
+DEFAULT_THROUGHPUT = 1024 * 1024
+# Poids (en observations) du débit a priori
+PRIOR_WEIGHT = 1.0
+
+class ToolArm:
+    """Statistiques d'un couple (domaine, outil)"""
+
+    __slots__ = ("successes", "failures", "bytes", "seconds", "timed")
+
+    def __init__(self, successes=0, failures=0, total_bytes=0, seconds=0.0, timed=0):
+        self.successes = successes
+        self.failures = failures
+        self.bytes = total_bytes
+        self.seconds = seconds
+        self.timed = timed
+
+    def update(self, success, duration=None, file_size=None):
+        """Ajout d'une observation"""
+        if success:
+            self.successes += 1
+            # Seuls les succès mesurés renseignent le débit
+            if duration and duration > 0 and file_size and file_size > 0:
+                self.bytes += file_size
+                self.seconds += duration
+                self.timed += 1
+        else:
+            self.failures += 1
+
+    @property
+    def success_rate(self):
+        """Moyenne a posteriori Beta(1 + succès, 1 + échecs)"""
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def throughput(self, prior):
+        """Débit moyen a posteriori (octets/s), tiré vers `prior` tant que les mesures manquent"""
+        observed = self.bytes / self.seconds if self.seconds > 0 else prior
+        return (self.timed * observed + PRIOR_WEIGHT * prior) / (self.timed + PRIOR_WEIGHT)
+
+class ToolBandit:
+    """Un bandit par domaine : chaque outil est un bras, la récompense est le débit utile"""
+
+    def __init__(self, rng=None):
+        self._arms = {}
+        self._lock = threading.Lock()
+        self._rng = rng or random.Random()
+
+    def load(self, rows):
+        """Chargement depuis (domain, tool, successes, failures, bytes, seconds, timed)"""
+        with self._lock:
+            for domain, tool, successes, failures, total_bytes, seconds, timed in rows:
+                self._arms.setdefault(domain, {})[tool] = ToolArm(
+                    successes or 0, failures or 0, total_bytes or 0, seconds or 0.0, timed or 0
+                )
+
+    def record(self, domain, tool, success, duration=None, file_size=None):
+        """Mise à jour du bras (domaine, outil)"""
+        with self._lock:
+            arm = self._arms.setdefault(domain, {}).get(tool)
+            if arm is None:
+                arm = self._arms[domain][tool] = ToolArm()
+            arm.update(success, duration, file_size)
+            return arm
+
+    def arm(self, domain, tool):
+        """Bras existant ou None"""
+        return self._arms.get(domain, {}).get(tool)
+
+    def has_domain(self, domain):
+        """Au moins une observation pour ce domaine"""
+        return domain in self._arms
+
+    def _candidates(self, domain, candidates, prior_tool):
+        """Bras à comparer : outils observés (filtrés) + outil a priori"""
+        arms = dict(self._arms.get(domain, {}))
+        if prior_tool and prior_tool not in arms:
+            arms[prior_tool] = ToolArm()
+        if candidates is not None:
+            arms = {tool: arm for tool, arm in arms.items() if tool in candidates}
+        return arms
+
+    def _domain_prior(self, arms):
+        """Débit a priori : débit global du domaine, sinon défaut"""
+        total_bytes = sum(arm.bytes for arm in arms.values())
+        total_seconds = sum(arm.seconds for arm in arms.values())
+        return total_bytes / total_seconds if total_seconds > 0 else DEFAULT_THROUGHPUT
+
+    def choose(self, domain, candidates=None, prior_tool=None):
+        """Échantillonnage de Thompson : outil maximisant P(succès) x débit tirés a posteriori"""
+        with self._lock:
+            arms = self._candidates(domain, candidates, prior_tool)
+            if not arms:
+                return None
+            prior = self._domain_prior(arms)
+
+            best_tool, best_score = None, -1.0
+            for tool, arm in arms.items():
+                p_success = self._rng.betavariate(arm.successes + 1, arm.failures + 1)
+                shape = arm.timed + PRIOR_WEIGHT
+                rate = self._rng.gammavariate(shape, arm.throughput(prior) / shape)
+                score = p_success * rate
+                if score > best_score:
+                    best_tool, best_score = tool, score
+            return best_tool
+
+    def rank(self, domain, candidates=None, prior_tool=None):
+        """Classement déterministe par débit attendu (moyennes a posteriori)"""
+        with self._lock:
+            arms = self._candidates(domain, candidates, prior_tool)
+            prior = self._domain_prior(arms)
+            ranking = [
+                {
+                    "tool": tool,
+                    "success_rate": arm.success_rate,
+                    "throughput": arm.throughput(prior),
+                    "expected_bps": arm.success_rate * arm.throughput(prior),
+                    "samples": arm.successes + arm.failures,
+                }
+                for tool, arm in arms.items()
+            ]
+        ranking.sort(key=lambda entry: entry["expected_bps"], reverse=True)
+        return ranking
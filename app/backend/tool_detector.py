@@ -2,65 +2,252 @@
 # -*- coding: utf-8 -*-
 
 """
-PrismFetch V3 - Détecteur d'Outils (PRÉVENTIF)
-Module temporaire pour éviter les erreurs d'import
+PrismFetch V3 - Détecteur d'Outils
+Version 3.0.0 FINAL - Créé par Metadata
+Registre partagé : sondes parallèles, cache data/tool_cache.json revalidé par stat()
 """
 
-import subprocess
+import json
 import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+# Outils fiables (SANS cyberdrop-dl)
+DEFAULT_TOOLS = ["yt-dlp", "gallery-dl", "wget", "curl"]
+CACHE_PATH = "data/tool_cache.json"
+PROBE_TIMEOUT = 5
+# Durée de validité d'une vérification avant revalidation par stat()
+CAPABILITY_TTL = 300
+
 class ToolDetector:
-    """Détecteur d'outils de téléchargement (version préventive)"""
-    
-    def __init__(self):
+    """Registre unique des outils de téléchargement (chemin, version, empreinte du binaire)"""
+
+    def __init__(self, tools=None, cache_path=CACHE_PATH, tools_dir="tools", ttl=CAPABILITY_TTL):
+        self.logger = get_logger(__name__)
+        self.tools = list(tools or DEFAULT_TOOLS)
+        self.cache_path = Path(cache_path)
+        self.tools_dir = Path(tools_dir)
+        self.ttl = ttl
         self.available_tools = {}
+        self.probe_count = 0
+        self._entries = {}
+        self._checked = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+        self._probe_locks = {}
         self.detect_all_tools()
-        print(f"🔧 {len(self.available_tools)} outils détectés")
-    
-    def detect_all_tools(self):
-        """Détection de tous les outils disponibles"""
-        tools_to_check = ["yt-dlp", "gallery-dl", "cyberdrop-dl", "wget", "curl"]
-        
-        for tool in tools_to_check:
-            path = self.find_tool(tool)
-            self.available_tools[tool] = path
-    
+
     def find_tool(self, tool_name):
-        """Recherche d'un outil"""
-        try:
-            # Vérification PATH
-            result = subprocess.run(
-                ["where" if os.name == "nt" else "which", tool_name],
-                capture_output=True, text=True
-            )
-            if result.returncode == 0:
-                return result.stdout.strip().split('\n')[0]
-        except:
-            pass
-        
-        # Vérification dossier tools/
-        tools_dir = Path("tools")
-        if tools_dir.exists():
+        """Recherche d'un outil sans lancer de processus (PATH puis dossier tools/)"""
+        path = shutil.which(tool_name)
+        if path:
+            return path
+
+        if self.tools_dir.exists():
             for ext in [".exe", ".bat", ""]:
-                tool_path = tools_dir / f"{tool_name}{ext}"
+                tool_path = self.tools_dir / f"{tool_name}{ext}"
                 if tool_path.exists():
                     return str(tool_path)
-        
+
         return None
-    
-    def is_tool_available(self, tool_name):
-        """Vérification disponibilité outil"""
+
+    @staticmethod
+    def _fingerprint(path):
+        """Empreinte (mtime, taille) du binaire"""
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+
+    def _probe(self, tool_name, path):
+        """`outil --version` : confirme que le binaire s'exécute et relève sa version"""
+        with self._lock:
+            self.probe_count += 1
+        try:
+            result = subprocess.run(
+                [path, "--version"],
+                capture_output=True, text=True, timeout=PROBE_TIMEOUT,
+                encoding='utf-8', errors='replace'
+            )
+            if result.returncode != 0:
+                return None
+            lines = (result.stdout or result.stderr).strip().splitlines()
+            return lines[0] if lines else ""
+        except Exception as e:
+            self.logger.warning(f"❌ {tool_name} inutilisable ({path}): {e}")
+            return None
+
+    def _load_cache(self):
+        """Lecture du cache disque"""
+        try:
+            if self.cache_path.exists():
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Cache outils illisible: {e}")
+        return {}
+
+    def _save_cache(self, entries):
+        """Écriture atomique du cache disque"""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_suffix(".tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(temp_path, self.cache_path)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Cache outils non écrit: {e}")
+
+    def detect_all_tools(self, force=False):
+        """Détection de tous les outils : stat() si le cache est à jour, sondes parallèles sinon"""
+        cache = {} if force else self._load_cache()
+        entries = {}
+        to_probe = {}
+
+        for tool in self.tools:
+            path = self.find_tool(tool)
+            if not path:
+                continue
+            try:
+                mtime, size = self._fingerprint(path)
+            except OSError:
+                continue
+
+            cached = cache.get(tool)
+            if cached and cached.get("path") == path and cached.get("mtime") == mtime and cached.get("size") == size:
+                entries[tool] = cached
+            else:
+                to_probe[tool] = {"path": path, "mtime": mtime, "size": size}
+
+        if to_probe:
+            with ThreadPoolExecutor(max_workers=len(to_probe)) as executor:
+                versions = dict(zip(to_probe, executor.map(
+                    lambda tool: self._probe(tool, to_probe[tool]["path"]), to_probe
+                )))
+            for tool, entry in to_probe.items():
+                if versions[tool] is not None:
+                    entry["version"] = versions[tool]
+                    entries[tool] = entry
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries = entries
+            self.available_tools = {tool: None for tool in self.tools}
+            self.available_tools.update({tool: entry["path"] for tool, entry in entries.items()})
+            self._checked = {tool: now for tool in self.tools}
+            self._stale.clear()
+
+        if to_probe or set(cache) != set(entries):
+            self._save_cache(entries)
+
+        for tool in self.tools:
+            if tool in entries:
+                self.logger.info(f"✅ {tool} trouvé: {entries[tool]['path']}")
+            else:
+                self.logger.warning(f"❌ {tool} non trouvé")
+
+        return self.get_available_tools()
+
+    def _probe_lock(self, tool_name):
+        """Verrou par outil : une seule sonde à la fois, partagée par les threads en attente"""
+        with self._lock:
+            return self._probe_locks.setdefault(tool_name, threading.Lock())
+
+    def _is_fresh(self, tool_name):
+        """Vérification récente et non invalidée"""
+        checked = self._checked.get(tool_name)
+        return (tool_name not in self._stale and checked is not None
+                and time.monotonic() - checked < self.ttl)
+
+    def check_tool(self, tool_name):
+        """Disponibilité d'un outil : cache tant que le TTL court, puis stat(), sonde si le binaire a changé"""
+        if self._is_fresh(tool_name):
+            return self.available_tools.get(tool_name) is not None
+
+        with self._probe_lock(tool_name):
+            # Un autre thread vient peut-être de revalider
+            if not self._is_fresh(tool_name):
+                self._revalidate(tool_name)
         return self.available_tools.get(tool_name) is not None
-    
+
+    def _revalidate(self, tool_name):
+        """Revalidation d'un outil (sonde forcée s'il a été invalidé)"""
+        force = tool_name in self._stale
+        entry = None
+        path = self.find_tool(tool_name)
+        if path:
+            try:
+                mtime, size = self._fingerprint(path)
+                cached = self._entries.get(tool_name)
+                if (not force and cached and cached["path"] == path
+                        and cached["mtime"] == mtime and cached["size"] == size):
+                    entry = cached
+                else:
+                    version = self._probe(tool_name, path)
+                    if version is not None:
+                        entry = {"path": path, "mtime": mtime, "size": size, "version": version}
+            except OSError:
+                entry = None
+
+        with self._lock:
+            changed = self._entries.get(tool_name) is not entry
+            if entry:
+                self._entries[tool_name] = entry
+            else:
+                self._entries.pop(tool_name, None)
+            self.available_tools[tool_name] = entry["path"] if entry else None
+            self._checked[tool_name] = time.monotonic()
+            self._stale.discard(tool_name)
+            entries = dict(self._entries)
+
+        if changed:
+            self._save_cache(entries)
+            self.logger.info(f"🔄 {tool_name} revalidé: {entry['path'] if entry else 'indisponible'}")
+
+    def invalidate(self, tool_name):
+        """Échec d'exécution : la prochaine vérification relancera une sonde"""
+        with self._lock:
+            self._stale.add(tool_name)
+
+    def is_tool_available(self, tool_name):
+        """Vérification disponibilité outil (cache partagé, TTL)"""
+        return self.check_tool(tool_name)
+
     def get_tool_path(self, tool_name):
         """Chemin d'un outil"""
         return self.available_tools.get(tool_name)
-    
+
+    def get_tool_version(self, tool_name):
+        """Version relevée lors de la dernière sonde"""
+        entry = self._entries.get(tool_name)
+        return entry.get("version") if entry else None
+
     def get_available_tools(self):
-        """Liste des outils disponibles"""
-        return {k: v for k, v in self.available_tools.items() if v is not None}
+        """Outils disponibles : {nom: chemin}"""
+        with self._lock:
+            return {k: v for k, v in self.available_tools.items() if v is not None}
+
+_detector = None
+_detector_lock = threading.Lock()
+
+def get_tool_detector():
+    """Registre partagé par les DownloadManager backend et core"""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = ToolDetector()
+        return _detector
 
 if __name__ == "__main__":
-    detector = ToolDetector()
-    print("✅ ToolDetector préventif OK")
+    detector = get_tool_detector()
+    for name, tool_path in detector.get_available_tools().items():
+        print(f"🔧 {name}: {tool_path} ({detector.get_tool_version(name)})")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Index des URLs déjà téléchargées
+Version 3.0.0 FINAL - Créé par Metadata
+URL canonique (suivi retiré, miroirs unifiés), filtre de Bloom en mémoire + index SQLite
+"""
+
+import hashlib
+import math
+import sqlite3
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    import logging
+    def get_logger(name):
+        return logging.getLogger(name)
+
+DEFAULT_DB = "data/url_index.db"
+
+# Identifiants de clic et de campagne : sans effet sur le contenu, retirés sur tous les hôtes
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "igsh", "mc_cid", "mc_eid", "_ga", "_gl",
+}
+TRACKING_PREFIXES = ("utm_",)
+# Paramètres de partage aux noms génériques : ailleurs ils peuvent désigner le contenu (?source=, ?page=…),
+# retirés seulement sur les sites connus (MIRRORS, KEPT_PARAMS)
+SHARE_PARAMS = {"ref", "ref_src", "ref_url", "spm", "si", "feature", "pp", "share", "source"}
+
+# Miroirs d'un même site ("site.*" = toutes extensions) et alias d'hôtes
+MIRRORS = {
+    "bunkr.*": "bunkr.cr",
+    "bunkrr.*": "bunkr.cr",
+    "bunkrrr.org": "bunkr.cr",
+    "cyberdrop.*": "cyberdrop.me",
+    "x.com": "twitter.com",
+    "mobile.twitter.com": "twitter.com",
+    "m.youtube.com": "youtube.com",
+    "youtube-nocookie.com": "youtube.com",
+}
+
+# Paramètres conservés par site (tous les autres sont retirés)
+KEPT_PARAMS = {
+    "youtube.com": {"v", "list"},
+    "twitter.com": set(),
+}
+
+def _canonical_host(host):
+    """Hôte minuscule, sans www., sans port par défaut, miroirs unifiés"""
+    host = host.lower().rstrip(".")
+    if host.endswith((":80", ":443")):
+        host = host.rsplit(":", 1)[0]
+    if host.startswith("www."):
+        host = host[4:]
+    if host in MIRRORS:
+        return MIRRORS[host]
+    name = host.split(".", 1)[0]
+    return MIRRORS.get(f"{name}.*", host) if host.count(".") == 1 else host
+
+def canonicalize_url(url):
+    """Forme canonique d'une URL : deux liens vers le même contenu donnent la même chaîne"""
+    url = url.strip()
+    try:
+        parts = urlsplit(url if "://" in url else f"https://{url}")
+    except ValueError:
+        return url
+    host = _canonical_host(parts.netloc.rsplit("@", 1)[-1])
+    path = parts.path or "/"
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    # youtu.be/ID et /shorts/ID → youtube.com/watch?v=ID
+    if host == "youtu.be" and len(path) > 1:
+        host, query = "youtube.com", [("v", path.strip("/").split("/")[0])]
+        path = "/watch"
+    elif host == "youtube.com" and path.startswith(("/shorts/", "/live/", "/embed/")) and path.split("/")[2]:
+        query = [("v", path.split("/")[2])]
+        path = "/watch"
+
+    kept = KEPT_PARAMS.get(host)
+    if kept is not None:
+        query = [(key, value) for key, value in query if key in kept]
+    else:
+        removed = TRACKING_PARAMS | SHARE_PARAMS if host in MIRRORS.values() else TRACKING_PARAMS
+        query = [
+            (key, value) for key, value in query
+            if key.lower() not in removed and not key.lower().startswith(TRACKING_PREFIXES)
+        ]
+    query.sort()
+
+    # Vidéo seule (--no-playlist) : la playlist d'origine ne change pas le contenu
+    if path == "/watch" and any(key == "v" for key, _ in query):
+        query = [(key, value) for key, value in query if key != "list"]
+
+    if len(path) > 1:
+        path = path.rstrip("/")
+    # http et https servent le même contenu ; le fragment ne part jamais au serveur
+    canonical = f"https://{host}{path}"
+    return f"{canonical}?{urlencode(query)}" if query else canonical
+
+def url_key(url):
+    """Clé d'index d'une URL (16 hex, même format que download_history.url_hash)"""
+    return hashlib.md5(canonicalize_url(url).encode()).hexdigest()[:16]
+
+class BloomFilter:
+    """Filtre de Bloom sur des clés hexadécimales de 64 bits (double hachage, sans recalcul d'empreinte)"""
+
+    __slots__ = ("size", "hashes", "bits", "count", "capacity")
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        value = int(key, 16)
+        h1, h2 = value & 0xFFFFFFFF, (value >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class UrlIndex:
+    """URLs déjà téléchargées : négatifs en mémoire (Bloom), positifs confirmés par SQLite"""
+
+    def __init__(self, db_path=DEFAULT_DB, min_capacity=100_000):
+        self.db_path = Path(db_path)
+        self.logger = get_logger(__name__)
+        self.min_capacity = min_capacity
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                url_hash TEXT PRIMARY KEY,
+                canonical_url TEXT NOT NULL,
+                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._conn.commit()
+        self._rebuild_filter()
+
+    def _rebuild_filter(self):
+        """Filtre dimensionné pour le double des entrées connues, rempli depuis l'index"""
+        count = self._conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+        self.bloom = BloomFilter(max(self.min_capacity, count * 2))
+        for (key,) in self._conn.execute("SELECT url_hash FROM seen_urls"):
+            self.bloom.add(key)
+        self.logger.debug("🌸 Filtre de Bloom: %d URLs, %d bits", count, self.bloom.size)
+
+    def is_done(self, url=None, key=None):
+        """URL déjà téléchargée avec succès (SQLite consulté seulement si le filtre répond peut-être)"""
+        key = key or url_key(url)
+        with self._lock:
+            if key not in self.bloom:
+                return False
+            return self._conn.execute(
+                "SELECT 1 FROM seen_urls WHERE url_hash = ?", (key,)
+            ).fetchone() is not None
+
+    def mark_done(self, url):
+        """Enregistrement d'un téléchargement réussi"""
+        canonical = canonicalize_url(url)
+        key = hashlib.md5(canonical.encode()).hexdigest()[:16]
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO seen_urls (url_hash, canonical_url) VALUES (?, ?)
+                ON CONFLICT(url_hash) DO UPDATE SET completed_at = CURRENT_TIMESTAMP
+            """, (key, canonical))
+            self._conn.commit()
+            self.bloom.add(key)
+            if self.bloom.count > self.bloom.capacity:
+                self._rebuild_filter()
+        return key
+
+    def forget(self, url):
+        """Retrait d'une URL (nouveau téléchargement forcé) ; le filtre garde un faux positif inoffensif"""
+        with self._lock:
+            self._conn.execute("DELETE FROM seen_urls WHERE url_hash = ?", (url_key(url),))
+            self._conn.commit()
+
+    def iter_urls(self):
+        """URLs canoniques déjà téléchargées (reconstruction des archives)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT canonical_url FROM seen_urls").fetchall()
+        return [url for (url,) in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_url_index = None
+_url_index_lock = threading.Lock()
+
+def get_url_index(db_path=DEFAULT_DB):
+    """Index partagé par la queue du DownloadManager et le mode batch"""
+    global _url_index
+    with _url_index_lock:
+        if _url_index is None:
+            _url_index = UrlIndex(db_path)
+        return _url_index
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Mode batch sans interface graphique
+Version 3.0.0 FINAL - Créé par Metadata
+python main.py batch urls.txt --concurrency N --json-progress (cron, systemd)
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+def build_parser():
+    """Arguments de la commande batch"""
+    parser = argparse.ArgumentParser(
+        prog="prismfetch batch",
+        description="Téléchargement headless d'une liste d'URLs (aucun import tkinter)"
+    )
+    parser.add_argument("file", help="fichier d'URLs (une par ligne, # pour commenter)")
+    parser.add_argument("--concurrency", "-c", type=int, default=None,
+                        help="téléchargements simultanés (défaut: max_concurrent_downloads)")
+    parser.add_argument("--output", "-o", default=None, help="dossier de destination")
+    parser.add_argument("--json-progress", action="store_true",
+                        help="événements NDJSON sur stdout (logs sur stderr)")
+    parser.add_argument("--force", action="store_true",
+                        help="retélécharger les URLs déjà téléchargées")
+    return parser
+
+class EventWriter:
+    """Sortie des événements : NDJSON ou texte, une ligne par événement, sans entrelacement"""
+
+    def __init__(self, stream, json_mode):
+        self.stream = stream
+        self.json_mode = json_mode
+        self._lock = threading.Lock()
+
+    def __call__(self, event, data):
+        if self.json_mode:
+            line = json.dumps({"event": event, "ts": round(time.time(), 3), **data}, ensure_ascii=False)
+        elif event == "done":
+            line = f"{'✅' if data['success'] else '❌'} {data['url']} - {data['message']}"
+        elif event == "summary":
+            line = (f"📊 {data['successes']}/{data['total']} réussis, {data['failures']} échecs, "
+                    f"{data['skipped']} ignorés, {data['bytes']} octets en {data['wall_time']:.1f}s")
+        else:
+            return
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+def run_batch(args):
+    """Exécution du batch ; code retour 0 si tout a réussi"""
+    # stdout réservé aux événements : logs et print() des modules partent sur stderr
+    events_stream = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        from .core.config_manager import ConfigManager
+        from .core.orchestrator import Orchestrator
+
+        config = dict(ConfigManager().config_data)
+        if args.output:
+            config["download_path"] = args.output
+
+        writer = EventWriter(events_stream, args.json_progress)
+        orchestrator = Orchestrator(config, max_workers=args.concurrency, force=args.force)
+        summary = orchestrator.run(file_path=args.file, on_event=writer)
+        writer("summary", summary)
+        return 0 if summary["failures"] == 0 else 1
+    finally:
+        sys.stdout = events_stream
+
+def main(argv=None):
+    """Point d'entrée `batch` (argv sans le mot-clé)"""
+    args = build_parser().parse_args(argv)
+    try:
+        return run_batch(args)
+    except FileNotFoundError as e:
+        sys.stderr.write(f"❌ Fichier introuvable: {e.filename}\n")
+        return 2
+    except KeyboardInterrupt:
+        sys.stderr.write("⏹️ Interruption utilisateur\n")
+        return 130
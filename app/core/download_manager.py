@@ -1,11 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
+import re
 import subprocess
 import time
 import os
 from pathlib import Path
-from ..utils.logger import get_logger
+
+# Même racine que le backend (app/ dans sys.path via main.py) : registre d'outils, archives,
+# moteur et journal d'événements restent des singletons uniques
+try:
+    from utils.logger import get_logger
+    from utils.event_log import emit_event, new_job_id
+    from backend.domain_router import get_domain_router, host_of
+    from backend.tool_detector import get_tool_detector
+    from backend.download_archive import get_download_archive
+    from backend.inprocess_engine import get_inprocess_engine, UNAVAILABLE
+except ImportError:
+    from ..utils.logger import get_logger
+    from ..utils.event_log import emit_event, new_job_id
+    from ..backend.domain_router import get_domain_router, host_of
+    from ..backend.tool_detector import get_tool_detector
+    from ..backend.download_archive import get_download_archive
+    from ..backend.inprocess_engine import get_inprocess_engine, UNAVAILABLE
+
+# Éléments ignorés car déjà téléchargés : message d'archive yt-dlp, ligne "# chemin" de gallery-dl
+ALREADY_DOWNLOADED = re.compile(r"has already been recorded in the archive|^# ", re.M)
 
 class DownloadManager:
     """Gestionnaire avec gallery-dl pour Bunkr (cyberdrop-dl-patched défaillant)"""
@@ -14,28 +35,42 @@ class DownloadManager:
         try:
             self.logger = get_logger(__name__)
             self.active_downloads = {}
+            # Section download de config/settings.json, comme le DownloadManager du backend
+            self.settings = self._load_settings()
+            archive_settings = self.settings.get("archive", {})
+            self.download_archive = get_download_archive(
+                archive_settings.get("dir", "data/archives"), archive_settings.get("enabled", True)
+            )
+            # Moteur intégré : outils autorisés et workers gardés au repos (enabled=False → sous-processus)
+            inprocess = self.settings.get("inprocess", {})
+            self.inprocess_tools = set()
+            if inprocess.get("enabled", True):
+                self.inprocess_tools = set(inprocess.get("tools", ["yt-dlp", "gallery-dl"]))
+            self.inprocess_idle_workers = int(inprocess.get("idle_workers", self.settings.get("max_concurrent", 2)))
         except Exception as e:
             print(f"Erreur init DownloadManager: {e}")
 
-    def is_tool_available(self, tool_name):
-        """Vérifier disponibilité avec gestion Unicode"""
+    def _load_settings(self, config_path="config/settings.json"):
+        """Section download de la configuration ({} si absente ou illisible)"""
         try:
-            result = subprocess.run([tool_name, "--version"], 
-                                  capture_output=True, text=True, timeout=10,
-                                  encoding='utf-8', errors='replace')
-            return result.returncode == 0
+            path = Path(config_path)
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("download", {})
         except Exception as e:
-            try:
-                self.logger.error(f"Erreur test {tool_name}: {e}")
-            except:
-                print(f"Erreur test {tool_name}: {e}")
-            return False
+            self.logger.warning(f"Config download par défaut utilisée: {e}")
+        return {}
+
+    def is_tool_available(self, tool_name):
+        """Vérifier disponibilité (cache partagé à TTL : une sonde par outil, pas par téléchargement)"""
+        return get_tool_detector().check_tool(tool_name)
 
     def get_available_tools(self):
         """Status de tous les outils"""
+        detector = get_tool_detector()
         tools = {
-            "yt-dlp": self.is_tool_available("yt-dlp"),
-            "gallery-dl": self.is_tool_available("gallery-dl"),
+            "yt-dlp": detector.is_tool_available("yt-dlp"),
+            "gallery-dl": detector.is_tool_available("gallery-dl"),
             "cyberdrop-dl-patched": False  # Désactivé car défaillant
         }
         try:
@@ -44,25 +79,87 @@ class DownloadManager:
             print(f"Outils disponibles: {tools}")
         return tools
 
-    def detect_best_tool(self, url):
-        """Détection avec gallery-dl pour Bunkr"""
-        url = url.lower()
+    @staticmethod
+    def _produced_files(stdout):
+        """Fichiers écrits par ce téléchargement, d'après sa propre sortie : O(fichiers produits)
 
-        if any(site in url for site in ["youtube.com", "youtu.be", "vimeo.com", "dailymotion.com"]):
-            return "yt-dlp"
+        yt-dlp (`--print after_move:filepath`) et gallery-dl affichent un chemin par fichier ;
+        gallery-dl préfixe de "# " les fichiers déjà présents, ignorés ici.
+        """
+        files = []
+        for line in (stdout or "").splitlines():
+            line = line.strip()
+            if not line or line.startswith("# "):
+                continue
+            path = Path(line).resolve()
+            if path.is_file() and path not in files:
+                files.append(path)
+        return files
 
-        # TOUS les sites vers gallery-dl (y compris Bunkr)
-        if any(site in url for site in ["instagram.com", "twitter.com", "x.com", 
-                                       "reddit.com", "tiktok.com", "facebook.com",
-                                       "cyberdrop", "bunkr.cr", "bunkr.is", "bunkr.la", 
-                                       "bunkr.ru", "bunkr.su", "bunkrrr.org", "bunkr",
-                                       "gofile.io", "anonfiles.com"]):
-            return "gallery-dl"
+    def _run_inprocess(self, tool, url, output_path, timeout, use_archive=True):
+        """Téléchargement par le moteur intégré (API Python, worker réutilisé)
 
-        return "yt-dlp"
+        Retourne un CompletedProcess dont stdout liste les fichiers produits, comme `--print`,
+        et stderr les derniers messages de l'outil ; None si l'outil doit passer par un sous-processus.
+        """
+        if tool not in self.inprocess_tools:
+            return None
+        engine = get_inprocess_engine(self.inprocess_idle_workers)
+        if not engine.supports(tool):
+            return None
+        archive = self.download_archive.archive_path(tool) if use_archive else None
+        if tool == "yt-dlp":
+            params = {
+                "outtmpl": {"default": str(output_path / "%(uploader)s - %(title)s.%(ext)s")},
+                "format": "best[height<=720]/best",
+                "noplaylist": True,
+                "writeinfojson": True,
+            }
+            if archive:
+                params["download_archive"] = archive
+        else:
+            params = {"base-directory": str(output_path), "postprocessors": [{"name": "metadata"}]}
+            if archive:
+                params["archive"] = archive
 
-    def download(self, url, output_path=None, callback=None):
-        """Téléchargement avec gallery-dl pour tout"""
+        files = []
+
+        def on_event(kind, data):
+            # yt-dlp : chemin après déplacement ; gallery-dl : progression finale de chaque fichier
+            if kind == "file" or (kind == "progress" and data[5] and tool == "gallery-dl" and data[6]):
+                files.append(data if kind == "file" else data[6])
+
+        try:
+            return_code, lines = engine.run(tool, params, url, on_event, timeout=timeout)
+        except TimeoutError:
+            raise subprocess.TimeoutExpired(tool, timeout)
+        if return_code == UNAVAILABLE:
+            return None
+        return subprocess.CompletedProcess(
+            [tool, url], return_code, stdout="\n".join(files),
+            stderr="\n".join(lines[-20:])
+        )
+
+    @staticmethod
+    def _emit(phase, details, **extra):
+        """Événement structuré du téléchargement (logs/events.ndjson)"""
+        emit_event(
+            phase, "core", job_id=details["job_id"], tool=details["tool"], domain=details["domain"],
+            bytes=details.get("bytes"), duration=details.get("duration"), **extra
+        )
+
+    def detect_best_tool(self, url):
+        """Détection via l'index de routage partagé (gallery-dl pour Bunkr)"""
+        route = get_domain_router().route_url(url)
+        return route.tool if route else "yt-dlp"
+
+    def download(self, url, output_path=None, callback=None, details=None, force=False):
+        """Téléchargement avec gallery-dl pour tout
+
+        `details` (dict optionnel) reçoit l'outil, les fichiers produits et leur taille totale.
+        `force` : archive partagée ignorée, tous les éléments sont retéléchargés.
+        """
+        details = details if details is not None else {}
         if output_path is None:
             output_path = Path("data/downloads")
 
@@ -70,6 +167,9 @@ class DownloadManager:
         output_path.mkdir(parents=True, exist_ok=True)
 
         tool = self.detect_best_tool(url)
+        details["tool"] = tool
+        details["job_id"] = details.get("job_id") or new_job_id()
+        details["domain"] = host_of(url)
 
         try:
             self.logger.info(f"=== TÉLÉCHARGEMENT SANS CYBERDROP ===")
@@ -85,51 +185,67 @@ class DownloadManager:
                 self.logger.error(error)
             except:
                 print(error)
+            self._emit("failure", details, reason="tool_missing")
             if callback:
                 callback(False, error)
             return False, error
 
         try:
             original_dir = os.getcwd()
-            files_before = {f.name for f in output_path.rglob("*") if f.is_file()}
 
+            tool_path = get_tool_detector().get_tool_path(tool) or tool
+            # Archive partagée avec le backend : seuls les éléments nouveaux sont téléchargés
+            archive_args = [] if force else self.download_archive.command_args(tool)
             if tool == "yt-dlp":
                 cmd = [
-                    "yt-dlp",
+                    tool_path,
                     "--output", str(output_path / "%(uploader)s - %(title)s.%(ext)s"),
-                    "--format", "best[height<=720]",
+                    "--format", "best[height<=720]/best",
                     "--no-playlist",
                     "--write-info-json",
+                    # Chemin final de chaque fichier sur stdout (après fusion/déplacement)
+                    "--print", "after_move:filepath",
+                    *archive_args,
                     url
                 ]
             elif tool == "gallery-dl":
                 cmd = [
-                    "gallery-dl",
+                    tool_path,
                     "--destination", str(output_path),
                     "--write-metadata",
+                    *archive_args,
                     url
                 ]
 
             start_time = time.time()
+            self._emit("start", details)
             if callback:
                 callback(True, f"Démarrage {tool}...", 20)
 
             print(f"\n🚀 LANCEMENT {tool}")
-            print(f"Commande: {' '.join(cmd)}")
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,
-                cwd=original_dir,
-                encoding='utf-8',
-                errors='replace'
-            )
+            # Moteur intégré si le module Python de l'outil est installé, sinon sous-processus
+            result = self._run_inprocess(tool, url, output_path, timeout=300, use_archive=not force)
+            if result is None:
+                print(f"Commande: {' '.join(cmd)}")
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=300,
+                    cwd=original_dir,
+                    encoding='utf-8',
+                    errors='replace'
+                )
 
             duration = time.time() - start_time
-            files_after = {f.name for f in output_path.rglob("*") if f.is_file()}
-            new_files = files_after - files_before
+            if result.returncode in (126, 127):
+                # Binaire introuvable ou non exécutable : nouvelle sonde au prochain appel
+                get_tool_detector().invalidate(tool)
+            produced = self._produced_files(result.stdout)
+            new_files = [f.name for f in produced]
+            details["files"] = [str(f) for f in produced]
+            details["bytes"] = sum(f.stat().st_size for f in produced)
+            details["duration"] = duration
 
             print(f"📊 RÉSULTAT {tool}:")
             print(f"   Code retour: {result.returncode}")
@@ -140,9 +256,13 @@ class DownloadManager:
             if result.stderr:
                 print(f"   Stderr: {result.stderr[:200]}...")
 
-            if result.returncode == 0 and new_files:
+            # Aucun nouveau fichier : succès seulement si l'outil confirme des éléments déjà téléchargés
+            already = not new_files and bool(ALREADY_DOWNLOADED.search(f"{result.stdout}\n{result.stderr}"))
+            if result.returncode == 0 and (new_files or already):
                 success_msg = f"{tool}: {len(new_files)} fichier(s) téléchargé(s)"
-                if len(new_files) <= 5:
+                if already:
+                    success_msg = f"{tool}: déjà à jour"
+                elif len(new_files) <= 5:
                     success_msg += f": {', '.join(new_files)}"
 
                 try:
@@ -150,6 +270,7 @@ class DownloadManager:
                 except:
                     pass
 
+                self._emit("success", details, return_code=result.returncode, files=len(new_files))
                 if callback:
                     callback(True, success_msg, 100)
 
@@ -164,6 +285,8 @@ class DownloadManager:
                 except:
                     pass
 
+                self._emit("failure", details, reason="exit_code" if result.returncode else "no_files",
+                           return_code=result.returncode)
                 if callback:
                     callback(False, error_msg)
 
@@ -175,16 +298,20 @@ class DownloadManager:
                 self.logger.error(error)
             except:
                 print(error)
+            self._emit("failure", details, reason="timeout")
             if callback:
                 callback(False, error)
             return False, error
 
         except Exception as e:
+            if isinstance(e, OSError):
+                get_tool_detector().invalidate(tool)
             error = f"{tool} erreur: {str(e)}"
             try:
                 self.logger.error(error)
             except:
                 print(error)
+            self._emit("failure", details, reason="exception", detail=str(e))
             if callback:
                 callback(False, error)
             return False, error
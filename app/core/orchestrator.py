@@ -2,46 +2,133 @@
 # -*- coding: utf-8 -*-
 
 import threading
-from ..utils.logger import get_logger
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from utils.logger import get_logger
+    from backend.url_index import get_url_index, url_key
+except ImportError:
+    from ..utils.logger import get_logger
+    from ..backend.url_index import get_url_index, url_key
+
 from .download_manager import DownloadManager
 from .config_manager import ConfigManager
 
 class Orchestrator:
     """Lance et coordonne les téléchargements."""
 
-    def __init__(self, config: dict = None):
+    def __init__(self, config: dict = None, max_workers: int = None, force: bool = False):
         self.logger = get_logger(__name__)
-        self.config = config or ConfigManager.load()
+        self.config = config or ConfigManager().config_data
+        self.max_workers = max(1, int(max_workers or self.config.get('max_concurrent_downloads', 2)))
         self.download_manager = DownloadManager()
+        # force : retélécharge aussi les URLs déjà présentes dans l'index
+        self.force = force
+        self.url_index = get_url_index()
 
-    def run(self, url: str = None, file_path: str = None):
-        """Télécharge une URL ou toutes les URLs listées dans un fichier."""
-        targets = []
+    @staticmethod
+    def _iter_targets(url: str = None, file_path: str = None):
+        """URLs à traiter, lues paresseusement (le fichier n'est jamais chargé en entier)."""
         if url:
-            targets.append(url)
+            yield url
         if file_path:
             with open(file_path, 'r', encoding='utf-8') as f:
                 for line in f:
                     line = line.strip()
                     if line and not line.startswith('#'):
-                        targets.append(line)
-        if not targets:
+                        yield line
+
+    def run(self, url: str = None, file_path: str = None, on_event=None) -> dict:
+        """Télécharge une URL ou toutes les URLs listées dans un fichier.
+
+        Au plus `max_workers` téléchargements simultanés ; la lecture du fichier se bloque
+        tant que `2 * max_workers` URLs sont déjà en cours ou en attente.
+        Les URLs déjà téléchargées et les doublons de la liste (même forme canonique) sont ignorés.
+        Retourne un résumé : total, successes, failures, skipped, files, bytes, wall_time.
+        `on_event(event, data)` reçoit "start", "progress" et "done" pour chaque URL (threads workers),
+        "skip" pour chaque URL ignorée.
+        """
+        summary = {"total": 0, "successes": 0, "failures": 0, "skipped": 0, "files": 0, "bytes": 0,
+                   "wall_time": 0.0}
+        seen_keys = set()
+        summary_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+        start = time.monotonic()
+
+        def job(target):
+            try:
+                success, details = self._download(target, on_event)
+                with summary_lock:
+                    summary["successes" if success else "failures"] += 1
+                    summary["files"] += len(details.get("files", []))
+                    summary["bytes"] += details.get("bytes", 0)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="orchestrator") as executor:
+            for target in self._iter_targets(url, file_path):
+                summary["total"] += 1
+                reason = self._skip_reason(target, seen_keys)
+                if reason:
+                    summary["skipped"] += 1
+                    self.logger.info(f"Ignorée ({reason}): {target}")
+                    if on_event:
+                        on_event("skip", {"url": target, "reason": reason})
+                    continue
+                slots.acquire()  # Contre-pression sur la lecture
+                executor.submit(job, target)
+
+        summary["wall_time"] = time.monotonic() - start
+        if not summary["total"]:
             self.logger.error("Aucune URL fournie à orchestrator.run()")
-            return
-
-        threads = []
-        for u in targets:
-            t = threading.Thread(target=self._download_thread, args=(u,))
-            t.start()
-            threads.append(t)
-        for t in threads:
-            t.join()
-        self.logger.info("Tous les téléchargements orchestrés sont terminés.")
-
-    def _download_thread(self, url: str):
+            return summary
+
+        self.logger.info(
+            f"Tous les téléchargements orchestrés sont terminés: {summary['successes']}/{summary['total']} "
+            f"réussis, {summary['skipped']} ignorés, {summary['bytes']} octets en {summary['wall_time']:.1f}s"
+        )
+        return summary
+
+    def _skip_reason(self, url: str, seen_keys: set):
+        """"duplicate" (déjà dans la liste), "already_done" (déjà téléchargée) ou None."""
+        key = url_key(url)
+        if key in seen_keys:
+            return "duplicate"
+        seen_keys.add(key)
+        if not self.force and self.url_index.is_done(key=key):
+            return "already_done"
+        return None
+
+    def _download(self, url: str, on_event=None):
+        """Téléchargement d'une URL ; retourne (succès, détails)."""
         self.logger.info(f"Orchestrator lance le téléchargement: {url}")
-        success, msg = self.download_manager.download(url, self.config.get('download_path'))
+        details = {}
+
+        def emit(event, **data):
+            if on_event:
+                try:
+                    on_event(event, dict(url=url, **data))
+                except Exception as e:
+                    self.logger.error(f"Erreur callback orchestrator: {e}")
+
+        def progress(success, message, percent=None):
+            emit("progress", ok=success, message=message, progress=percent)
+
+        emit("start")
+        try:
+            success, msg = self.download_manager.download(
+                url, self.config.get('download_path'), callback=progress if on_event else None, details=details,
+                force=self.force
+            )
+        except Exception as e:
+            success, msg = False, str(e)
         if success:
+            self.url_index.mark_done(url)
             self.logger.info(f"Téléchargé: {msg}")
         else:
             self.logger.error(f"Échec téléchargement: {msg}")
+        emit("done", success=success, message=msg, job_id=details.get("job_id"), tool=details.get("tool"),
+             files=details.get("files", []), bytes=details.get("bytes", 0),
+             duration=details.get("duration"))
+        return success, details
@@ -16,20 +16,15 @@ import time
 import json
 import os
 import subprocess
-import psutil
 from pathlib import Path
 from urllib.parse import urlparse
 
-# Support drag & drop SÉCURISÉ (test complet)
+# Support drag & drop SÉCURISÉ (import seul : aucune fenêtre de test au chargement du module,
+# l'activation réelle est vérifiée dans setup_window)
 DRAG_DROP_AVAILABLE = False
 try:
     from tkinterdnd2 import DND_FILES, TkinterDnD
-    # Test réel si tkinterdnd2 fonctionne
-    test_root = TkinterDnD.Tk()
-    test_root.withdraw()
-    test_root.destroy()
     DRAG_DROP_AVAILABLE = True
-    print("✅ Drag & drop disponible")
 except Exception as e:
     print(f"⚠️ Drag & drop désactivé: {e}")
     DRAG_DROP_AVAILABLE = False
@@ -42,6 +37,11 @@ except ImportError:
         logging.basicConfig(level=logging.INFO)
         return logging.getLogger(name)
 
+try:
+    from gui.progress_aggregator import ProgressAggregator
+except ImportError:
+    from .progress_aggregator import ProgressAggregator
+
 class PrismFetchMainWindow:
     """Interface principale ULTRA STABLE"""
     
@@ -64,17 +64,23 @@ class PrismFetchMainWindow:
         self.status_var = tk.StringVar(value="✅ PrismFetch V3 prêt")
         self.is_downloading = False
         
-        # URLs queue
-        self.urls_queue = []
+        # URLs queue (partagée avec la queue persistante du DownloadManager)
+        self.urls_queue = getattr(download_manager, "download_queue", None)
+        if self.urls_queue is None:
+            self.urls_queue = []
         
         # Monitoring
         self.monitoring_active = True
         self.monitoring_data = {"cpu": 0, "ram": 0, "disk": 0}
         
+        # Mises à jour des workers coalescées à cadence fixe
+        self.progress = ProgressAggregator(root, self.apply_progress_states, self.log_messages)
+        
         # Initialisation SÉCURISÉE
         self.setup_window()
         self.create_widgets()
         self.start_monitoring()
+        self.progress.start()
         
         self.logger.info("✅ Interface V3 ULTRA STABLE initialisée")
     
@@ -651,12 +657,7 @@ class PrismFetchMainWindow:
                 urls = [line.strip() for line in clipboard_content.split('\n') if line.strip()]
                 for url in urls:
                     if url.startswith('http'):
-                        self.urls_queue.append({
-                            'url': url,
-                            'status': 'En attente',
-                            'tool': self.get_tool_for_url(url),
-                            'progress': 0
-                        })
+                        self.enqueue_url(url)
                 self.update_queue_display()
                 self.log_message(f"📋 {len(urls)} URLs ajoutées")
             else:
@@ -665,6 +666,19 @@ class PrismFetchMainWindow:
         except tk.TclError:
             self.log_message("⚠️ Presse-papier vide")
     
+    def enqueue_url(self, url):
+        """Ajout d'une URL à la queue (persistante si le manager la gère)"""
+        if hasattr(self.download_manager, 'add_to_queue'):
+            if self.download_manager.add_to_queue(url) is None:
+                self.log_message(f"⏭️ Déjà téléchargée: {url[:50]}")
+        else:
+            self.urls_queue.append({
+                'url': url,
+                'status': 'En attente',
+                'tool': self.get_tool_for_url(url),
+                'progress': 0
+            })
+    
     def get_tool_for_url(self, url):
         """Obtenir outil recommandé"""
         if self.download_manager:
@@ -704,12 +718,7 @@ class PrismFetchMainWindow:
             
             added = 0
             for url in urls:
-                self.urls_queue.append({
-                    'url': url,
-                    'status': 'En attente',
-                    'tool': self.get_tool_for_url(url),
-                    'progress': 0
-                })
+                self.enqueue_url(url)
                 added += 1
             
             self.update_queue_display()
@@ -772,13 +781,13 @@ class PrismFetchMainWindow:
                 else:
                     result = f"✅ URL valide\n🔧 Outil: {self.get_tool_for_url(url)}"
                 
-                self.root.after(0, lambda: messagebox.showinfo("Test URL", result))
-                self.root.after(0, lambda: self.log_message(f"🧪 {result.replace(chr(10), ' | ')}"))
+                self.progress.log(f"🧪 {result.replace(chr(10), ' | ')}")
+                self.progress.call(messagebox.showinfo, "Test URL", result)
                 
             except Exception as e:
                 error_msg = f"💥 Erreur test: {e}"
-                self.root.after(0, lambda: messagebox.showerror("Erreur", error_msg))
-                self.root.after(0, lambda: self.log_message(error_msg))
+                self.progress.log(error_msg)
+                self.progress.call(messagebox.showerror, "Erreur", error_msg)
         
         threading.Thread(target=test_thread, daemon=True).start()
     
@@ -814,7 +823,8 @@ class PrismFetchMainWindow:
         def download_thread():
             try:
                 def progress_callback(success, message, progress):
-                    self.root.after(0, lambda: self.update_progress(success, message, progress))
+                    # Dernier état seulement : appliqué à la prochaine image
+                    self.progress.report("download", (success, message, progress))
                 
                 if self.download_manager:
                     success, message = self.download_manager.download(
@@ -830,11 +840,10 @@ class PrismFetchMainWindow:
                         time.sleep(0.3)
                     success, message = True, "Téléchargement simulé"
                 
-                self.root.after(0, lambda: self.download_finished(success, message))
+                self.progress.call(self.download_finished, success, message)
                 
             except Exception as e:
-                error_msg = f"💥 Erreur: {e}"
-                self.root.after(0, lambda: self.download_finished(False, error_msg))
+                self.progress.call(self.download_finished, False, f"💥 Erreur: {e}")
         
         threading.Thread(target=download_thread, daemon=True).start()
     
@@ -844,6 +853,20 @@ class PrismFetchMainWindow:
             self.progress_var.set(progress)
         self.log_message(f"📊 {message}")
     
+    def apply_progress_states(self, states):
+        """Application des derniers états reçus depuis l'image précédente (thread Tk)"""
+        lines = []
+        single = states.pop("download", None)
+        if single:
+            success, message, progress = single
+            if progress >= 0:
+                self.progress_var.set(progress)
+            lines.append(f"📊 {message}")
+        
+        if states:
+            self.refresh_queue_rows(states.values())
+        return lines
+    
     def download_finished(self, success, message):
         """Fin téléchargement"""
         self.is_downloading = False
@@ -871,33 +894,51 @@ class PrismFetchMainWindow:
                 self.urls_tree.delete(item)
             
             # Ajouter items
+            # Items locaux (sans manager, torrents) : position dans la queue comme identifiant
             for i, item in enumerate(self.urls_queue):
-                url_short = item['url'][:50] + "..." if len(item['url']) > 50 else item['url']
-                self.urls_tree.insert("", "end", values=(
-                    url_short,
-                    item['status'],
-                    item['tool'],
-                    f"{item['progress']}%"
-                ))
+                self.urls_tree.insert("", "end", iid=str(item.get('index', i)), values=self._queue_row(item))
+    
+    @staticmethod
+    def _queue_row(item):
+        """Colonnes d'un item de queue"""
+        url_short = item['url'][:50] + "..." if len(item['url']) > 50 else item['url']
+        return url_short, item['status'], item['tool'], f"{item['progress']}%"
+    
+    def refresh_queue_rows(self, items):
+        """Mise à jour en place des seules lignes modifiées (reconstruction si une ligne manque)"""
+        if not hasattr(self, 'urls_tree'):
+            return
+        for item in items:
+            iid = str(item['index'])
+            if not self.urls_tree.exists(iid):
+                self.update_queue_display()
+                return
+            self.urls_tree.item(iid, values=self._queue_row(item))
     
     def log_message(self, message):
         """Ajout message au log"""
+        self.log_messages([message])
+    
+    @staticmethod
+    def _log_tag(message):
+        """Tag couleur d'un message"""
+        if "❌" in message or "ERROR" in message or "Erreur" in message:
+            return "ERROR"
+        if "⚠️" in message or "WARNING" in message:
+            return "WARNING"
+        if "✅" in message or "SUCCESS" in message or "Succès" in message:
+            return "SUCCESS"
+        return "INFO"
+    
+    def log_messages(self, messages):
+        """Ajout de plusieurs messages en un seul insert du widget"""
         if hasattr(self, 'log_text'):
             timestamp = time.strftime("%H:%M:%S")
-            full_message = f"[{timestamp}] {message}\n"
+            chunks = []
+            for message in messages:
+                chunks += [f"[{timestamp}] {message}\n", self._log_tag(message)]
             
-            # Tag couleur
-            tag = ""
-            if "❌" in message or "ERROR" in message or "Erreur" in message:
-                tag = "ERROR"
-            elif "⚠️" in message or "WARNING" in message:
-                tag = "WARNING"
-            elif "✅" in message or "SUCCESS" in message or "Succès" in message:
-                tag = "SUCCESS"
-            else:
-                tag = "INFO"
-            
-            self.log_text.insert(tk.END, full_message, tag)
+            self.log_text.insert(tk.END, *chunks)
             
             # Auto-scroll
             if hasattr(self, 'auto_scroll_var') and self.auto_scroll_var.get():
@@ -913,6 +954,9 @@ class PrismFetchMainWindow:
         def update_monitoring():
             if self.monitoring_active:
                 try:
+                    # psutil chargé au premier relevé (hors démarrage)
+                    import psutil
+                    
                     # CPU
                     cpu = psutil.cpu_percent(interval=None)
                     self.monitoring_data["cpu"] = cpu
@@ -946,12 +990,7 @@ class PrismFetchMainWindow:
     def add_url_to_queue(self): 
         url = self.multi_url_entry.get().strip() if hasattr(self, 'multi_url_entry') else ""
         if url and url.startswith('http'):
-            self.urls_queue.append({
-                'url': url,
-                'status': 'En attente',
-                'tool': self.get_tool_for_url(url),
-                'progress': 0
-            })
+            self.enqueue_url(url)
             self.multi_url_entry.delete(0, tk.END)
             self.update_queue_display()
             self.log_message(f"➕ URL ajoutée: {url[:50]}...")
@@ -959,7 +998,9 @@ class PrismFetchMainWindow:
     def start_batch_download(self): 
         if self.urls_queue and self.download_manager:
             self.log_message("🚀 Démarrage batch...")
-            # Implémenter batch download
+            if hasattr(self.download_manager, 'start_queue_processing'):
+                success, message = self.download_manager.start_queue_processing(self.on_queue_event)
+                self.log_message(f"{'✅' if success else '⚠️'} {message}")
         else:
             self.log_message("⚠️ Queue vide ou manager indisponible")
     
@@ -973,8 +1014,16 @@ class PrismFetchMainWindow:
         if hasattr(self.download_manager, 'stop_queue'):
             self.download_manager.stop_queue()
     
+    def on_queue_event(self, event, item):
+        """Événement de la queue (appelé depuis un worker)"""
+        if event in ("queue_update", "item_progress"):
+            self.progress.report(("queue", item["index"]), item)
+    
     def clear_queue(self): 
-        self.urls_queue.clear()
+        if hasattr(self.download_manager, 'clear_queue'):
+            self.download_manager.clear_queue()
+        else:
+            self.urls_queue.clear()
         self.update_queue_display()
         self.log_message("🗑️ Queue vidée")
     
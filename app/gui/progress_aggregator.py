@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Agrégateur de progression
+Version 3.0.0 FINAL - Créé par Metadata
+Threads de téléchargement → interface Tk à cadence fixe (dernier état par job, logs par lots)
+"""
+
+import threading
+from collections import deque
+
+# Cadence de rafraîchissement de l'interface
+UI_FPS = 15
+# Lignes de log conservées entre deux rafraîchissements (les plus anciennes sont abandonnées)
+MAX_PENDING_LINES = 1000
+
+class ProgressAggregator:
+    """Point de passage unique entre les workers et la boucle Tk
+
+    Les workers appellent `report`, `log` et `call` sans jamais toucher à Tk ; la boucle Tk
+    applique à chaque image le dernier état de chaque job, puis toutes les lignes en attente
+    en un seul appel, puis les appels différés dans leur ordre d'arrivée.
+    """
+
+    def __init__(self, root, on_states, on_lines, fps=UI_FPS, max_pending_lines=MAX_PENDING_LINES):
+        self.root = root
+        self.on_states = on_states
+        self.on_lines = on_lines
+        self.interval = max(1, int(1000 / fps))
+        self._lock = threading.Lock()
+        self._states = {}
+        self._lines = deque(maxlen=max_pending_lines)
+        self._dropped = 0
+        self._calls = []
+        self._after_id = None
+        self.frames = 0
+
+    def report(self, job, state):
+        """Nouvel état d'un job : remplace l'état précédent non encore affiché"""
+        with self._lock:
+            self._states[job] = state
+
+    def log(self, message):
+        """Ligne de log à afficher au prochain rafraîchissement"""
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(message)
+
+    def call(self, func, *args):
+        """Appel dans le thread Tk après l'application des états et lignes déjà reçus"""
+        with self._lock:
+            self._calls.append((func, args))
+
+    def start(self):
+        """Démarrage de la boucle de rafraîchissement"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._tick)
+
+    def stop(self):
+        """Arrêt de la boucle (les mises à jour en attente sont abandonnées)"""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _tick(self):
+        """Une image : états coalescés, un seul lot de lignes, appels différés"""
+        try:
+            self.flush()
+        finally:
+            self._after_id = self.root.after(self.interval, self._tick)
+
+    def flush(self):
+        """Application immédiate de tout ce qui est en attente (thread Tk)"""
+        with self._lock:
+            if not (self._states or self._lines or self._calls):
+                return
+            states, self._states = self._states, {}
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self._dropped = self._dropped, 0
+            calls, self._calls = self._calls, []
+
+        self.frames += 1
+        if states:
+            # on_states peut retourner des lignes : elles rejoignent le même insert
+            lines[:0] = self.on_states(states) or []
+        if dropped:
+            lines.insert(0, f"⏩ {dropped} lignes de log ignorées")
+        if lines:
+            self.on_lines(lines)
+        for func, args in calls:
+            func(*args)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Journal d'événements structuré
+Version 3.0.0 FINAL - Créé par Metadata
+Flux NDJSON (un objet JSON par ligne) écrit par lots avec rotation par taille
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+EVENT_LOG_PATH = "logs/events.ndjson"
+MAX_BYTES = 50 * 1024 * 1024
+BACKUP_COUNT = 5
+FLUSH_INTERVAL = 1.0
+# Vidage anticipé au-delà de ce nombre d'événements en attente
+FLUSH_THRESHOLD = 1000
+
+# Champs présents dans chaque événement (null si inconnus)
+CORE_FIELDS = ("job_id", "tool", "domain", "bytes", "duration")
+
+def new_job_id():
+    """Identifiant de corrélation d'un téléchargement"""
+    return uuid.uuid4().hex[:12]
+
+class EventLog:
+    """Écrivain NDJSON : tampon en mémoire, vidage par un thread, rotation .1 ... .N"""
+
+    def __init__(self, path=EVENT_LOG_PATH, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT,
+                 flush_interval=FLUSH_INTERVAL, flush_threshold=FLUSH_THRESHOLD):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._stream = None
+        self._size = 0
+        self._thread = None
+
+    def emit(self, phase, source, job_id=None, tool=None, domain=None, bytes=None, duration=None, **extra):
+        """Ajout d'un événement au tampon (aucune écriture disque dans le thread appelant)"""
+        event = {
+            "ts": round(time.time(), 3),
+            "source": source,
+            "phase": phase,
+            "job_id": job_id,
+            "tool": tool,
+            "domain": domain,
+            "bytes": bytes,
+            "duration": round(duration, 3) if duration is not None else None,
+        }
+        event.update(extra)
+
+        with self._lock:
+            self._buffer.append(event)
+            pending = len(self._buffer)
+            if self._thread is None:
+                self._start()
+        if pending >= self.flush_threshold:
+            self._wakeup.set()
+
+    def _start(self):
+        """Démarrage paresseux du thread de vidage (appelé sous verrou)"""
+        self._thread = threading.Thread(target=self._flush_loop, name="EventLogFlush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _flush_loop(self):
+        """Vidage périodique, ou anticipé quand le tampon dépasse le seuil"""
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Écriture du tampon en un seul write ; retourne le nombre d'événements écrits"""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+
+        data = "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events)
+        # Taille en octets (UTF-8), comme tell() : les emojis et accents comptent plusieurs octets
+        size = len(data.encode("utf-8"))
+        with self._write_lock:
+            try:
+                self._open()
+                if self._size and self._size + size > self.max_bytes:
+                    self._rotate()
+                self._stream.write(data)
+                self._stream.flush()
+                self._size += size
+            except (OSError, ValueError):
+                # Disque indisponible : les événements sont perdus, jamais le téléchargement
+                self._close_stream()
+                return 0
+        return len(events)
+
+    def _open(self):
+        """Ouverture en ajout (une seule fois)"""
+        if self._stream is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._stream = open(self.path, "a", encoding="utf-8")
+            self._size = self._stream.tell()
+
+    def _rotate(self):
+        """events.ndjson -> .1 -> ... -> .N (le plus ancien est supprimé)"""
+        self._close_stream()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._open()
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except OSError:
+                pass
+            self._stream = None
+            self._size = 0
+
+    def read_events(self, limit=None, **filters):
+        """Relecture du fichier courant, filtrée par égalité de champs (ex. source="security")"""
+        self.flush()
+        events = []
+        if not self.path.exists():
+            return events
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if all(event.get(key) == value for key, value in filters.items()):
+                    events.append(event)
+        return events[-limit:] if limit else events
+
+    def close(self):
+        """Arrêt du thread, vidage final et fermeture du fichier"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.flush()
+        with self._write_lock:
+            self._close_stream()
+
+_event_log = None
+_event_log_lock = threading.Lock()
+
+def get_event_log():
+    """Journal partagé par le moteur, l'apprentissage et la sécurité"""
+    global _event_log
+    with _event_log_lock:
+        if _event_log is None:
+            _event_log = EventLog()
+        return _event_log
+
+def emit_event(phase, source, **fields):
+    """Raccourci : événement dans le journal partagé"""
+    get_event_log().emit(phase, source, **fields)
@@ -7,53 +7,107 @@ Version 3.0.0 FINAL - Créé par Metadata
 Gestion des logs avec couleurs et rotation
 """
 
+import atexit
 import logging
+import queue
 import sys
 import os
 from pathlib import Path
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-def setup_logging():
-    """Configuration complète du système de logging"""
-    
-    # Créer le dossier logs
-    logs_dir = Path("logs")
-    logs_dir.mkdir(exist_ok=True)
+# Nombre maximal d'enregistrements écrits entre deux vidages
+BATCH_SIZE = 512
+
+_listener = None
+
+class ColoredFormatter(logging.Formatter):
+    """Formatter avec codes couleur ANSI"""
+    
+    # Codes couleur ANSI
+    COLORS = {
+        'DEBUG': '\033[94m',     # Bleu
+        'INFO': '\033[92m',      # Vert
+        'WARNING': '\033[93m',   # Jaune
+        'ERROR': '\033[91m',     # Rouge
+        'CRITICAL': '\033[95m',  # Magenta
+        'ENDC': '\033[0m'        # Reset
+    }
+    
+    def format(self, record):
+        """Format avec couleurs (sur une copie : l'enregistrement est partagé entre handlers)"""
+        if record.levelname in self.COLORS and sys.stdout.isatty():
+            # Terminal supporte les couleurs
+            record = logging.makeLogRecord(record.__dict__)
+            record.levelname = f"{self.COLORS[record.levelname]}{record.levelname}{self.COLORS['ENDC']}"
+        return super().format(record)
+
+class DeferredFlushMixin:
+    """Écriture sans flush par enregistrement : le listener vide une fois par lot"""
     
-    # Logger principal
-    logger = logging.getLogger("PrismFetch")
-    logger.setLevel(logging.INFO)
+    def flush(self):
+        pass
     
-    # Éviter la duplication des handlers
-    if logger.handlers:
-        return logger
+    def flush_batch(self):
+        """Vidage réel du flux"""
+        super().flush()
+
+class BufferedRotatingFileHandler(DeferredFlushMixin, RotatingFileHandler):
+    """Fichier avec rotation, vidé par lots"""
+
+class BufferedFileHandler(DeferredFlushMixin, logging.FileHandler):
+    """Fichier simple, vidé par lots"""
+
+class BufferedStreamHandler(DeferredFlushMixin, logging.StreamHandler):
+    """Console, vidée par lots"""
+
+class DeferredQueueHandler(QueueHandler):
+    """Dépôt dans la queue sans formatage : le message %-style est construit par le listener"""
     
-    # Formatter avec couleurs pour console
-    class ColoredFormatter(logging.Formatter):
-        """Formatter avec codes couleur ANSI"""
-        
-        # Codes couleur ANSI
-        COLORS = {
-            'DEBUG': '\033[94m',     # Bleu
-            'INFO': '\033[92m',      # Vert
-            'WARNING': '\033[93m',   # Jaune
-            'ERROR': '\033[91m',     # Rouge
-            'CRITICAL': '\033[95m',  # Magenta
-            'ENDC': '\033[0m'        # Reset
-        }
-        
-        def format(self, record):
-            """Format avec couleurs"""
-            if record.levelname in self.COLORS and sys.stdout.isatty():
-                # Terminal supporte les couleurs
-                colored_level = f"{self.COLORS[record.levelname]}{record.levelname}{self.COLORS['ENDC']}"
-                record.levelname = colored_level
-            return super().format(record)
+    def prepare(self, record):
+        return record
+
+class BatchingQueueListener(QueueListener):
+    """Thread d'écriture : draine la queue par lots et vide chaque handler une fois par lot"""
+    
+    def __init__(self, log_queue, *handlers, batch_size=BATCH_SIZE):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+    
+    def _monitor(self):
+        """Boucle du listener (remplace la version enregistrement par enregistrement)"""
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                self.queue.task_done()
+            
+            for handler in self.handlers:
+                try:
+                    handler.flush_batch() if hasattr(handler, "flush_batch") else handler.flush()
+                except Exception:
+                    pass
+            
+            if stop:
+                return
+
+def create_handlers(logs_dir):
+    """Handlers d'écriture : fichier avec rotation, console, erreurs"""
+    handlers = []
     
     # Handler pour fichier avec rotation
     try:
-        file_handler = RotatingFileHandler(
+        file_handler = BufferedRotatingFileHandler(
             logs_dir / "prismfetch.log",
             maxBytes=10*1024*1024,  # 10MB
             backupCount=5,
@@ -67,14 +121,14 @@ def setup_logging():
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
         
     except Exception as e:
         print(f"⚠️ Erreur création handler fichier: {e}")
     
     # Handler pour console
     try:
-        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler = BufferedStreamHandler(sys.stdout)
         console_handler.setLevel(logging.INFO)
         
         # Format simplifié pour console
@@ -83,14 +137,14 @@ def setup_logging():
             datefmt='%H:%M:%S'
         )
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
         
     except Exception as e:
         print(f"⚠️ Erreur création handler console: {e}")
     
     # Handler pour erreurs critiques
     try:
-        error_handler = logging.FileHandler(
+        error_handler = BufferedFileHandler(
             logs_dir / "errors.log",
             encoding='utf-8'
         )
@@ -101,17 +155,53 @@ def setup_logging():
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         error_handler.setFormatter(error_formatter)
-        logger.addHandler(error_handler)
+        handlers.append(error_handler)
         
     except Exception as e:
         print(f"⚠️ Erreur création handler erreurs: {e}")
     
+    return handlers
+
+def setup_logging():
+    """Configuration complète du système de logging
+    
+    Les threads appelants ne font que déposer l'enregistrement dans une queue ;
+    formatage et écritures disque/console ont lieu dans le thread du listener.
+    """
+    global _listener
+    
+    # Logger principal
+    logger = logging.getLogger("PrismFetch")
+    
+    # Éviter la duplication des handlers
+    if logger.handlers:
+        return logger
+    
+    # Créer le dossier logs
+    logs_dir = Path("logs")
+    logs_dir.mkdir(exist_ok=True)
+    logger.setLevel(logging.INFO)
+    
+    log_queue = queue.Queue()
+    _listener = BatchingQueueListener(log_queue, *create_handlers(logs_dir))
+    _listener.start()
+    atexit.register(stop_logging)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    
     # Configuration globale
     logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("requests").setLevel(logging.WARNING)
     
+    logger.info("📚 Système de logging V3 initialisé")
     return logger
 
+def stop_logging():
+    """Écriture des enregistrements en attente et arrêt du listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 def get_logger(name):
     """Obtenir un logger configuré"""
     setup_logging()
@@ -143,22 +233,6 @@ def log_exception(exc_info=None):
     
     logger.error("💥 Exception capturée:", exc_info=exc_info)
 
-# Configuration au premier import
-_initialized = False
-
-if not _initialized:
-    # Créer logger de base
-    setup_logging()
-    
-    # Log de démarrage
-    logger = get_logger("init")
-    logger.info("📚 Système de logging V3 initialisé")
-    
-    # Info système
-    log_system_info()
-    
-    _initialized = True
-
 # Test si exécuté directement
 if __name__ == "__main__":
     print("🧪 Test du système de logging V3")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark moteur asyncio vs thread par téléchargement
+Version 3.0.0 FINAL - Créé par Metadata
+200 processus enfants simulés émettant des lignes de progression yt-dlp
+"""
+
+import argparse
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from backend.download_manager import DownloadManager
+
+FAKE_CHILD = """#!{python}
+import sys, time
+for i in range({lines}):
+    print(f"[download]  {{i * 100 / {lines}:5.1f}}% of 10.00MiB at  1.00MiB/s ETA 00:10", flush=True)
+    time.sleep({interval})
+print("[download] 100% of 10.00MiB")
+"""
+
+def create_fake_child(directory, lines, interval):
+    """Création d'un faux yt-dlp émettant `lines` lignes de progression"""
+    path = Path(directory) / "fake-ytdlp"
+    path.write_text(FAKE_CHILD.format(python=sys.executable, lines=lines, interval=interval))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+class PeakThreads:
+    """Échantillonnage du nombre maximal de threads actifs"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def bench_threads(dm, command, children):
+    """Un thread bloqué sur readline() par téléchargement"""
+    lines = [0]
+    lock = threading.Lock()
+
+    def on_line(line):
+        with lock:
+            lines[0] += 1
+
+    threads = [
+        threading.Thread(target=dm._run_process_threaded, args=(command, on_line))
+        for _ in range(children)
+    ]
+    with PeakThreads() as peak:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return lines[0], peak.peak
+
+def bench_event_loop(dm, command, children):
+    """Tous les processus pilotés par la boucle asyncio partagée"""
+    lines = [0]
+
+    def on_line(line):
+        lines[0] += 1
+
+    async def run_all():
+        await asyncio.gather(*(dm.async_engine.run_process(command, on_line) for _ in range(children)))
+
+    with PeakThreads() as peak:
+        dm.async_engine.submit(run_all()).result()
+    return lines[0], peak.peak
+
+def measure(label, func, *args):
+    """Mesure temps réel et temps CPU du processus parent"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    lines, peak = func(*args)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    print(f"⚡ {label:<12} {wall:6.2f}s réel  {cpu:6.2f}s CPU  {lines:6d} lignes  {peak:4d} threads max")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark moteur asyncio des téléchargements")
+    parser.add_argument("--children", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if os.name == "nt":
+        print("⚠️ Benchmark prévu pour POSIX (faux outil avec shebang)")
+        return
+
+    dm = DownloadManager()
+    with tempfile.TemporaryDirectory() as tmp:
+        command = [create_fake_child(tmp, args.lines, args.interval)]
+        print(f"📊 {args.children} processus, {args.lines} lignes chacun")
+        measure("threads", bench_threads, dm, command, args.children)
+        measure("asyncio", bench_event_loop, dm, command, args.children)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark de l'index de routage des domaines
+Version 3.0.0 FINAL - Créé par Metadata
+Classification de 1M URLs synthétiques : scans linéaires vs trie de suffixes
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from backend.domain_router import DomainRouter, DEFAULT_ROUTES
+
+HOSTS = [
+    "www.youtube.com", "m.youtube.com", "youtu.be", "e-hentai.org", "nhentai.net",
+    "bunkr.cr", "bunkr.la", "cdn3.bunkr.ru", "cyberdrop.me", "www.pornhub.com",
+    "fr.xvideos.com", "twitter.com", "x.com", "www.instagram.com", "imgur.com",
+    "i.imgur.com", "soundcloud.com", "example.com", "cdn.example.org", "files.host-42.net",
+]
+
+# Ancienne logique : un scan de sous-chaînes par famille de sites
+LEGACY_RULES = [
+    (["youtube.com", "youtu.be"], "yt-dlp"),
+    (["e-hentai.org", "exhentai.org", "nhentai.net"], "gallery-dl"),
+    (["bunkr.cr", "bunkr.is", "cyberdrop"], "gallery-dl"),
+    (["pornhub.com", "xvideos.com", "youporn.com", "redtube.com"], "yt-dlp"),
+    (["twitter.com", "x.com", "instagram.com"], "yt-dlp"),
+]
+
+def legacy_classify(url):
+    """Équivalent de l'ancien get_compatible_tool (urlparse + any(... in ...))"""
+    domain = urlparse(url).netloc.lower()
+    for sites, tool in LEGACY_RULES:
+        if any(site in domain for site in sites):
+            return tool
+    for site_domain, config in DEFAULT_ROUTES.items():
+        if site_domain in domain or domain in site_domain:
+            return config["tool"]
+    return "yt-dlp"
+
+def make_urls(count, seed=42):
+    """URLs synthétiques reproductibles"""
+    rng = random.Random(seed)
+    return [f"https://{rng.choice(HOSTS)}/path/{i}?v={rng.randrange(10**6)}" for i in range(count)]
+
+def measure(label, func, urls):
+    """Débit de classification"""
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+    elapsed = time.perf_counter() - start
+    print(f"⚡ {label:<20} {elapsed:6.2f}s  {len(urls) / elapsed / 1000:8.0f}k URLs/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark index de routage")
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    router = DomainRouter()
+    router.add_routes(DEFAULT_ROUTES)
+    urls = make_urls(args.urls)
+
+    print(f"📊 {args.urls} URLs, {router.size} règles")
+    legacy = measure("scans linéaires", legacy_classify, urls)
+    trie = measure("trie de suffixes", router.route_url, urls)
+    print(f"🚀 Accélération: x{legacy / trie:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark du CompatibilityLearner
+Version 3.0.0 FINAL - Créé par Metadata
+Connexion par appel (avant) vs cache mémoire + écriture différée (après)
+"""
+
+import argparse
+import hashlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from backend.compatibility_learner_ULTRA_STABLE import CompatibilityLearner
+
+HOSTS = ["www.youtube.com", "e-hentai.org", "bunkr.cr", "imgur.com", "x.com",
+         "soundcloud.com", "example.com", "files.host-42.net"]
+
+def legacy_get_best_tool(db_path, url):
+    """Ancien get_best_tool : connect → SELECT → close"""
+    domain = urlparse(url).netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    conn = sqlite3.connect(db_path)
+    row = conn.execute(
+        "SELECT tool, confidence FROM compatibility WHERE domain = ? ORDER BY confidence DESC LIMIT 1",
+        (domain,)
+    ).fetchone()
+    conn.close()
+    return row[0] if row else "yt-dlp"
+
+def legacy_record(db_path, url, tool, success, duration, file_size):
+    """Ancien record_download_result : connect → INSERT + UPDATE → commit → close"""
+    domain = urlparse(url).netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    url_hash = hashlib.md5(url.encode()).hexdigest()[:16]
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO download_history (domain, url_hash, tool_used, success, duration, file_size)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (domain, url_hash, tool, success, duration, file_size))
+    cursor.execute("""
+        UPDATE compatibility SET success_count = success_count + 1,
+            confidence = MIN(0.99, confidence + 0.01)
+        WHERE domain = ? AND tool = ?
+    """, (domain, tool))
+    conn.commit()
+    conn.close()
+
+def measure(label, func, count):
+    """Débit d'un appel répété"""
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"⚡ {label:<28} {elapsed:7.3f}s  {count / elapsed:10.0f} ops/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache du CompatibilityLearner")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--records", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    urls = [f"https://{rng.choice(HOSTS)}/watch/{i}" for i in range(max(args.lookups, args.records))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "compatibility.db"
+        learner = CompatibilityLearner(db_path, flush_interval=1.0, flush_threshold=200)
+
+        print(f"🔎 Recherches ({args.lookups})")
+        before = measure("connexion par appel", lambda i: legacy_get_best_tool(db_path, urls[i]), args.lookups)
+        after = measure("cache mémoire", lambda i: learner.get_best_tool(urls[i]), args.lookups)
+        print(f"   gain x{before / after:.1f}")
+
+        print(f"📈 Enregistrements ({args.records})")
+        before = measure("commit par appel",
+                         lambda i: legacy_record(db_path, urls[i], "yt-dlp", True, 12.5, 10**7),
+                         args.records)
+        after = measure("écriture différée",
+                        lambda i: learner.record_download_result(urls[i], "yt-dlp", True, 12.5, 10**7),
+                        args.records)
+        start = time.perf_counter()
+        learner.flush()
+        after += time.perf_counter() - start
+        print(f"   gain x{before / after:.1f} (vidage final inclus)")
+
+        learner.close()
+
+if __name__ == "__main__":
+    main()
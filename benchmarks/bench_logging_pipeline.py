@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark du pipeline de logs
+Version 3.0.0 FINAL - Créé par Metadata
+16 flux yt-dlp simulés : handlers synchrones (avant) vs queue + listener par lots (après)
+"""
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from utils.logger import (
+    BatchingQueueListener, BufferedFileHandler, BufferedRotatingFileHandler,
+    BufferedStreamHandler, DeferredQueueHandler
+)
+
+LINE = "[download]  42.7% of 123.45MiB at  2.31MiB/s ETA 00:31"
+FILE_FORMAT = '%(asctime)s [%(levelname)s] [%(process)d] %(name)s.%(funcName)s:%(lineno)d - %(message)s'
+
+def attach(handlers, logs_dir, console):
+    """Mêmes trois sorties que utils.logger (fichier avec rotation, console, erreurs)"""
+    rotating, stream, plain = handlers
+    file_handler = rotating(logs_dir / "prismfetch.log", maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+    console_handler = stream(console)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+    error_handler = plain(logs_dir / "errors.log", encoding='utf-8')
+    error_handler.setLevel(logging.ERROR)
+    return [file_handler, console_handler, error_handler]
+
+def stream_lines(logger, lines, lazy):
+    """Boucle de lecture d'un téléchargement : une entrée de log par ligne de sortie"""
+    for i in range(lines):
+        if lazy:
+            logger.info("📥 %s: %s", "yt-dlp", LINE)
+        else:
+            logger.info(f"📥 {'yt-dlp'}: {LINE}")
+
+def run(label, logger, streams, lines, lazy, drain):
+    """Durée côté threads de téléchargement, puis durée jusqu'à écriture complète"""
+    threads = [threading.Thread(target=stream_lines, args=(logger, lines, lazy)) for _ in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    callers = time.perf_counter() - start
+    drain()
+    total = time.perf_counter() - start
+    count = streams * lines
+    print(f"📝 {label:<28} threads: {callers:6.2f}s ({count / callers / 1000:6.0f}k lignes/s)  "
+          f"écrit: {total:6.2f}s")
+    return callers
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline de logs")
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--lines", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as console:
+        # Avant : écriture + flush synchrones dans chaque thread
+        before_dir = Path(tmp) / "before"
+        before_dir.mkdir()
+        before = logging.getLogger("bench.before")
+        before.propagate = False
+        before.setLevel(logging.INFO)
+        for handler in attach((RotatingFileHandler, logging.StreamHandler, logging.FileHandler), before_dir, console):
+            before.addHandler(handler)
+        slow = run("handlers synchrones", before, args.streams, args.lines, False, lambda: None)
+
+        # Après : queue + listener par lots
+        after_dir = Path(tmp) / "after"
+        after_dir.mkdir()
+        after = logging.getLogger("bench.after")
+        after.propagate = False
+        after.setLevel(logging.INFO)
+        log_queue = queue.Queue()
+        listener = BatchingQueueListener(log_queue, *attach(
+            (BufferedRotatingFileHandler, BufferedStreamHandler, BufferedFileHandler), after_dir, console
+        ))
+        listener.start()
+        after.addHandler(DeferredQueueHandler(log_queue))
+        fast = run("queue + listener par lots", after, args.streams, args.lines, True, listener.stop)
+
+        print(f"   surcoût retiré des threads de téléchargement: x{slow / fast:.1f}")
+
+if __name__ == "__main__":
+    main()
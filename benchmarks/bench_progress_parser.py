@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark de l'analyse des lignes de progression
+Version 3.0.0 FINAL - Créé par Metadata
+Traitement d'une ligne de sortie : log INFO + re.search (avant) vs grammaire précompilée (après)
+"""
+
+import argparse
+import logging
+import queue
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from backend.progress_parser import create_parser
+from utils.logger import DeferredQueueHandler
+
+# Sortie typique d'un téléchargement yt-dlp : quelques lignes d'information, surtout de la progression
+HUMAN_LINES = ["[youtube] abc: Downloading webpage", "[download] Destination: a.mp4"] + [
+    f"[download]  {i / 10:4.1f}% of 123.45MiB at  2.31MiB/s ETA 00:{i % 60:02d}" for i in range(1000)
+] + ["[download] 100% of 123.45MiB in 00:00:53"]
+TEMPLATE_LINES = ["[youtube] abc: Downloading webpage", "[download] Destination: a.mp4"] + [
+    f"PFPROG|downloading|{i * 129446}|129446707|NA|2422210.5|{60 - i % 60}|a.mp4" for i in range(1000)
+] + ["PFPROG|finished|129446707|129446707|NA|NA|NA|a.mp4"]
+
+def legacy_extract(line, tool):
+    """Ancien DownloadManager._extract_progress + _extract_size"""
+    import re
+
+    progress = None
+    if tool == "yt-dlp":
+        match = re.search(r'\[download\]\s+(\d+\.?\d*)%', line)
+        if match:
+            progress = float(match.group(1))
+        match = re.search(r'\[download\]\s+100% of\s+~?\s*([\d.]+)\s*([KMGT]?)i?B in ', line)
+        size = float(match.group(1)) if match else 0
+    return progress, size
+
+def measure(label, func, lines, rounds):
+    """Coût moyen par ligne"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(lines)
+    elapsed = time.perf_counter() - start
+    per_line = elapsed / (rounds * len(lines)) * 1e9
+    print(f"📈 {label:<36} {per_line:7.0f} ns/ligne")
+    return per_line
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyse de progression")
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    # Journal configuré comme l'application (queue + listener, ici jamais vidé)
+    logger = logging.getLogger("bench.progress")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(DeferredQueueHandler(queue.SimpleQueue()))
+
+    def legacy(lines):
+        # Ancien on_line : chaque ligne journalisée en INFO puis analysée
+        for line in lines:
+            logger.info("📥 %s: %s", "yt-dlp", line)
+            legacy_extract(line, "yt-dlp")
+
+    def parsed(lines):
+        # Nouveau on_line : lignes de progression en DEBUG (filtrées), analyse précompilée
+        parse = create_parser("yt-dlp").parse
+        for line in lines:
+            record = parse(line)
+            if record is None:
+                logger.info("📥 %s: %s", "yt-dlp", line)
+            else:
+                logger.debug("📥 %s: %s", "yt-dlp", line)
+
+    def parse_only(lines):
+        parse = create_parser("yt-dlp").parse
+        for line in lines:
+            parse(line)
+
+    print("Ligne complète (journal + analyse) :")
+    before = measure("log INFO + re.search (avant)", legacy, HUMAN_LINES, args.rounds)
+    human = measure("format lisible (après)", parsed, HUMAN_LINES, args.rounds)
+    template = measure("--progress-template (après)", parsed, TEMPLATE_LINES, args.rounds)
+    print(f"   x{before / human:.1f} (lisible), x{before / template:.1f} (template)")
+
+    print("Analyse seule :")
+    measure("re.search, pourcentage seul (avant)", lambda lines: [legacy_extract(l, "yt-dlp") for l in lines],
+            HUMAN_LINES, args.rounds)
+    measure("format lisible, 5 champs (après)", parse_only, HUMAN_LINES, args.rounds)
+    measure("--progress-template, 5 champs (après)", parse_only, TEMPLATE_LINES, args.rounds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark parallélisme de la queue
+Version 3.0.0 FINAL - Créé par Metadata
+Faux outil à latence configurable : le débit doit croître ~linéairement jusqu'à max_concurrent
+"""
+
+import argparse
+import os
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from backend.download_manager import DownloadManager
+
+FAKE_TOOL = """#!{python}
+import sys, time
+time.sleep({latency})
+args = sys.argv[1:]
+if "--output" in args:
+    with open(args[args.index("--output") + 1], "w") as f:
+        f.write("ok")
+print("100%")
+"""
+
+def create_fake_tool(directory, latency):
+    """Création d'un faux binaire qui dort `latency` secondes"""
+    tool_path = Path(directory) / "fake-tool"
+    tool_path.write_text(FAKE_TOOL.format(python=sys.executable, latency=latency))
+    tool_path.chmod(tool_path.stat().st_mode | stat.S_IEXEC)
+    return str(tool_path)
+
+def run_batch(tool_path, output_dir, items, concurrency):
+    """Exécution d'un lot et mesure du débit"""
+    dm = DownloadManager()
+    dm.clear_queue()
+    dm.tools = {"curl": tool_path}
+    dm.max_concurrent = concurrency
+    dm.output_dir = output_dir
+
+    for i in range(items):
+        dm.add_to_queue(f"https://host-{i}.bench.invalid/file-{concurrency}.bin", force_tool="curl")
+
+    start = time.perf_counter()
+    dm.start_queue_processing()
+    dm.scheduler.join()
+    elapsed = time.perf_counter() - start
+
+    return elapsed, items / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallélisme queue DownloadManager")
+    parser.add_argument("--items", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    if os.name == "nt":
+        print("⚠️ Benchmark prévu pour POSIX (faux outil avec shebang)")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tool_path = create_fake_tool(tmp, args.latency)
+        baseline = None
+
+        # Chemins relatifs (config/settings.json, data/download_queue.db, data/url_index.db...) résolus
+        # dans le dossier temporaire : la queue persistante et l'index de l'utilisateur restent intacts
+        original_dir = os.getcwd()
+        os.chdir(tmp)
+        try:
+            print(f"📊 {args.items} items, latence outil {args.latency}s")
+            for concurrency in args.concurrency:
+                elapsed, throughput = run_batch(tool_path, tmp, args.items, concurrency)
+                baseline = baseline or throughput
+                print(f"⚡ max_concurrent={concurrency:<3} {elapsed:6.2f}s  "
+                      f"{throughput:6.2f} items/s  x{throughput / baseline:.2f}")
+        finally:
+            os.chdir(original_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Profil de démarrage (-X importtime)
+Version 3.0.0 FINAL - Créé par Metadata
+Coût des imports du chemin critique (première fenêtre) vs imports différés
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Étapes mesurées, chacune dans un interpréteur neuf
+SCENARIOS = {
+    "main (module)": "import main",
+    "utils.logger": "import utils.logger",
+    "chemin critique (fenêtre)": "import main, tkinter; main.create_root(__import__('logging').getLogger())",
+    "managers (arrière-plan)": (
+        "import backend.download_manager, backend.security_manager, "
+        "backend.compatibility_learner_ULTRA_STABLE"
+    ),
+    "batch headless": "import app.cli, app.core.orchestrator",
+}
+
+PRELUDE = f"import sys; sys.path[:0] = [{str(ROOT)!r}, {str(ROOT / 'app')!r}]; "
+
+def profile(code, top):
+    """Exécution avec -X importtime : (durée totale en ms, [(cumul µs, module)])"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PRELUDE + code],
+        capture_output=True, text=True, cwd=ROOT, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    )
+    wall = (time.perf_counter() - start) * 1000
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Modules de premier niveau seulement (un seul espace d'indentation)
+        if not name.startswith("  "):
+            imports.append((int(cumulative_us), name.strip()))
+
+    imports.sort(reverse=True)
+    failed = result.returncode != 0 and result.stderr.strip().splitlines()[-1]
+    return wall, imports[:top], failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Profil des imports au démarrage")
+    parser.add_argument("--top", type=int, default=5, help="imports les plus coûteux à afficher")
+    parser.add_argument("--runs", type=int, default=3, help="exécutions par scénario (meilleure retenue)")
+    args = parser.parse_args()
+
+    for label, code in SCENARIOS.items():
+        best = None
+        for _ in range(args.runs):
+            wall, imports, failed = profile(code, args.top)
+            if best is None or wall < best[0]:
+                best = (wall, imports, failed)
+        wall, imports, failed = best
+
+        status = f"  ⚠️ {failed}" if failed else ""
+        print(f"⏱️ {label:<28} {wall:7.1f} ms (interpréteur inclus){status}")
+        for cumulative, name in imports:
+            print(f"     {cumulative / 1000:7.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Benchmark de la détection des outils au démarrage
+Version 3.0.0 FINAL - Créé par Metadata
+Sondes séquentielles répétées (avant) vs registre partagé parallèle + cache stat() (après)
+"""
+
+import argparse
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from backend.tool_detector import ToolDetector, DEFAULT_TOOLS
+
+FAKE_TOOL = """#!/bin/sh
+sleep {delay}
+echo "{name} 2024.01.01"
+"""
+
+def create_fake_tools(directory, delay, missing):
+    """Faux outils dont `--version` coûte `delay` secondes (démarrage Python de yt-dlp...)"""
+    for name in DEFAULT_TOOLS:
+        if name in missing:
+            continue
+        path = Path(directory) / name
+        path.write_text(FAKE_TOOL.format(delay=delay, name=name))
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+def legacy_find_tool(tool_name):
+    """Ancien DownloadManager._find_tool : --version puis which"""
+    try:
+        result = subprocess.run([tool_name, "--version"], capture_output=True, text=True, timeout=5)
+        if result.returncode == 0:
+            return tool_name
+    except Exception:
+        pass
+    try:
+        result = subprocess.run(["which", tool_name], capture_output=True, text=True)
+        if result.returncode == 0:
+            return result.stdout.strip().split('\n')[0]
+    except Exception:
+        pass
+    return None
+
+def legacy_startup():
+    """Backend _detect_tools + ancien ToolDetector (which) + core get_available_tools (--version)"""
+    for tool in DEFAULT_TOOLS:
+        legacy_find_tool(tool)
+    for tool in DEFAULT_TOOLS + ["cyberdrop-dl"]:
+        subprocess.run(["which", tool], capture_output=True, text=True)
+    for tool in ["yt-dlp", "gallery-dl"]:
+        try:
+            subprocess.run([tool, "--version"], capture_output=True, text=True, timeout=10)
+        except Exception:
+            pass
+
+def measure(label, func):
+    """Durée d'un démarrage"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ {label:<36} {elapsed * 1000:8.1f} ms")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark détection des outils")
+    parser.add_argument("--delay", type=float, default=0.3, help="coût simulé de `outil --version`")
+    parser.add_argument("--missing", nargs="*", default=["gallery-dl"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bin_dir = Path(tmp) / "bin"
+        bin_dir.mkdir()
+        create_fake_tools(bin_dir, args.delay, args.missing)
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}/usr/bin{os.pathsep}/bin"
+        cache_path = Path(tmp) / "tool_cache.json"
+
+        print(f"🔧 Outils: {DEFAULT_TOOLS} (absents: {args.missing}), --version = {args.delay}s")
+        before = measure("séquentiel, 3 passes (avant)", legacy_startup)
+        cold = measure("registre parallèle, cache froid", lambda: ToolDetector(cache_path=cache_path))
+        warm = measure("registre, cache chaud (stat)", lambda: ToolDetector(cache_path=cache_path))
+        print(f"   gain x{before / cold:.1f} (froid), x{before / warm:.0f} (chaud)")
+
+if __name__ == "__main__":
+    main()
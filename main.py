@@ -9,6 +9,8 @@ Gestion complète des erreurs et encodage
 
 import sys
 import os
+import queue
+import threading
 import traceback
 from pathlib import Path
 
@@ -73,8 +75,44 @@ def create_default_config():
                 "default_path": "data/downloads",
                 "max_concurrent": 4,
                 "timeout": 300,
-                "quality": "best"
+                "quality": "best",
+                "engine": "async",
+                "stall_timeout": 120,
+                "progress_stall_timeout": 600,
+                "persistent_queue": True,
+                "queue_db": "data/download_queue.db",
+                "dedup": {
+                    "enabled": True,
+                    "db": "data/content_index.db",
+                    "workers": 2,
+                    "link_mode": "auto"
+                },
+                "archive": {
+                    "enabled": True,
+                    "dir": "data/archives"
+                },
+                "inprocess": {
+                    "enabled": True,
+                    "tools": ["yt-dlp", "gallery-dl"],
+                    "idle_workers": 4
+                },
+                "retry": {
+                    "max_attempts": 4,
+                    "fallback_chains": {
+                        "bunkr.cr": ["gallery-dl", "yt-dlp"],
+                        "twitter.com": ["yt-dlp", "gallery-dl"]
+                    }
+                },
+                "per_domain_limit": 2,
+                "domain_limits": {"e-hentai.org": 1, "exhentai.org": 1},
+                "tool_limits": {"gallery-dl": 3},
+                "rate_limit": {"rate": 1.0, "burst": 2},
+                "domain_rate_limits": {
+                    "e-hentai.org": {"rate": 0.2, "burst": 1},
+                    "bunkr.cr": {"rate": 0.5, "burst": 1}
+                }
             },
+            "routing": {},
             "security": {
                 "tor_enabled": False,
                 "sandbox_enabled": True,
@@ -96,9 +134,46 @@ def create_default_config():
         except Exception as e:
             print(f"⚠️ Erreur création config: {e}")
 
+def init_managers(results):
+    """Import et initialisation des managers (thread de fond) ; dépose (dm, sm, erreur) dans `results`"""
+    try:
+        from backend.download_manager import DownloadManager
+        from backend.security_manager import SecurityManager
+        from backend.compatibility_learner import CompatibilityLearner
+        
+        compatibility_learner = CompatibilityLearner()
+        security_manager = SecurityManager()
+        download_manager = DownloadManager(compatibility_learner, security_manager)
+        results.put((download_manager, security_manager, None))
+    except Exception as e:
+        results.put((None, None, e))
+        return
+    
+    # Informations système (psutil) hors du chemin critique
+    from utils.logger import log_system_info
+    log_system_info()
+
+def create_root(logger):
+    """Fenêtre principale : TkinterDnD si disponible, sinon ttkbootstrap (imports à la demande)"""
+    try:
+        from tkinterdnd2 import TkinterDnD
+        root = TkinterDnD.Tk()
+        logger.info("✅ Interface avec drag & drop")
+        return root
+    except Exception:
+        import ttkbootstrap as ttkb
+        root = ttkb.Window(themename="darkly")
+        logger.info("✅ Interface standard (sans drag & drop)")
+        return root
+
 def main():
     """Point d'entrée principal ULTRA STABLE"""
     
+    # Mode headless : python main.py batch urls.txt [--concurrency N] [--json-progress]
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from app.cli import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+    
     # Bannière avec encodage sécurisé
     print("=" * 64)
     print("   PrismFetch V3 - Téléchargeur Intelligent Multi-Plateformes")
@@ -124,60 +199,64 @@ def main():
     try:
         print("🚀 Démarrage PrismFetch V3")
         
-        # Import des modules V3
-        from backend.download_manager import DownloadManager
-        from backend.security_manager import SecurityManager  
-        from backend.compatibility_learner import CompatibilityLearner
-        from gui.main_window import PrismFetchMainWindow
-        from utils.logger import get_logger
-        
         import tkinter as tk
-        import ttkbootstrap as ttkb
-        
-        # Support drag & drop avancé
-        try:
-            from tkinterdnd2 import TkinterDnD
-            use_dnd = True
-        except ImportError:
-            use_dnd = False
+        from utils.logger import get_logger
         
         # Configuration du logger
         logger = get_logger(__name__)
         logger.info("🚀 Démarrage PrismFetch V3")
         
-        # Initialisation des managers V3
-        try:
-            compatibility_learner = CompatibilityLearner()
-            security_manager = SecurityManager()
-            download_manager = DownloadManager(compatibility_learner, security_manager)
-            
-            logger.info("✅ Managers V3 initialisés")
-        except Exception as e:
-            logger.error(f"❌ Erreur initialisation managers: {e}")
-            raise
+        # Managers V3 en arrière-plan pendant que la fenêtre s'affiche
+        results = queue.Queue()
+        threading.Thread(target=init_managers, args=(results,), name="managers-init", daemon=True).start()
         
         # Interface V3 avec gestion drag & drop
         try:
-            if use_dnd:
-                root = TkinterDnD.Tk()
-                logger.info("✅ Interface avec drag & drop")
-            else:
-                root = ttkb.Window(themename="darkly")
-                logger.info("✅ Interface standard (sans drag & drop)")
-            
-            app = PrismFetchMainWindow(root, download_manager, security_manager)
-            
-            logger.info("✅ Interface V3 initialisée")
-            print("✅ Interface V3 initialisée")
-            
+            root = create_root(logger)
+            splash = tk.Label(root, text="⏳ Chargement de PrismFetch V3...", font=("Segoe UI", 14))
+            splash.pack(expand=True)
         except Exception as e:
             logger.error(f"❌ Erreur création interface: {e}")
             raise
         
+        state = {"download_manager": None, "security_manager": None, "error": None}
+        
+        def build_interface():
+            """Construction de l'interface complète dès que les managers sont prêts"""
+            try:
+                download_manager, security_manager, error = results.get_nowait()
+            except queue.Empty:
+                root.after(30, build_interface)
+                return
+            
+            try:
+                if error:
+                    logger.error(f"❌ Erreur initialisation managers: {error}")
+                    raise error
+                logger.info("✅ Managers V3 initialisés")
+                
+                from gui.main_window import PrismFetchMainWindow
+                splash.destroy()
+                PrismFetchMainWindow(root, download_manager, security_manager)
+                state["download_manager"] = download_manager
+                state["security_manager"] = security_manager
+                
+                logger.info("✅ Interface V3 initialisée")
+                print("✅ Interface V3 initialisée")
+                
+            except Exception as e:
+                logger.error(f"❌ Erreur création interface: {e}")
+                state["error"] = e
+                root.destroy()
+        
+        root.after(0, build_interface)
+        
         # Gestion propre de la fermeture
         def on_closing():
             try:
                 logger.info("👋 Fermeture PrismFetch V3")
+                download_manager = state["download_manager"]
+                security_manager = state["security_manager"]
                 
                 # Arrêter téléchargements
                 if hasattr(download_manager, 'stop_queue'):
@@ -198,6 +277,8 @@ def main():
         # Lancement
         try:
             root.mainloop()
+            if state["error"]:
+                raise state["error"]
             logger.info("👋 Arrêt propre de PrismFetch V3")
             print("👋 Arrêt propre de PrismFetch V3")
             
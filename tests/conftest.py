@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Configuration des tests
+Version 3.0.0 FINAL - Créé par Metadata
+Mêmes racines d'import que main.py : dépôt (app.*) et app/ (backend.*, utils.*)
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT / "app", ROOT):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Limites par site de l'ordonnanceur
+Version 3.0.0 FINAL - Créé par Metadata
+Les sous-domaines d'une règle partagent sa concurrence et son seau de jetons
+"""
+
+import threading
+import time
+
+from backend.download_scheduler import DownloadScheduler, SchedulingPolicy
+
+def test_subdomains_share_site_concurrency_limit():
+    policy = SchedulingPolicy({"domain_limits": {"bunkr.cr": 1}})
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+    done = threading.Event()
+
+    def worker(item):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+
+    scheduler = DownloadScheduler(worker, max_workers=4, on_idle=done.set, policy=policy)
+    for i in range(4):
+        scheduler.submit({"domain": f"cdn{i % 2 + 1}.bunkr.cr", "tool": "gallery-dl"})
+    scheduler.start()
+
+    assert done.wait(5)
+    assert running["max"] == 1
+
+def test_subdomains_share_site_token_bucket():
+    policy = SchedulingPolicy({"domain_rate_limits": {"bunkr.cr": {"rate": 0.5, "burst": 1}}})
+
+    assert policy.bucket("cdn1.bunkr.cr") is policy.bucket("cdn2.bunkr.cr")
+    assert policy.bucket("cdn1.bunkr.cr").try_acquire()
+    assert not policy.bucket("cdn2.bunkr.cr").try_acquire()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Téléchargement yt-dlp par le moteur intégré
+Version 3.0.0 FINAL - Créé par Metadata
+Fichier servi en local, téléchargé de bout en bout par DownloadManager.download()
+"""
+
+import functools
+import http.server
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+@pytest.fixture
+def http_file(tmp_path):
+    """URL d'un fichier servi par un serveur HTTP local"""
+    served = tmp_path / "served"
+    served.mkdir()
+    (served / "clip.mp4").write_bytes(b"\0" * 200_000)
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=str(served))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/clip.mp4"
+    server.shutdown()
+    server.server_close()
+
+def test_inprocess_ytdlp_download_reports_final_file(http_file, tmp_path, monkeypatch):
+    # Journaux, archives et configuration relatifs au dossier courant
+    monkeypatch.chdir(tmp_path)
+    from app.core.download_manager import DownloadManager
+    from backend.inprocess_engine import get_inprocess_engine
+
+    if not get_inprocess_engine().supports("yt-dlp"):
+        pytest.skip("moteur intégré indisponible pour yt-dlp")
+
+    output = tmp_path / "out"
+    details = {}
+
+    success, message = DownloadManager().download(http_file, output, details=details, force=True)
+
+    assert success, message
+    files = [Path(path) for path in details["files"]]
+    assert len(files) == 1
+    assert files[0].parent == output.resolve()
+    assert files[0].stat().st_size == 200_000
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+"""
+PrismFetch V3 - Classification des échecs
+Version 3.0.0 FINAL - Créé par Metadata
+Codes HTTP reconnus dans leur contexte, jamais dans les tailles ou la progression
+"""
+
+import pytest
+
+from backend.retry_policy import classify_failure
+
+@pytest.mark.parametrize("line, expected", [
+    ("[download]  12.3% of 429.50MiB at 1.20MiB/s ETA 05:00", "unknown"),
+    ("[download]  50.0% of 403.1KiB", "unknown"),
+    ("ERROR: unable to download video data: HTTP Error 429: Too Many Requests", "rate_limited"),
+    ("[downloader.http][error] '403 Forbidden' for 'https://example.com/a.jpg'", "auth"),
+    ("server responded with status code 401", "auth"),
+    ("ERROR 410: Gone.", "not_found"),
+    ("curl: (22) The requested URL returned error: 503", "network"),
+])
+def test_http_status_needs_context(line, expected):
+    assert classify_failure({"output_tail": [line]}) == expected